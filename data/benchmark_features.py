@@ -0,0 +1,150 @@
+"""Benchmark features.preprocess against the original notebook preprocessing.
+
+Builds a synthetic raw extraction frame, runs the notebook's cells (row-wise
+apply for the target, per-column masking, median fills) and the vectorized
+features module on identical inputs, checks that both produce the same values
+and prints the timings.
+
+    python benchmark_features.py                 # 1M and 10M rows
+    python benchmark_features.py --rows 200000
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import features
+
+CHECK_COLUMNS = ['IsDefault', 'AvgDepositLast6Months_ImputedFlag'] + features.FINANCIAL_COLUMNS + features.ENGINEERED_FEATURES
+
+
+def make_raw_frame(rows, seed=42):
+    """Random frame with the columns and quirks of the extraction query (NULLs, negatives, zero denominators)"""
+    rng = np.random.default_rng(seed)
+    application = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    registration = application - pd.to_timedelta(rng.integers(0, 2000, rows), unit='D')
+    last_default = application - pd.to_timedelta(rng.integers(1, 1500, rows), unit='D')
+
+    def money(mean, sigma, null_share=0.0, negative_share=0.0):
+        values = rng.lognormal(mean, sigma, rows).round(2)
+        values[rng.random(rows) < negative_share] *= -1
+        values[rng.random(rows) < null_share] = np.nan
+        return values
+
+    previous_loans = rng.integers(0, 12, rows)
+    return pd.DataFrame({
+        'LoanStatus': rng.choice(['Paid', 'Defaulted'], rows, p=[0.8, 0.2]).astype(object),
+        'AmountRequested': money(9, 0.8, negative_share=0.001),
+        'LoanPrincipal': money(9, 0.8, null_share=0.05),
+        'MonthlyIncome': money(10, 0.9, null_share=0.02, negative_share=0.002),
+        'MonthlyMobileMoneyVolume': money(9.5, 1.2, null_share=0.01),
+        'MaxEligibleLoanAmount': np.where(rng.random(rows) < 0.05, 0.0, money(9.5, 0.7)),
+        'AvgDepositLast6Months': money(8, 1.0, null_share=0.15),
+        'PreviousLoansTaken': previous_loans,
+        'PreviousDefaults': rng.binomial(previous_loans, 0.15),
+        'ApplicationDate': application,
+        'CustomerRegistrationDate': registration,
+        'PreviousLastDefaultDate': last_default.where(rng.random(rows) < 0.3),
+    })
+
+
+def notebook_preprocess(df):
+    """Cells 9-15 of the original preprocessing notebook, without the printing.
+
+    The `fillna(..., inplace=True)` calls on columns are written as assignments so they
+    still take effect under pandas copy-on-write.
+    """
+    df['IsDefault'] = df['LoanStatus'].apply(lambda x: 1 if x == 'Defaulted' else 0)
+
+    if df['AvgDepositLast6Months'].isnull().any():
+        df['AvgDepositLast6Months_ImputedFlag'] = df['AvgDepositLast6Months'].isnull().astype(int)
+        df['AvgDepositLast6Months'] = df['AvgDepositLast6Months'].fillna(0)
+
+    for col in features.FINANCIAL_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+        if (df[col] < 0).sum() > 0:
+            df.loc[df[col] < 0, col] = np.nan
+        if df[col].isnull().sum() > 0:
+            df[col] = df[col].fillna(df[col].median() if df[col].notna().any() else 0)
+        Q1 = df[col].quantile(0.25)
+        Q3 = df[col].quantile(0.75)
+        IQR = Q3 - Q1
+        if IQR > 0:
+            df[col] = df[col].clip(lower=max(0, Q1 - 1.5 * IQR), upper=Q3 + 1.5 * IQR)
+
+    df['DTI'] = np.where(df['MonthlyIncome'] > 0, df['AmountRequested'] / df['MonthlyIncome'], np.nan)
+    df['DTI'] = df['DTI'].fillna(df['DTI'].median())
+    df['LoanToMaxEligibleRatio'] = np.where(df['MaxEligibleLoanAmount'] > 0, df['AmountRequested'] / df['MaxEligibleLoanAmount'], np.nan)
+    df['LoanToMaxEligibleRatio'] = df['LoanToMaxEligibleRatio'].fillna(df['LoanToMaxEligibleRatio'].median())
+    df['IncomeToLoanRatio'] = np.where(df['AmountRequested'] > 0, df['MonthlyIncome'] / df['AmountRequested'], np.nan)
+    df['MobileMoneyTurnoverRatio'] = np.where(df['MonthlyIncome'] > 0, df['MonthlyMobileMoneyVolume'] / df['MonthlyIncome'], np.nan)
+
+    df['ApplicationDate'] = pd.to_datetime(df['ApplicationDate'])
+    df['PreviousLastDefaultDate'] = pd.to_datetime(df['PreviousLastDefaultDate'])
+    df['DaysSinceLastDefault'] = (df['ApplicationDate'] - df['PreviousLastDefaultDate']).dt.days
+    df['DaysSinceLastDefault'] = df['DaysSinceLastDefault'].fillna(365 * 10)
+    df['CustomerRegistrationDate'] = pd.to_datetime(df['CustomerRegistrationDate'])
+    df['CustomerTenureDays'] = (df['ApplicationDate'] - df['CustomerRegistrationDate']).dt.days
+    df['CustomerTenureDays'] = df['CustomerTenureDays'].fillna(0)
+
+    df['OnTimeRepaymentRatio'] = np.where(df['PreviousLoansTaken'] > 0,
+                                          (df['PreviousLoansTaken'] - df['PreviousDefaults']) / df['PreviousLoansTaken'], np.nan)
+    df['LoanFrequency'] = np.where(df['CustomerTenureDays'] > 0, df['PreviousLoansTaken'] / df['CustomerTenureDays'], np.nan)
+    return df
+
+
+def max_relative_difference(expected, actual):
+    expected = expected[CHECK_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+    actual = actual[CHECK_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+    if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+        return np.inf
+    both = ~np.isnan(expected)
+    return float(np.max(np.abs(actual[both] - expected[both]) / np.maximum(np.abs(expected[both]), 1e-12), initial=0.0))
+
+
+def run(rows, seed=42, check_rows=200000):
+    raw = make_raw_frame(rows, seed)
+    # Only a fixed row subset is kept for the comparison so 10M rows fit in memory
+    check = np.sort(np.random.default_rng(seed).choice(rows, min(rows, check_rows), replace=False))
+
+    started = time.perf_counter()
+    expected = notebook_preprocess(raw.copy())
+    notebook_seconds = time.perf_counter() - started
+    expected = expected.iloc[check][CHECK_COLUMNS].copy()
+
+    started = time.perf_counter()
+    actual, _ = features.preprocess(raw)
+    vectorized_seconds = time.perf_counter() - started
+    actual = actual.iloc[check]
+
+    return {
+        'rows': rows,
+        'notebook_seconds': notebook_seconds,
+        'vectorized_seconds': vectorized_seconds,
+        'speedup': notebook_seconds / vectorized_seconds,
+        # engineered features are stored as float32, so agreement is to float32 precision
+        'max_relative_difference': max_relative_difference(expected, actual),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>12} {'notebook s':>12} {'vectorized s':>13} {'speedup':>8} {'max rel diff':>13}")
+    for rows in args.rows:
+        result = run(rows, args.seed)
+        print(f"{result['rows']:>12,} {result['notebook_seconds']:>12.2f} {result['vectorized_seconds']:>13.2f} "
+              f"{result['speedup']:>7.1f}x {result['max_relative_difference']:>13.1e}")
+        if result['max_relative_difference'] > 1e-6:
+            print("Vectorized output differs from the notebook output")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,23 @@
 #import necessary libraries
 import pyodbc
 import random
+import numpy as np
 import datetime
 import math
+import bisect
 from faker import Faker
 import sys
+import time
 from contextlib import contextmanager
 import configparser
+import copy
 import os
+import re
+import json
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 import decimal 
 from decimal import Decimal, ROUND_HALF_UP
 
@@ -25,7 +35,10 @@ def create_config_if_not_exists():
             'trusted_connection': 'no',
             'uid' : 'sa',
             'pwd' : '*********',
-            'trust_server_certificate': 'yes' 
+            'trust_server_certificate': 'yes',
+            'pool_size' : '4',
+            'pool_checkout_timeout' : '60',
+            'pool_health_check_seconds' : '30'
         }
         
         # Generation section
@@ -41,7 +54,16 @@ def create_config_if_not_exists():
             'tier_amount_multiplier' : '1.5',
             'initial_max_eligible_amount' : '1000',
             'tier_amount_increment' : '1000',
-            'absolute_max_loan_amount' : '100000.00'            
+            'absolute_max_loan_amount' : '100000.00',
+            'customer_engine' : 'vectorized',
+            'mm_flush_rows' : '50000',
+            'mm_workers' : '1',
+            'write_queue_batches' : '4',
+            'random_seed' : '42',
+            'profile_queries' : 'False',
+            'n_plus_one_threshold' : '100',
+            'profile_report' : 'reports/query_profile.json',
+            'disable_indexes_during_load' : 'True'
         }
         
         with open('config.ini', 'w') as configfile:
@@ -52,8 +74,28 @@ def create_config_if_not_exists():
 create_config_if_not_exists()
 
 # Configuration Management
+_config_cache = {}
+
 def load_config(config_file ='config.ini'):
-    """Load configuration from file"""
+    """Load configuration from file, parsed once per file version
+
+    The parsed settings are cached by path and modification time, so the repeated calls from the
+    stages cost one stat; each caller gets its own copy.
+    """
+    path = os.path.abspath(config_file)
+    version = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    cached = _config_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, _parse_config(config_file))
+        _config_cache[path] = cached
+    return copy.deepcopy(cached[1])
+
+def _optional_int(config, section, option):
+    """Integer option that may be missing or left empty, meaning None"""
+    value = config.get(section, option, fallback='').strip()
+    return int(value) if value else None
+
+def _parse_config(config_file):
     config = configparser.ConfigParser()
     config.read(config_file)
 
@@ -72,6 +114,9 @@ def load_config(config_file ='config.ini'):
         # Add trust_server_certificate, defaulting to False if not found for safety,
         # but for this case, we need it to be True in the config file.
         db_settings['trust_server_certificate'] = config.getboolean('database', 'trust_server_certificate', fallback=False)
+        db_settings['pool_size'] = config.getint('database', 'pool_size', fallback=4)
+        db_settings['pool_checkout_timeout'] = config.getfloat('database', 'pool_checkout_timeout', fallback=60.0)
+        db_settings['pool_health_check_seconds'] = config.getfloat('database', 'pool_health_check_seconds', fallback=30.0)
 
         return {
             'db_connection': db_settings,
@@ -87,7 +132,16 @@ def load_config(config_file ='config.ini'):
                 'max_tier': config.getint('generation', 'max_tier', fallback=5),
                 'tier_amount_multiplier': config.getfloat('generation', 'tier_amount_multiplier', fallback=1.5),
                 'tier_amount_increment': config.getfloat('generation', 'tier_amount_increment', fallback=1000.00),
-                'absolute_max_loan_amount': config.getfloat('generation', 'absolute_max_loan_amount', fallback=100000.00)
+                'absolute_max_loan_amount': config.getfloat('generation', 'absolute_max_loan_amount', fallback=100000.00),
+                'customer_engine': config.get('generation', 'customer_engine', fallback='python'),
+                'mm_flush_rows': config.getint('generation', 'mm_flush_rows', fallback=50000),
+                'mm_workers': config.getint('generation', 'mm_workers', fallback=1),
+                'write_queue_batches': config.getint('generation', 'write_queue_batches', fallback=4),
+                'random_seed': _optional_int(config, 'generation', 'random_seed'),
+                'profile_queries': config.getboolean('generation', 'profile_queries', fallback=False),
+                'n_plus_one_threshold': config.getint('generation', 'n_plus_one_threshold', fallback=100),
+                'profile_report': config.get('generation', 'profile_report', fallback='reports/query_profile.json'),
+                'disable_indexes_during_load': config.getboolean('generation', 'disable_indexes_during_load', fallback=False)
             }
         }
     except (configparser.NoSectionError, configparser.NoOptionError) as e:
@@ -97,61 +151,393 @@ def load_config(config_file ='config.ini'):
 # Initialize Faker and random seed for random data generation
 fake = Faker()
 random.seed(42)
+np_random = np.random.default_rng(42)
+
+# Query Instrumentation
+class QueryProfiler:
+    """Per-stage statement counts, rows and wall time, keyed by normalized SQL text"""
+    def __init__(self, enabled=False, n_plus_one_threshold=100):
+        self.enabled = enabled
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.current_stage = 'unstaged'
+        self.stages = {}
+        # Writer threads record statements concurrently with the stage's own connection
+        self.lock = threading.Lock()
+
+    def configure(self, enabled, n_plus_one_threshold=100):
+        self.enabled = enabled
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    @staticmethod
+    def normalize(sql):
+        """Collapse whitespace and literals so the same statement shape is counted together"""
+        sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+        sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+        return " ".join(sql.split())
+
+    def _stage_stats(self, name):
+        if name not in self.stages:
+            self.stages[name] = {'wall_seconds': 0.0, 'statements': 0, 'rows': 0, 'queries': {}}
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name):
+        """Attribute statements to a named stage and time it"""
+        previous = self.current_stage
+        self.current_stage = name
+        stats = self._stage_stats(name)
+        started = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats['wall_seconds'] += time.perf_counter() - started
+            self.current_stage = previous
+
+    def record(self, sql, seconds, rows=0, statements=1):
+        with self.lock:
+            stats = self._stage_stats(self.current_stage)
+            query = stats['queries'].setdefault(self.normalize(sql), {'count': 0, 'rows': 0, 'seconds': 0.0})
+            query['count'] += statements
+            query['rows'] += rows
+            query['seconds'] += seconds
+            stats['statements'] += statements
+            stats['rows'] += rows
+        return query
+
+    def n_plus_one(self, stats):
+        """Statements executed more than the threshold within one stage"""
+        return [{'sql': sql, **query} for sql, query in stats['queries'].items()
+                if query['count'] > self.n_plus_one_threshold]
+
+    def summary(self):
+        summary = {}
+        for name, stats in self.stages.items():
+            queries = sorted(((sql, dict(query, seconds=round(query['seconds'], 4))) for sql, query in stats['queries'].items()),
+                             key=lambda item: item[1]['seconds'], reverse=True)
+            summary[name] = {
+                'wall_seconds': round(stats['wall_seconds'], 3),
+                'statements': stats['statements'],
+                'rows': stats['rows'],
+                'sql_seconds': round(sum(query['seconds'] for _, query in queries), 3),
+                'n_plus_one': self.n_plus_one(stats),
+                'queries': [{'sql': sql, **query} for sql, query in queries]
+            }
+        return summary
+
+    def write_report(self, path):
+        summary = self.summary()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2, default=str)
+        print(f"\nQuery profile written to {path}")
+        for name, stats in summary.items():
+            print(f"- {name}: {stats['statements']} statements, {stats['rows']} rows, "
+                  f"{stats['sql_seconds']:.1f}s in SQL of {stats['wall_seconds']:.1f}s")
+            for query in stats['n_plus_one']:
+                print(f"    N+1 suspect ({query['count']}x): {query['sql'][:100]}")
+        return summary
+
+class InstrumentedCursor:
+    """pyodbc cursor wrapper that reports every statement and fetch to a QueryProfiler"""
+    def __init__(self, cursor, profiler):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_last', None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. fast_executemany goes straight to the real cursor
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def execute(self, sql, *params):
+        started = time.perf_counter()
+        self._cursor.execute(sql, *params)
+        rowcount = self._cursor.rowcount
+        query = self._profiler.record(sql, time.perf_counter() - started, rows=rowcount if rowcount > 0 else 0)
+        object.__setattr__(self, '_last', query)
+        return self
+
+    def executemany(self, sql, params):
+        params = list(params)
+        started = time.perf_counter()
+        self._cursor.executemany(sql, params)
+        query = self._profiler.record(sql, time.perf_counter() - started, rows=len(params))
+        object.__setattr__(self, '_last', query)
+
+    def _fetched(self, started, rows):
+        seconds = time.perf_counter() - started
+        with self._profiler.lock:
+            stats = self._profiler._stage_stats(self._profiler.current_stage)
+            stats['rows'] += rows
+            if self._last is not None:
+                self._last['rows'] += rows
+                self._last['seconds'] += seconds
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, 1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchmany(self, size=1):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+class InstrumentedConnection:
+    """pyodbc connection wrapper that hands out instrumented cursors"""
+    def __init__(self, conn, profiler):
+        self._conn = conn
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return InstrumentedCursor(self._conn.cursor(), self._profiler)
+
+    def commit(self):
+        started = time.perf_counter()
+        self._conn.commit()
+        self._profiler.record('COMMIT', time.perf_counter() - started)
+
+query_profiler = QueryProfiler()
 
 # Connection Management
-@contextmanager
+def connection_string(db_config):
+    """ODBC connection string from the [database] settings"""
+    conn_str_parts = [
+        f"Driver={{{db_config['driver']}}}",
+        f"Server={db_config['server']}",
+        f"Database={db_config['database']}"
+    ]
+
+    if db_config.get('trusted_connection'): # Check if the key exists and is True
+        conn_str_parts.append("Trusted_Connection=yes")
+    elif db_config.get('uid') and db_config.get('pwd'): # Check if UID/PWD are provided
+        conn_str_parts.append(f"UID={db_config['uid']}")
+        conn_str_parts.append(f"PWD={db_config['pwd']}")
+    else:
+        # If trusted_connection is false, and no uid/pwd, it's an issue.
+        raise ValueError(
+            "Database configuration in config.ini requires UID/PWD when Trusted_Connection is 'no'."
+        )
+
+    # Add TrustServerCertificate if set to True in config
+    if db_config.get('trust_server_certificate'):
+        conn_str_parts.append("TrustServerCertificate=yes")
+
+    return ";".join(conn_str_parts)
+
+class ConnectionPool:
+    """Process-wide pool of pyodbc connections shared by every stage
+
+    The connection string is built once from the config. Checkout reuses the most recently returned
+    connection; one idle for longer than health_check_seconds is probed with SELECT 1 first (0 probes
+    on every checkout) and replaced if the probe fails. At most `size` connections are open; when all
+    are checked out the caller waits up to checkout_timeout. Returned connections are rolled back, so
+    uncommitted work is discarded as it was when every use closed its own connection.
+    """
+    def __init__(self, size=4, checkout_timeout=60.0, health_check_seconds=30.0, connect=None):
+        self.connect = connect
+        self.conn_str = None
+        self.idle = []
+        self.created = 0
+        self.pid = os.getpid()
+        self.available = threading.Condition()
+        self.configure(size, checkout_timeout, health_check_seconds)
+        self.metrics = {'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+                        'connections_created': 0, 'create_seconds': 0.0, 'max_create_seconds': 0.0,
+                        'health_checks': 0, 'health_check_seconds': 0.0, 'discarded': 0, 'timeouts': 0}
+
+    def configure(self, size=4, checkout_timeout=60.0, health_check_seconds=30.0):
+        self.size = max(1, size)
+        self.checkout_timeout = checkout_timeout
+        self.health_check_seconds = health_check_seconds
+
+    def _connection_string(self):
+        if self.conn_str is None:
+            db_config = load_config()['db_connection']
+            self.conn_str = connection_string(db_config)
+            log_conn_str = self.conn_str
+            if db_config.get('pwd'): # Mask password for logging
+                log_conn_str = self.conn_str.replace(f"PWD={db_config['pwd']}", "PWD=********")
+            print(f"Connection pool (size {self.size}) connecting with: {log_conn_str}")
+        return self.conn_str
+
+    def _create(self):
+        started = time.perf_counter()
+        try:
+            connect = self.connect or pyodbc.connect
+            conn = connect(self._connection_string(), autocommit=False)
+        except BaseException:
+            with self.available:
+                self.created -= 1
+                self.available.notify()
+            raise
+        seconds = time.perf_counter() - started
+        with self.available:
+            self.metrics['connections_created'] += 1
+            self.metrics['create_seconds'] += seconds
+            self.metrics['max_create_seconds'] = max(self.metrics['max_create_seconds'], seconds)
+        return conn
+
+    def _healthy(self, conn):
+        started = time.perf_counter()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+        finally:
+            with self.available:
+                self.metrics['health_checks'] += 1
+                self.metrics['health_check_seconds'] += time.perf_counter() - started
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except pyodbc.Error:
+            pass
+        with self.available:
+            self.created -= 1
+            self.metrics['discarded'] += 1
+            self.available.notify()
+
+    def _after_fork(self):
+        # Sockets inherited from the parent belong to the parent's sessions; start over without closing them
+        self.idle = []
+        self.created = 0
+        self.pid = os.getpid()
+
+    def acquire(self):
+        """Check out a healthy connection, opening one if the pool is not full"""
+        started = time.perf_counter()
+        while True:
+            with self.available:
+                if self.pid != os.getpid():
+                    self._after_fork()
+                waited = False
+                while not self.idle and self.created >= self.size:
+                    waited = True
+                    remaining = self.checkout_timeout - (time.perf_counter() - started)
+                    if remaining <= 0 or not self.available.wait(remaining):
+                        self._record_wait(started)
+                        self.metrics['timeouts'] += 1
+                        raise DatabaseError(f"No database connection free after {self.checkout_timeout:.0f}s; "
+                                            f"all {self.size} pooled connections are checked out (raise pool_size)")
+                if waited:
+                    self._record_wait(started)
+                self.metrics['checkouts'] += 1
+                if self.idle:
+                    conn, returned_at = self.idle.pop()
+                else:
+                    self.created += 1
+                    conn, returned_at = None, None
+            if conn is None:
+                return self._create()
+            if time.monotonic() - returned_at < self.health_check_seconds or self._healthy(conn):
+                return conn
+            print("Discarding a pooled database connection that failed its health check")
+            self._discard(conn)
+
+    def _record_wait(self, started):
+        wait_seconds = time.perf_counter() - started
+        self.metrics['waits'] += 1
+        self.metrics['wait_seconds'] += wait_seconds
+        self.metrics['max_wait_seconds'] = max(self.metrics['max_wait_seconds'], wait_seconds)
+
+    def require(self, count, purpose):
+        """Fail fast if `count` more connections than are checked out now would not fit in the pool"""
+        with self.available:
+            if self.pid != os.getpid():
+                self._after_fork()
+            in_use = self.created - len(self.idle)
+        if in_use + count > self.size:
+            raise DatabaseError(f"{purpose} needs {count} connection(s) besides the {in_use} in use, but pool_size is "
+                                f"{self.size}; set pool_size to at least {in_use + count}")
+
+    def release(self, conn, broken=False):
+        """Return a connection, or close it if it is broken or cannot be rolled back"""
+        if self.pid != os.getpid():
+            return
+        if not broken:
+            try:
+                conn.rollback()
+            except pyodbc.Error:
+                broken = True
+        if broken:
+            self._discard(conn)
+            return
+        with self.available:
+            self.idle.append((conn, time.monotonic()))
+            self.available.notify()
+
+    def close(self):
+        """Close the idle connections; checked-out ones are closed when they come back"""
+        with self.available:
+            idle, self.idle = self.idle, []
+            self.created -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+
+    def report(self):
+        metrics = self.metrics
+        if not metrics['checkouts'] and not metrics['timeouts']:
+            return metrics
+        created = metrics['connections_created']
+        print(f"\nConnection pool: {metrics['checkouts']} checkouts served by {created} connections "
+              f"({metrics['create_seconds']:.1f}s opening, max {metrics['max_create_seconds'] * 1000:.0f} ms) | "
+              f"{metrics['waits']} waits for a free connection ({metrics['wait_seconds']:.1f}s, "
+              f"max {metrics['max_wait_seconds'] * 1000:.0f} ms, {metrics['timeouts']} timed out) | "
+              f"{metrics['health_checks']} health checks, {metrics['discarded']} discarded")
+        return metrics
+
+connection_pool = ConnectionPool()
+
+# The mobile money stage holds its own connection plus one writer per table (transactions, credit info)
+MIN_POOL_SIZE = 3
 
+@contextmanager
 def db_connection():
-    """Context manager for database connections"""
+    """Context manager checking a connection out of the process-wide pool"""
     conn = None
+    broken = False
     try:
-        config_data = load_config() # Renamed to avoid conflict with 'configparser.ConfigParser()' instance
-        db_config = config_data['db_connection']
-
-        conn_str_parts = [
-            f"Driver={{{db_config['driver']}}}",
-            f"Server={db_config['server']}",
-            f"Database={db_config['database']}"
-        ]
-
-        if db_config.get('trusted_connection'): # Check if the key exists and is True
-            conn_str_parts.append("Trusted_Connection=yes")
-        elif db_config.get('uid') and db_config.get('pwd'): # Check if UID/PWD are provided
-            conn_str_parts.append(f"UID={db_config['uid']}")
-            conn_str_parts.append(f"PWD={db_config['pwd']}")
-        else:
-            # If trusted_connection is false, and no uid/pwd, it's an issue.
-            raise ValueError(
-                "Database configuration in config.ini requires UID/PWD when Trusted_Connection is 'no'."
-            )
-
-        # Add TrustServerCertificate if set to True in config
-        if db_config.get('trust_server_certificate'):
-            conn_str_parts.append("TrustServerCertificate=yes")
-
-        conn_str = ";".join(conn_str_parts)
-
-        log_conn_str = conn_str
-        if db_config.get('pwd'): # Mask password for logging
-            log_conn_str = conn_str.replace(f"PWD={db_config['pwd']}", "PWD=********")
-        print(f"Attempting to connect with: {log_conn_str}")
-
-        conn = pyodbc.connect(conn_str, autocommit=False)
-        yield conn
+        conn = connection_pool.acquire()
+        yield InstrumentedConnection(conn, query_profiler) if query_profiler.enabled else conn
     except pyodbc.Error as ex:
         sqlstate = ex.args[0]
         print(f"Database connection error (pyodbc): {sqlstate} - {str(ex)}")
-        if conn:
-            conn.rollback()
+        # The session may be unusable; do not hand it to the next stage
+        broken = True
         raise
     except Exception as e:
         print(f"Generic database connection error: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
     finally:
         if conn:
-            conn.close()
+            connection_pool.release(conn, broken=broken)
             
 # Progress Reporting
 def show_progress(current, total, start_time=None, prefix=""):
@@ -172,6 +558,176 @@ def show_progress(current, total, start_time=None, prefix=""):
     if current >= total:
         print()  # New line when complete
         
+# Pipelined Writing
+class TableWriter(threading.Thread):
+    """Writer thread that drains one queue of row batches into one statement over its own connection
+
+    before_commit(cursor, batch), if given, runs after each batch's statement in the same transaction.
+    """
+    def __init__(self, table, sql, batches, connect=None, before_commit=None):
+        super().__init__(name=f"writer-{table}", daemon=True)
+        self.table = table
+        self.sql = sql
+        self.batches = batches
+        self.connect = connect or db_connection
+        self.before_commit = before_commit
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+        self.error = None
+        self.cancelled = False
+
+    def run(self):
+        try:
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.fast_executemany = True
+                while True:
+                    batch = self.batches.get()
+                    if batch is None:
+                        break
+                    if self.cancelled:
+                        continue
+                    # pyodbc releases the GIL while the batch is on the wire, so generation keeps running
+                    write_start = time.perf_counter()
+                    cursor.executemany(self.sql, batch)
+                    if self.before_commit is not None:
+                        self.before_commit(cursor, batch)
+                    conn.commit()
+                    self.write_seconds += time.perf_counter() - write_start
+                    self.rows_written += len(batch)
+                    self.batches_written += 1
+        except Exception as e:
+            self.error = e
+            # Keep taking batches until the stop marker so a producer blocked on the full queue is released
+            while self.batches.get() is not None:
+                pass
+
+class WritePipeline:
+    """Bounded per-table queues of row batches, each drained by writer threads on their own connections
+
+    Generator code adds rows per target table; they are cut into batches of batch_rows and put on
+    that table's queue. A full queue blocks the producer (backpressure), so each table holds at most
+    about (queue_batches + writers + 1) * batch_rows rows in memory while the writers overlap the
+    database round trips with generation. before_commit maps a table to a callable(cursor, batch) run
+    in each batch's transaction, for derived tables that must stay in step. Each batch is committed on
+    its own, so a stage that needs all-or-nothing semantics must undo the committed batches itself.
+
+    With the default connect (the connection pool) the pool must fit one connection per writer besides
+    those already checked out, which is checked before any writer starts.
+    """
+    def __init__(self, statements, batch_rows=50000, queue_batches=4, writers=1, connect=None, before_commit=None):
+        if connect is None:
+            connection_pool.require(writers * len(statements), f"Writing {', '.join(statements)}")
+        self.batch_rows = batch_rows
+        self.queue_batches = queue_batches
+        self.queues = {table: queue.Queue(maxsize=queue_batches) for table in statements}
+        self.buffers = {table: [] for table in statements}
+        before_commit = before_commit or {}
+        self.writers = {table: [TableWriter(table, sql, self.queues[table], connect, before_commit.get(table))
+                                for _ in range(writers)]
+                        for table, sql in statements.items()}
+        self.rows_queued = {table: 0 for table in statements}
+        self.producer_wait = {table: 0.0 for table in statements}
+        self.max_depth = {table: 0 for table in statements}
+        self.started = time.perf_counter()
+        self.closed = False
+        for table_writers in self.writers.values():
+            for writer in table_writers:
+                writer.start()
+
+    def add(self, table, row):
+        self.buffers[table].append(row)
+        if len(self.buffers[table]) >= self.batch_rows:
+            self._put(table)
+
+    def extend(self, table, rows):
+        self.buffers[table].extend(rows)
+        while len(self.buffers[table]) >= self.batch_rows:
+            self._put(table)
+
+    def _put(self, table):
+        buffer = self.buffers[table]
+        batch, self.buffers[table] = buffer[:self.batch_rows], buffer[self.batch_rows:]
+        wait_start = time.perf_counter()
+        while True:
+            self._raise_writer_error(table)
+            try:
+                self.queues[table].put(batch, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self.producer_wait[table] += time.perf_counter() - wait_start
+        self.rows_queued[table] += len(batch)
+        self.max_depth[table] = max(self.max_depth[table], self.queues[table].qsize())
+
+    def _raise_writer_error(self, table):
+        for writer in self.writers[table]:
+            if writer.error is not None:
+                raise DatabaseError(f"Writer for {table} failed: {writer.error}") from writer.error
+
+    def close(self, flush=True):
+        """Send what is still buffered and stop the writers once everything is written
+
+        With flush=False the buffered rows and the batches still queued are dropped; only a batch a
+        writer is already sending gets committed.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if flush:
+                for table in self.buffers:
+                    while self.buffers[table]:
+                        self._put(table)
+        finally:
+            if not flush:
+                for table, table_writers in self.writers.items():
+                    self.buffers[table] = []
+                    for writer in table_writers:
+                        writer.cancelled = True
+                    try:
+                        while True:
+                            self.queues[table].get_nowait()
+                    except queue.Empty:
+                        pass
+            for table, table_writers in self.writers.items():
+                for _ in table_writers:
+                    self.queues[table].put(None)
+            for table_writers in self.writers.values():
+                for writer in table_writers:
+                    writer.join()
+        for table in self.writers:
+            self._raise_writer_error(table)
+
+    def rows_written(self, table):
+        return sum(writer.rows_written for writer in self.writers[table])
+
+    def status(self):
+        """Queue depth and write rate per table, for progress lines"""
+        elapsed = time.perf_counter() - self.started
+        return " | ".join(f"{table} q={self.queues[table].qsize()}/{self.queue_batches} "
+                          f"{self.rows_written(table) / elapsed if elapsed > 0 else 0.0:,.0f} rows/sec"
+                          for table in self.queues)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        for table, table_writers in self.writers.items():
+            rows = self.rows_written(table)
+            batches = sum(writer.batches_written for writer in table_writers)
+            write_seconds = sum(writer.write_seconds for writer in table_writers)
+            write_rate = rows / write_seconds if write_seconds > 0 else 0.0
+            print(f"{table}: {rows} rows in {batches} batches over {len(table_writers)} writer(s) | "
+                  f"{rows / elapsed if elapsed > 0 else 0.0:,.0f} rows/sec overall | {write_rate:,.0f} rows/sec while writing | "
+                  f"max queue depth {self.max_depth[table]}/{self.queue_batches} | producer blocked {self.producer_wait[table]:.1f}s")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # On an error in the generator, stop the writers without sending the partial buffers
+        self.close(flush=exc_type is None)
+
 # Error Handling Classes
 class DataGenerationError(Exception):
     """Base exception for data generation errors"""
@@ -574,15 +1130,62 @@ employment_by_age = {
 }
 
 # Helper functions 
-def weighted_choice(choices):
-    total = sum(w for c, w in choices)
-    r = random.uniform(0, total)
-    upto = 0
-    for c, w in choices:
-        if upto + w >= r:
-            return c
-        upto += w
-    return choices[-1][0]# Keep your original
+class WeightedSampler:
+    """Weighted choice table compiled once with Vose's alias method.
+
+    Single draws and batch draws are O(1) per item regardless of the number of choices.
+    """
+    def __init__(self, choices):
+        self.values = [c for c, w in choices]
+        weights = np.asarray([w for c, w in choices], dtype=float)
+        if len(weights) == 0 or weights.sum() <= 0:
+            raise ValueError("WeightedSampler needs at least one positive weight")
+
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s], alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        self.prob, self.alias = prob, alias
+        self._prob, self._alias = prob.tolist(), alias.tolist()
+        self._values = np.empty(n, dtype=object)
+        for i, value in enumerate(self.values):
+            self._values[i] = value
+
+    def __len__(self):
+        return len(self.values)
+
+    def draw(self, rng=random):
+        """Draw one value using rng.random() (the random module or a NumPy Generator)"""
+        r = rng.random() * len(self._prob)
+        i = int(r)
+        return self.values[i if r - i < self._prob[i] else self._alias[i]]
+
+    def indices(self, size, rng):
+        """Draw an array of indices into values from a NumPy Generator"""
+        i = rng.integers(0, len(self._prob), size=size)
+        return np.where(rng.random(size) < self.prob[i], i, self.alias[i])
+
+    def sample(self, size, rng):
+        """Draw an object array of values from a NumPy Generator"""
+        return self._values[self.indices(size, rng)]
+
+    def indices_from(self, u):
+        """Indices for an array of uniforms in [0, 1), one uniform per draw (as in draw())"""
+        r = u * len(self._prob)
+        i = r.astype(np.int64)
+        return np.where(r - i < self.prob[i], i, self.alias[i])
+
+    def sample_from(self, u):
+        """Object array of values for an array of uniforms in [0, 1)"""
+        return self._values[self.indices_from(u)]
 
 def random_date(start_date, end_date): 
     if start_date > end_date:
@@ -600,6 +1203,85 @@ def random_time_on_date(date):
         seconds=random.randint(0, 59)
     )# Keep your original
 
+#Compiled samplers for the static tables, shared by every generator
+MUSLIM_NAME_COUNTIES = ['Mombasa', 'Kwale', 'Kilifi', 'Lamu', 'Garissa', 'Wajir', 'Mandera']
+
+#Effective last name origin per county, in the same precedence as the original per-row branches
+#(None means any last name)
+LAST_NAME_ORIGIN_BY_COUNTY = {}
+for _origin, _counties in [
+    (None, ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru']),
+    ('Kikuyu', ['Kiambu', 'Murang\'a', 'Nyeri', 'Kirinyaga']),
+    ('Luo', ['Siaya', 'Kisumu', 'Homa Bay', 'Migori']),
+    ('Muslim', ['Mombasa', 'Kwale', 'Kilifi', 'Lamu', 'Garissa', 'Wajir', 'Mandera']),
+    ('Luhya', ['Kakamega', 'Vihiga', 'Bungoma', 'Busia']),
+    ('Kalenjin', ['Uasin Gishu', 'Nandi', 'Elgeyo-Marakwet', 'Trans-Nzoia']),
+    ('Kamba', ['Kitui', 'Machakos', 'Makueni'])
+]:
+    for _county in _counties:
+        LAST_NAME_ORIGIN_BY_COUNTY.setdefault(_county, _origin)
+
+COUNTY_SAMPLER = WeightedSampler([(county, data['weight']) for county, data in kenyan_counties.items()])
+SUBCOUNTY_SAMPLERS = {county: WeightedSampler([(s, 1) for s in data['subcounties']]) for county, data in kenyan_counties.items()}
+TOWN_SAMPLERS = {county: WeightedSampler([(t, 1) for t in data['towns']]) for county, data in kenyan_counties.items()}
+
+FIRST_NAME_SAMPLERS = {
+    'M': WeightedSampler([(name, 1) for name, origin in male_first_names]),
+    'F': WeightedSampler([(name, 1) for name, origin in female_first_names])
+}
+# Higher probability of Muslim names in coastal and northeastern counties
+COASTAL_FIRST_NAME_SAMPLERS = {
+    gender: WeightedSampler([(name, 3 if origin == 'Muslim' else 1) for name, origin in names if origin in ['Common', 'Muslim']])
+    for gender, names in (('M', male_first_names), ('F', female_first_names))
+}
+LAST_NAME_SAMPLERS = {
+    origin: WeightedSampler([(name, 1) for name, o in last_names if origin is None or o == origin])
+    for origin in set(LAST_NAME_ORIGIN_BY_COUNTY.values()) | {None}
+}
+
+AGE_GROUP_SAMPLER = WeightedSampler([((min_age, max_age), weight) for (min_age, max_age, weight) in age_distribution])
+EMPLOYMENT_SAMPLERS = {age_group: WeightedSampler(options) for age_group, options in employment_by_age.items()}
+EDUCATION_SAMPLER = WeightedSampler([('Primary', 15), ('Secondary', 30), ('College', 30), ('University', 25)])
+
+# Mobile provider by region
+PROVIDER_SAMPLERS = [
+    (['Nairobi', 'Central Kenya'], WeightedSampler([('M-Pesa', 85), ('Airtel Money', 12), ('T-Kash', 3)])),  # Safaricom dominance
+    (['Western', 'Nyanza'], WeightedSampler([('M-Pesa', 80), ('Airtel Money', 18), ('T-Kash', 2)])),  # Slightly higher Airtel penetration
+    (['Coastal', 'North Eastern'], WeightedSampler([('M-Pesa', 75), ('Airtel Money', 20), ('T-Kash', 5)]))  # Higher Airtel presence
+]
+DEFAULT_PROVIDER_SAMPLER = WeightedSampler([('M-Pesa', 80), ('Airtel Money', 15), ('T-Kash', 5)])
+
+def provider_sampler(county):
+    for counties, sampler in PROVIDER_SAMPLERS:
+        if county in counties:
+            return sampler
+    return DEFAULT_PROVIDER_SAMPLER
+
+# Mobile money transactions
+TRANSACTION_TYPE_SAMPLER = WeightedSampler([('Payment', 40), ('Transfer', 30), ('Withdrawal', 30)])
+PAYMENT_COUNTERPARTY_SAMPLER = WeightedSampler([('Utility Company', 30), ('School Fees', 25), ('Online Shopping', 20), ('Merchant Payment', 25)])
+TRANSFER_COUNTERPARTY_SAMPLER = WeightedSampler([('Family Member', 40), ('Business Partner', 30), ('Friend', 30)])
+# (first hour, extra hours) bands: morning 7-10am, midday 11am-2pm, afternoon 3-7pm, evening 8-11pm
+HOUR_BAND_SAMPLER = WeightedSampler([((7, 3), 30), ((11, 3), 25), ((15, 4), 25), ((20, 3), 20)])
+
+# Loan applications and repayments, keyed by the upper age bound of each band
+LOAN_PURPOSE_SAMPLERS = [
+    (25, WeightedSampler([('School Fees', 50), ('Business Capital', 20), ('Holiday Spending', 15), ('Other', 15)])),
+    (35, WeightedSampler([('Business Capital', 40), ('Household Expenses', 25), ('Rent', 20), ('Other', 15)])),
+    (None, WeightedSampler([('Medical Expenses', 35), ('Family Emergency', 30), ('Business Capital', 20), ('Other', 15)]))
+]
+PAYMENT_TYPE_SAMPLER = WeightedSampler([('full', 60), ('partial', 40)])
+
+def loan_purpose_sampler(age):
+    for max_age, sampler in LOAN_PURPOSE_SAMPLERS:
+        if max_age is None or age < max_age:
+            return sampler
+
+# Credit inquiries
+LENDER_SAMPLER = WeightedSampler([('Commercial Bank', 30), ('Sacco', 25), ('Microfinance', 20), ('Mobile Lender', 25)])
+INQUIRY_PURPOSE_SAMPLER = WeightedSampler([('Loan Application', 40), ('Credit Card', 30), ('Overdraft', 30)])
+INQUIRY_STATUS_SAMPLER = WeightedSampler([('Approved', 40), ('Pending', 30), ('Rejected', 30)])
+
 # Initial data insertion
 def initialize_database():
     """Insert initial data"""
@@ -629,7 +1311,77 @@ def initialize_database():
             conn.rollback()
             raise DatabaseError(f"Database initialization failed: {str(e)}")
 
+#Index management for bulk loads
+# Plain nonclustered indexes only: primary keys and UNIQUE constraints stay enforced during the load
+NONCLUSTERED_INDEX_SQL = """
+    SELECT t.name, i.name
+    FROM sys.indexes i
+    JOIN sys.tables t ON i.object_id = t.object_id
+    WHERE i.type = 2 AND i.is_primary_key = 0 AND i.is_unique_constraint = 0 AND i.is_unique = 0
+      AND t.is_ms_shipped = 0 AND i.is_disabled = ?
+    ORDER BY t.name, i.name
+"""
+
+# Tables only inserted into by the customer, device info and mobile money stages. CustomerCreditInfo
+# is left out: the mobile money stage updates it by CustomerID, which needs IX_CustomerCreditInfo_CustomerID.
+BULK_LOAD_TABLES = ('Customers', 'CustomerDeviceInfo', 'MobileMoneyTransactions')
+
+def disable_nonclustered_indexes(tables=BULK_LOAD_TABLES):
+    """Disable the performance indexes of the insert-only tables so the bulk stages skip index maintenance"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(NONCLUSTERED_INDEX_SQL, 0)
+            indexes = [(table, index) for table, index in cursor.fetchall() if table in tables]
+            for table, index in indexes:
+                cursor.execute(f"ALTER INDEX [{index}] ON [{table}] DISABLE")
+            conn.commit()
+            print(f"Disabled {len(indexes)} nonclustered indexes for bulk loading")
+            return [(table, index) for table, index in indexes]
+        except Exception as e:
+            conn.rollback()
+            raise DatabaseError(f"Failed to disable indexes: {str(e)}")
+
+def rebuild_nonclustered_indexes():
+    """Rebuild every disabled nonclustered index once the insert-only stages are done"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(NONCLUSTERED_INDEX_SQL, 1)
+            indexes = cursor.fetchall()
+            start_time = datetime.datetime.now()
+            for i, (table, index) in enumerate(indexes, 1):
+                cursor.execute(f"ALTER INDEX [{index}] ON [{table}] REBUILD")
+                conn.commit()
+                show_progress(i, len(indexes), start_time, "Rebuilding indexes: ")
+            print(f"\nRebuilt {len(indexes)} nonclustered indexes")
+            return [(table, index) for table, index in indexes]
+        except Exception as e:
+            conn.rollback()
+            raise DatabaseError(f"Failed to rebuild indexes: {str(e)}")
+
 #Customer records
+CUSTOMER_INSERT_SQL = """
+    INSERT INTO Customers (
+        FirstName, LastName, PhoneNumber, IDNumber, DateOfBirth, Gender,
+        County, SubCounty, Town, EmploymentStatus, MonthlyIncome,
+        EducationLevel, MaritalStatus, MobileMoneyProvider,
+        MonthlyMobileMoneyVolume, RegistrationDate, LastActiveDate, IsActive
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+CREDIT_INFO_INSERT_SQL = """
+    INSERT INTO CustomerCreditInfo (
+        CustomerID, CreditScore, PaymentHistoryScore, CreditUtilization,
+        CreditHistoryLength, CreditMixScore, RecentInquiries,
+        TotalLoansTaken, TotalAmountBorrowed, TotalAmountRepaid,
+        ActiveLoans, ActiveLoanAmount, TimesDefaulted, LastDefaultDate, DaysSinceLastDefault,
+        CRBListed, CRBListingDate, CRBListingType, MobileMoneyRepaymentHistory, LastUpdated,
+        TimesOverdrafted, TotalOverdraftFees, OverdraftLimit,
+        CurrentLoanTier, MaxEligibleLoanAmount, ConsecutiveOnTimeRepayments
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
 def generate_customers(count, batch_size=1000):
     print(f"Starting to generate {count} customers with batch size {batch_size}")  
     """Generate customers with batch processing"""
@@ -649,8 +1401,7 @@ def generate_customers(count, batch_size=1000):
             cursor.execute("SELECT PhoneNumber, IDNumber FROM Customers")
             existing_data = cursor.fetchall()
             existing_phones = {row[0] for row in existing_data if row[0]}
-            existing_ids = {row[1] for row in existing_data if row[1]}# Create weighted county list
-            weighted_counties = [(county, data['weight']) for county, data in kenyan_counties.items()]
+            existing_ids = {row[1] for row in existing_data if row[1]}
             
             customers = []
             credit_infos = []
@@ -663,67 +1414,31 @@ def generate_customers(count, batch_size=1000):
             for i in range(1, count + 1):
                 # Basic demographics
                 gender = random.choice(['M', 'F'])
-                county = weighted_choice(weighted_counties)
-                county_data = kenyan_counties[county]
-                subcounty = random.choice(county_data['subcounties'])
-                town = random.choice(county_data['towns'])
+                county = COUNTY_SAMPLER.draw()
+                subcounty = SUBCOUNTY_SAMPLERS[county].draw()
+                town = TOWN_SAMPLERS[county].draw()
                 is_urban = random.random() < kenyan_counties[county]['urban_ratio']
 
                 
                 # Name selection based on gender and origin
-                if county in ['Mombasa', 'Kwale', 'Kilifi', 'Lamu', 'Garissa', 'Wajir', 'Mandera']:
+                if county in MUSLIM_NAME_COUNTIES:
                     # Higher probability of Muslim names in coastal and northeastern counties
-                    if gender == 'M':
-                        first_name = weighted_choice([
-                            (name, 3 if origin == 'Muslim' else 1) 
-                            for name, origin in male_first_names 
-                            if origin in ['Common', 'Muslim']
-                        ])
-                    else:
-                        first_name = weighted_choice([
-                            (name, 3 if origin == 'Muslim' else 1) 
-                            for name, origin in female_first_names 
-                            if origin in ['Common', 'Muslim']
-                        ])
+                    first_name = COASTAL_FIRST_NAME_SAMPLERS[gender].draw()
                 else:
-                    if gender == 'M':
-                        first_name = random.choice(male_first_names)[0]
-                    else:
-                        first_name = random.choice(female_first_names)[0]
+                    first_name = FIRST_NAME_SAMPLERS[gender].draw()
                 
                 # Last name based on county/tribe
-                if county in ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru']:
-                    last_name = random.choice(last_names)[0]
-                elif county in ['Kiambu', 'Murang\'a', 'Nyeri', 'Kirinyaga']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Kikuyu'])
-                elif county in ['Siaya', 'Kisumu', 'Homa Bay', 'Migori']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Luo'])
-                elif county in ['Mombasa', 'Kwale', 'Kilifi', 'Lamu', 'Garissa', 'Wajir', 'Mandera']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Muslim'])
-                elif county in ['Mombasa', 'Kwale', 'Kilifi', 'Lamu', 'Garissa', 'Wajir', 'Mandera']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Somali'])
-                elif county in ['Kakamega', 'Vihiga', 'Bungoma', 'Busia']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Luhya'])
-                elif county in ['Uasin Gishu', 'Nandi', 'Elgeyo-Marakwet', 'Trans-Nzoia']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Kalenjin'])
-                elif county in ['Kitui', 'Machakos', 'Makueni']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Kamba'])
-                elif county in ['Mombasa', 'Kwale', 'Kilifi', 'Lamu']:
-                    last_name = weighted_choice([(name, 1) for name, origin in last_names if origin == 'Mijikenda'])
-                else:
-                    last_name = random.choice(last_names)[0]
+                last_name = LAST_NAME_SAMPLERS[LAST_NAME_ORIGIN_BY_COUNTY.get(county)].draw()
                 
                 # 1. Select age group using weighted choice
-                selected_age_group = weighted_choice([((min_age, max_age), weight) for (min_age, max_age, weight) in age_distribution])
-                min_age, max_age = selected_age_group  # Unpack the age range tuple
+                min_age, max_age = AGE_GROUP_SAMPLER.draw()
 
                 # 2. Generate exact age (skewed younger within groups)
                 age = min_age + int(random.triangular(0, max_age-min_age, (max_age-min_age)*0.3))
                 dob = datetime.date.today() - datetime.timedelta(days=age*365 + random.randint(0, 364))
 
                 # 3. Get employment status based on age group
-                employment_options = employment_by_age[(min_age, max_age)]
-                employment = weighted_choice(employment_options)
+                employment = EMPLOYMENT_SAMPLERS[(min_age, max_age)].draw()
 
                 # 4. Income distribution by age (in KES)
                 if min_age < 25:  # 18-25 group
@@ -772,12 +1487,7 @@ def generate_customers(count, batch_size=1000):
                         monthly_income = 15000 + random.random() * 80000  # Lower rural incomes
                 
                 # Education level
-                education = weighted_choice([
-                    ('Primary', 15),
-                    ('Secondary', 30),
-                    ('College', 30),
-                    ('University', 25)
-                ])
+                education = EDUCATION_SAMPLER.draw()
                 
                 # Marital status based on age
                 if age < 20:
@@ -792,30 +1502,7 @@ def generate_customers(count, batch_size=1000):
                     marital_status = 'Married' if r < 0.7 else ('Widowed' if r < 0.9 else 'Divorced')
                 
                 # Mobile provider by region
-                if county in ['Nairobi', 'Central Kenya']:
-                    mobile_provider = weighted_choice([
-                        ('M-Pesa', 85),  # Safaricom dominance
-                        ('Airtel Money', 12),
-                        ('T-Kash', 3)
-                    ])
-                elif county in ['Western', 'Nyanza']:
-                    mobile_provider = weighted_choice([
-                        ('M-Pesa', 80),
-                        ('Airtel Money', 18),  # Slightly higher Airtel penetration
-                        ('T-Kash', 2)
-                    ])
-                elif county in ['Coastal', 'North Eastern']:
-                    mobile_provider = weighted_choice([
-                        ('M-Pesa', 75),
-                        ('Airtel Money', 20),  # Higher Airtel presence
-                        ('T-Kash', 5)
-                    ])
-                else:
-                    mobile_provider = weighted_choice([
-                        ('M-Pesa', 80),
-                        ('Airtel Money', 15),
-                        ('T-Kash', 5)
-                    ])
+                mobile_provider = provider_sampler(county).draw()
                 
                 mobile_volume = 0 if monthly_income == 0 else monthly_income * (0.1 + random.random() * 0.5)
                 
@@ -890,14 +1577,7 @@ def generate_customers(count, batch_size=1000):
                 # Commit in batches
                 if i % batch_size == 0 or i == count:
                     # Insert customers
-                    cursor.executemany("""
-                        INSERT INTO Customers (
-                            FirstName, LastName, PhoneNumber, IDNumber, DateOfBirth, Gender,
-                            County, SubCounty, Town, EmploymentStatus, MonthlyIncome,
-                            EducationLevel, MaritalStatus, MobileMoneyProvider,
-                            MonthlyMobileMoneyVolume, RegistrationDate, LastActiveDate, IsActive
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, customers)
+                    cursor.executemany(CUSTOMER_INSERT_SQL, customers)
                     
                     # Get the generated customer IDs
                     cursor.execute("SELECT CustomerID FROM Customers WHERE CustomerID > (SELECT ISNULL(MAX(CustomerID), 0) FROM Customers) - ?", (len(customers),))
@@ -910,17 +1590,7 @@ def generate_customers(count, batch_size=1000):
                         )
                     
                     # Insert credit info
-                    cursor.executemany("""
-                        INSERT INTO CustomerCreditInfo (
-                            CustomerID, CreditScore, PaymentHistoryScore, CreditUtilization,
-                            CreditHistoryLength, CreditMixScore, RecentInquiries,
-                            TotalLoansTaken, TotalAmountBorrowed, TotalAmountRepaid,
-                            ActiveLoans, ActiveLoanAmount, TimesDefaulted, LastDefaultDate, DaysSinceLastDefault,
-                            CRBListed, CRBListingDate, CRBListingType, MobileMoneyRepaymentHistory, LastUpdated,
-                            TimesOverdrafted, TotalOverdraftFees, OverdraftLimit,
-                            CurrentLoanTier, MaxEligibleLoanAmount, ConsecutiveOnTimeRepayments
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, credit_infos[len(credit_infos) - len(customers):])
+                    cursor.executemany(CREDIT_INFO_INSERT_SQL, credit_infos[len(credit_infos) - len(customers):])
                     
                     conn.commit()
                     show_progress(i, count, start_time)
@@ -931,227 +1601,831 @@ def generate_customers(count, batch_size=1000):
             conn.rollback()
             raise GenerationError(f"Error generating customers: {str(e)}")
 
+#Vectorized customer engine: whole blocks of customers are drawn as NumPy arrays
+#and only turned into row tuples at the write boundary
+def _draw_unique_numbers(rng, size, low, high, taken):
+    """Draw distinct integers in [low, high) that are not in the sorted array taken"""
+    drawn = np.empty(0, dtype=np.int64)
+    while drawn.size < size:
+        candidates = rng.integers(low, high, size=size - drawn.size)
+        _, first_seen = np.unique(candidates, return_index=True)
+        candidates = candidates[np.sort(first_seen)]
+        pos = np.searchsorted(taken, candidates).clip(max=max(len(taken) - 1, 0))
+        clash = (taken[pos] == candidates) if len(taken) else np.zeros(len(candidates), dtype=bool)
+        clash |= np.isin(candidates, drawn)
+        drawn = np.concatenate([drawn, candidates[~clash]])
+    return drawn
+
+def _reserve_numbers(taken, numbers):
+    """Merge newly used numbers into the sorted array taken"""
+    numbers = np.sort(numbers)
+    return np.insert(taken, np.searchsorted(taken, numbers), numbers)
+
+def generate_customer_block(size, rng, taken_phones, taken_ids, now=None):
+    """Generate a block of customers as NumPy column arrays"""
+    now = now or datetime.datetime.now()
+    today = np.datetime64(now.date(), 'D')
+
+    # Basic demographics
+    county = COUNTY_SAMPLER.sample(size, rng)
+    gender = np.where(rng.random(size) < 0.5, 'M', 'F').astype(object)
+    subcounty = np.empty(size, dtype=object)
+    town = np.empty(size, dtype=object)
+    urban_ratio = np.empty(size)
+    for name in np.unique(county):
+        rows = np.flatnonzero(county == name)
+        subcounty[rows] = SUBCOUNTY_SAMPLERS[name].sample(len(rows), rng)
+        town[rows] = TOWN_SAMPLERS[name].sample(len(rows), rng)
+        urban_ratio[rows] = kenyan_counties[name]['urban_ratio']
+    is_urban = rng.random(size) < urban_ratio
+
+    # Name selection based on gender and origin
+    first_name = np.empty(size, dtype=object)
+    muslim_county = np.isin(county, MUSLIM_NAME_COUNTIES)
+    for sex in ('M', 'F'):
+        coastal = np.flatnonzero((gender == sex) & muslim_county)
+        other = np.flatnonzero((gender == sex) & ~muslim_county)
+        first_name[coastal] = COASTAL_FIRST_NAME_SAMPLERS[sex].sample(len(coastal), rng)
+        first_name[other] = FIRST_NAME_SAMPLERS[sex].sample(len(other), rng)
+
+    last_name = np.empty(size, dtype=object)
+    origin = np.array([LAST_NAME_ORIGIN_BY_COUNTY.get(name) for name in county], dtype=object)
+    for name_origin in set(origin):
+        rows = np.flatnonzero(origin == name_origin)
+        last_name[rows] = LAST_NAME_SAMPLERS[name_origin].sample(len(rows), rng)
+
+    # Age group, exact age (skewed younger within groups) and date of birth
+    group = AGE_GROUP_SAMPLER.indices(size, rng)
+    min_age = np.array([low for low, _, _ in age_distribution])[group]
+    span = np.array([high - low for low, high, _ in age_distribution])[group]
+    age = min_age + rng.triangular(0, span * 0.3, span).astype(int)
+    dob = today - (age * 365 + rng.integers(0, 365, size=size)).astype('timedelta64[D]')
+
+    # Employment status based on age group
+    employment = np.empty(size, dtype=object)
+    for g, age_group in enumerate(AGE_GROUP_SAMPLER.values):
+        rows = np.flatnonzero(group == g)
+        employment[rows] = EMPLOYMENT_SAMPLERS[age_group].sample(len(rows), rng)
+
+    # Income distribution by age and employment (in KES)
+    salaried = np.isin(employment, ['Employed', 'Business Owner'])
+    u, split = rng.random(size), rng.random(size)
+    monthly_income = np.select(
+        [min_age < 25, min_age < 35],
+        [np.select([salaried, employment == 'Student'], [15000 + u * 35000, 2000 + u * 10000], 5000 + u * 15000),
+         np.where(salaried, np.where(split < 0.8, 20000 + u * 30000, 50000 + u * 100000), 10000 + u * 40000)],
+        np.where(salaried, np.where(split < 0.7, 25000 + u * 25000, 50000 + u * 150000), 15000 + u * 60000)
+    )
+    # Adjust income based on urban/rural
+    u = rng.random(size)
+    monthly_income = np.where(salaried & is_urban, 30000 + u * 200000, monthly_income)
+    monthly_income = np.where(salaried & ~is_urban, 15000 + u * 80000, monthly_income)
+
+    education = EDUCATION_SAMPLER.sample(size, rng)
+
+    # Marital status based on age
+    r = rng.random(size)
+    marital_status = np.select(
+        [age < 20, age < 30, age < 50],
+        [np.full(size, 'Single', dtype=object),
+         np.where(r < 0.6, 'Single', 'Married').astype(object),
+         np.where(r < 0.3, 'Single', np.where(r < 0.9, 'Married', 'Divorced')).astype(object)],
+        np.where(r < 0.7, 'Married', np.where(r < 0.9, 'Widowed', 'Divorced')).astype(object)
+    )
+
+    # Mobile provider by region
+    mobile_provider = np.empty(size, dtype=object)
+    unassigned = np.ones(size, dtype=bool)
+    for counties, sampler in PROVIDER_SAMPLERS + [(None, DEFAULT_PROVIDER_SAMPLER)]:
+        rows = np.flatnonzero(unassigned & np.isin(county, counties)) if counties else np.flatnonzero(unassigned)
+        mobile_provider[rows] = sampler.sample(len(rows), rng)
+        unassigned[rows] = False
+
+    mobile_volume = monthly_income * (0.1 + rng.random(size) * 0.5)
+
+    # Unique phone and ID numbers
+    phone_digits = _draw_unique_numbers(rng, size, 0, 10**8, taken_phones)
+    id_digits = _draw_unique_numbers(rng, size, 2 * 10**7, 5 * 10**7, taken_ids)
+
+    # Registration date (last 3 years)
+    now_s = np.datetime64(now.replace(microsecond=0), 's')
+    registration_date = now_s - (rng.integers(0, 1096, size=size) * 86400).astype('timedelta64[s]')
+    last_active = registration_date + (rng.integers(0, 31, size=size) * 86400).astype('timedelta64[s]')
+    is_active = (rng.random(size) > 0.2).astype(np.int8)
+
+    # Credit info
+    credit_score = 300 + rng.triangular(0, 180, 400, size=size).astype(int)
+    credit_score = np.where(monthly_income > 50000, np.minimum(850, credit_score + 100), credit_score)
+
+    return {
+        'FirstName': first_name, 'LastName': last_name,
+        'PhoneNumber': np.char.add('07', np.char.zfill(phone_digits.astype(str), 8)),
+        'IDNumber': id_digits.astype(str),
+        'DateOfBirth': dob, 'Gender': gender, 'County': county, 'SubCounty': subcounty, 'Town': town,
+        'EmploymentStatus': employment, 'MonthlyIncome': monthly_income,
+        'EducationLevel': education, 'MaritalStatus': marital_status, 'MobileMoneyProvider': mobile_provider,
+        'MonthlyMobileMoneyVolume': mobile_volume, 'RegistrationDate': registration_date,
+        'LastActiveDate': last_active, 'IsActive': is_active,
+        'CreditScore': credit_score,
+        'PaymentHistoryScore': 70 + rng.integers(0, 31, size=size),
+        'CreditUtilization': np.round(rng.uniform(0.05, 0.6, size=size), 2),
+        'CreditMixScore': 50 + rng.integers(0, 51, size=size),
+        'MobileMoneyRepaymentHistory': rng.integers(50, 91, size=size),
+        'OverdraftLimit': np.round(np.maximum(500.0, 5000.0 * (credit_score / 700.0)), 2),
+        '_phone_digits': phone_digits, '_id_digits': id_digits
+    }
+
+def customer_block_rows(block):
+    """Turn a customer block into Customers insert tuples"""
+    columns = ['FirstName', 'LastName', 'PhoneNumber', 'IDNumber', 'DateOfBirth', 'Gender',
+               'County', 'SubCounty', 'Town', 'EmploymentStatus', 'MonthlyIncome',
+               'EducationLevel', 'MaritalStatus', 'MobileMoneyProvider',
+               'MonthlyMobileMoneyVolume', 'RegistrationDate', 'LastActiveDate', 'IsActive']
+    return list(zip(*(block[column].tolist() for column in columns)))
+
+def credit_info_block_rows(block, customer_ids, last_updated, initial_max_eligible_amount=1000.00):
+    """Turn a customer block into CustomerCreditInfo insert tuples for the given customer IDs"""
+    rows = []
+    for customer_id, score, history, utilization, mix, mm_history, overdraft_limit in zip(
+            customer_ids, block['CreditScore'].tolist(), block['PaymentHistoryScore'].tolist(),
+            block['CreditUtilization'].tolist(), block['CreditMixScore'].tolist(),
+            block['MobileMoneyRepaymentHistory'].tolist(), block['OverdraftLimit'].tolist()):
+        rows.append((
+            customer_id, score, history, utilization, 0, mix, 0, 0, 0.0, 0.0, 0, 0.0, 0,
+            None, None, 0, None, None, mm_history, last_updated, 0, 0.0, overdraft_limit,
+            0, initial_max_eligible_amount, 0
+        ))
+    return rows
+
+def generate_customers_vectorized(count, batch_size=1000, rng=None):
+    """Generate customers block by block with the vectorized engine"""
+    print(f"Starting to generate {count} customers (vectorized) with block size {batch_size}")
+    rng = rng if rng is not None else np_random
+    start_time = datetime.datetime.now()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        try:
+            cursor.execute("""
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'Customers')
+            BEGIN
+                RAISERROR('Customers table does not exist', 16, 1)
+            END
+            """)
+
+            # Existing phone numbers and ID numbers as sorted digit arrays to avoid duplicates
+            cursor.execute("SELECT PhoneNumber, IDNumber FROM Customers")
+            existing_data = cursor.fetchall()
+            taken_phones = np.unique(np.array(
+                [int(row[0][2:]) for row in existing_data if row[0] and row[0].startswith('07') and row[0][2:].isdigit()],
+                dtype=np.int64))
+            taken_ids = np.unique(np.array(
+                [int(row[1]) for row in existing_data if row[1] and row[1].isdigit()], dtype=np.int64))
+
+            generated = 0
+            while generated < count:
+                size = min(batch_size, count - generated)
+                block = generate_customer_block(size, rng, taken_phones, taken_ids)
+                taken_phones = _reserve_numbers(taken_phones, block['_phone_digits'])
+                taken_ids = _reserve_numbers(taken_ids, block['_id_digits'])
+
+                cursor.executemany(CUSTOMER_INSERT_SQL, customer_block_rows(block))
+                cursor.execute("SELECT CustomerID FROM Customers WHERE CustomerID > (SELECT ISNULL(MAX(CustomerID), 0) FROM Customers) - ? ORDER BY CustomerID", (size,))
+                customer_ids = [row[0] for row in cursor.fetchall()]
+                cursor.executemany(CREDIT_INFO_INSERT_SQL, credit_info_block_rows(
+                    block, customer_ids, datetime.datetime.now().replace(microsecond=0)))
+
+                conn.commit()
+                generated += size
+                show_progress(generated, count, start_time)
+
+            print(f"\nSuccessfully generated {count} customers")
+        except Exception as e:
+            conn.rollback()
+            raise GenerationError(f"Error generating customers: {str(e)}")
+
 #Device Profile
-def generate_device_info():
+DEVICE_INFO_INSERT_SQL = """
+    INSERT INTO CustomerDeviceInfo (
+        CustomerID, DeviceModel, OSVersion, AppVersion,
+        FirstSeenDate, LastSeenDate
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def generate_device_info(batch_rows=50000, queue_batches=4):
+    """Generate one device profile per customer that has none yet
+
+    The writer thread commits batch by batch, so on failure the rows this run wrote (DeviceIDs past
+    the starting maximum) are deleted again; a re-run after a crash that skipped that cleanup only
+    fills in the customers still without a device.
+    """
     with db_connection() as conn:
         cursor = conn.cursor()
+        last_device_id = None
         try:
-            cursor.execute("SELECT COUNT(CustomerID) FROM Customers")
-            total_customers = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT CustomerID, RegistrationDate FROM Customers")
+            cursor.execute("SELECT ISNULL(MAX(DeviceID), 0) FROM CustomerDeviceInfo")
+            last_device_id = cursor.fetchone()[0]
+
+            cursor.execute("""
+                SELECT c.CustomerID, c.RegistrationDate FROM Customers c
+                WHERE NOT EXISTS (SELECT 1 FROM CustomerDeviceInfo d WHERE d.CustomerID = c.CustomerID)
+                ORDER BY c.CustomerID
+            """)
             customers = cursor.fetchall()
+            total_customers = len(customers)
             
             start_time = datetime.datetime.now()
             print(f"Generating device info for {total_customers} customers...")
             
-            for i, (customer_id, reg_date) in enumerate(customers, 1):
-                device_model = random.choice(device_models)
-                
-                if 'iPhone' in device_model:
-                    os_version = random.choice([v for v in os_versions if 'iOS' in v])
-                else:
-                    os_version = random.choice([v for v in os_versions if 'Android' in v])
-                
-                app_version = random.choice(app_versions)
-                last_seen = reg_date + datetime.timedelta(days=random.randint(0, 30))
-                
-                cursor.execute("""
-                    INSERT INTO CustomerDeviceInfo (
-                        CustomerID, DeviceModel, OSVersion, AppVersion,
-                        FirstSeenDate, LastSeenDate
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                """, (customer_id, device_model, os_version, app_version, reg_date, last_seen))
-                
-                # Show progress every 100 records or at the end
-                if i % 100 == 0 or i == total_customers:
-                    show_progress(i, total_customers, start_time, "Devices: ")
+            # Rows are written in batches by a writer thread while the rest are generated
+            pipeline = WritePipeline({'CustomerDeviceInfo': DEVICE_INFO_INSERT_SQL},
+                                     batch_rows=batch_rows, queue_batches=queue_batches)
+            with pipeline:
+                for i, (customer_id, reg_date) in enumerate(customers, 1):
+                    device_model = random.choice(device_models)
+                    
+                    if 'iPhone' in device_model:
+                        os_version = random.choice([v for v in os_versions if 'iOS' in v])
+                    else:
+                        os_version = random.choice([v for v in os_versions if 'Android' in v])
+                    
+                    app_version = random.choice(app_versions)
+                    last_seen = reg_date + datetime.timedelta(days=random.randint(0, 30))
+                    
+                    pipeline.add('CustomerDeviceInfo', (customer_id, device_model, os_version, app_version, reg_date, last_seen))
+                    
+                    # Show progress every 100 records or at the end
+                    if i % 100 == 0 or i == total_customers:
+                        show_progress(i, total_customers, start_time, f"Devices ({pipeline.status()}): ")
             
-            conn.commit()
+            pipeline.report()
             print(f"Generated device info for {total_customers} customers")
         except Exception as e:
             conn.rollback()
+            if last_device_id is not None:
+                try:
+                    cursor.execute("DELETE FROM CustomerDeviceInfo WHERE DeviceID > ?", last_device_id)
+                    conn.commit()
+                except pyodbc.Error as cleanup_error:
+                    print(f"Could not remove the partial device info: {cleanup_error}")
             raise GenerationError(f"Error generating device info: {str(e)}")
 
-#Customer's mobile money transaction history
-def generate_mobile_money_transactions(customer_id, months_back=24, transaction_intensity=3):
-    conn = None
+#Vectorized mobile money simulation
+TRANSACTION_TYPES = np.array(['Deposit', 'Withdrawal', 'Payment', 'Transfer'], dtype=object)
+DEPOSIT, WITHDRAWAL, PAYMENT, TRANSFER = range(4)
+_TRANSACTION_TYPE_CODES = np.array([list(TRANSACTION_TYPES).index(t) for t in TRANSACTION_TYPE_SAMPLER.values])
+URBAN_COUNTIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru']
+PERI_URBAN_COUNTIES = ['Kiambu', 'Machakos', 'Uasin Gishu']
+MAX_OVERDRAFT_LIMIT = 20000
+OVERDRAFT_FEE_RATE = 0.05
+
+MOBILE_MONEY_INSERT_SQL = """
+    INSERT INTO MobileMoneyTransactions (
+        CustomerID, TransactionDate, TransactionType, Amount,
+        Balance, Counterparty, Reference, IsOverdraft, OverdraftFee
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+OVERDRAFT_UPDATE_SQL = """
+    UPDATE CustomerCreditInfo
+    SET TimesOverdrafted = TimesOverdrafted + ?,
+        TotalOverdraftFees = TotalOverdraftFees + ?,
+        LastUpdated = ?
+    WHERE CustomerID = ?
+"""
+
+def apply_overdraft_kernel(opening_balance, amounts, is_debit, valid, overdraft_limit):
+    """Apply the sequential balance, overdraft-limit clamping and overdraft-fee rules.
+
+    Arrays are shaped (rows, slots): one row per customer-day (the balance restarts every day)
+    and one slot per transaction in the order it happens. Only the slot loop is sequential,
+    every row is processed at once.
+    Returns (amount, balance, is_overdraft, overdraft_fee, keep); keep is False for padding
+    slots and for debits skipped because nothing was left to withdraw.
+    """
+    rows, slots = amounts.shape
+    balance = np.asarray(opening_balance, dtype=float).copy()
+    limit = np.broadcast_to(np.asarray(overdraft_limit, dtype=float), (rows,))
+
+    out_amount = np.zeros((rows, slots))
+    out_balance = np.zeros((rows, slots))
+    is_overdraft = np.zeros((rows, slots), dtype=bool)
+    fee = np.zeros((rows, slots))
+    keep = np.zeros((rows, slots), dtype=bool)
+
+    for j in range(slots):
+        amount = amounts[:, j]
+        credit = valid[:, j] & ~is_debit[:, j]
+        debit = valid[:, j] & is_debit[:, j]
+
+        after = balance - amount
+        within = debit & (after >= -limit)
+        # Debits beyond the limit are reduced to the available balance + overdraft
+        clamped = debit & ~within & (balance + limit > 0)
+        overdrawn = (within & (after < 0)) | clamped
+
+        out_amount[:, j] = np.where(clamped, balance + limit, amount)
+        fee[:, j] = np.where(within & (after < 0), -after, np.where(clamped, limit, 0.0)) * OVERDRAFT_FEE_RATE
+        balance = np.where(credit, balance + amount, np.where(within, after, np.where(clamped, -limit, balance)))
+
+        out_balance[:, j] = balance
+        is_overdraft[:, j] = overdrawn
+        keep[:, j] = credit | within | clamped
+
+    return out_amount, out_balance, is_overdraft, fee, keep
+
+class SharedStream:
+    """Cohort-wide uniform draws from one NumPy Generator"""
+    def __init__(self, rng):
+        self.rng = rng
+
+    def random(self, counts, shape=()):
+        return self.rng.random((int(np.sum(counts)),) + shape)
+
+class CustomerStreams:
+    """Cohort-wide uniform draws with each customer's part taken from its own seeded stream
+
+    random(counts, shape) lays the draws out customer by customer (counts[i] items for the i-th
+    customer), like the rows of simulate_mobile_money, so a customer's values never depend on
+    which cohort or shard it is simulated in.
+    """
+    def __init__(self, run_seed, customer_ids):
+        self.streams = [customer_rng(run_seed, customer_id) for customer_id in customer_ids]
+
+    def random(self, counts, shape=()):
+        parts = [stream.random((int(count),) + shape) for stream, count in zip(self.streams, counts)]
+        return np.concatenate(parts) if parts else np.empty((0,) + shape)
+
+def simulate_mobile_money(profiles, start_date, end_date, rng, transaction_intensity=3):
+    """Simulate daily mobile money activity for a cohort of customers as column arrays.
+
+    profiles: sequence of (CustomerID, MobileMoneyProvider, MonthlyMobileMoneyVolume, County,
+    EmploymentStatus, CreditScore, OverdraftLimit) tuples.
+    rng: a NumPy Generator shared by the cohort, or CustomerStreams for per-customer streams.
+    Every draw is sized per customer from that customer's own data (days, a fixed number of slots
+    per day, its kept transactions), which is what keeps CustomerStreams output cohort-independent.
+    Returns (columns, times_overdrafted, total_overdraft_fees); the totals are aligned with profiles.
+    """
+    streams = rng if isinstance(rng, CustomerStreams) else SharedStream(rng)
+    customer_ids, providers, volumes, counties, employments, scores, limits = (list(c) for c in zip(*profiles))
+    n_customers = len(customer_ids)
+    volumes = np.array([float(v) if v else 0.0 for v in volumes])
+    limits = np.array([float(l) if l else 0.0 for l in limits])
+    scores = np.array(scores, dtype=float)
+    employed = np.array([e == 'Employed' for e in employments])
+
+    # Adjust overdraft limit based on credit score
+    overdraft_limit = np.maximum(0, np.minimum(limits * (scores / 700), MAX_OVERDRAFT_LIMIT))
+    counties = np.array(counties, dtype=object)
+    is_urban = np.isin(counties, URBAN_COUNTIES) | (np.isin(counties, PERI_URBAN_COUNTIES) &
+                                                    (streams.random(np.ones(n_customers)) > 0.3))
+
+    # One row per customer-day
+    n_days = (end_date - start_date) // datetime.timedelta(days=1) + 1
+    days = np.datetime64(start_date.date(), 'D') + np.arange(n_days)
+    weekday = (days.astype(np.int64) + 3) % 7
+    day_of_month = (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+    row_customer = np.repeat(np.arange(n_customers), n_days)
+    row_day = np.tile(np.arange(n_days), n_customers)
+
+    # Weekends are quieter, month end is busier
+    daily_multiplier = np.where(weekday >= 5, 0.7, 1.0) * np.where(day_of_month >= 25, 1.5, 1.0)
+    customer_days = np.full(n_customers, n_days)
+    day_draws = streams.random(customer_days, (2,))
+    # Slots for the busiest possible day (month end, top of the noise), the same for every cohort
+    slots = int(np.ceil(transaction_intensity * 1.5 * 1.2))
+    daily_transactions = np.ceil(transaction_intensity * daily_multiplier[row_day] * (0.8 + day_draws[:, 0] * 0.4)).astype(int)
+    np.minimum(daily_transactions, slots, out=daily_transactions)
+    daily_transactions[volumes[row_customer] <= 0] = 0
+    opening_balance = 500.0 + day_draws[:, 1] * 5000.0
+
+    valid = np.arange(slots) < daily_transactions[:, None]
+    slot_draws = streams.random(customer_days, (slots, 4))
+
+    # Transaction type (salary deposits at month end for the employed)
+    salary = employed[row_customer, None] & (day_of_month[row_day, None] >= 25) & (slot_draws[:, :, 0] > 0.7)
+    trans_type = np.where(salary, DEPOSIT, _TRANSACTION_TYPE_CODES[TRANSACTION_TYPE_SAMPLER.indices_from(slot_draws[:, :, 1])])
+
+    # Amount based on type, adjusted to the customer's typical volume
+    u = slot_draws[:, :, 2]
+    urban = is_urban[row_customer, None]
+    amount = np.select(
+        [trans_type == DEPOSIT, trans_type == WITHDRAWAL, trans_type == PAYMENT],
+        [np.where(employed[row_customer, None], 10000.0 + u * 50000.0, 500.0 + u * 5000.0),
+         np.where(urban, 200.0 + u * 3000.0, 100.0 + u * 2000.0),
+         50.0 + u * 5000.0],
+        100.0 + u * 3000.0
+    ) * (0.8 + slot_draws[:, :, 3] * 0.4)
+
+    amount, balance, is_overdraft, overdraft_fee, keep = apply_overdraft_kernel(
+        opening_balance, amount, (trans_type == WITHDRAWAL) | (trans_type == PAYMENT),
+        valid, overdraft_limit[row_customer])
+
+    # Flatten the kept slots into transaction columns
+    row_idx, _ = np.nonzero(keep)
+    cust_idx = row_customer[row_idx]
+    trans_type = trans_type[keep]
+    # Rows are customer-major, so the kept transactions are grouped by customer too
+    transaction_draws = streams.random(np.bincount(cust_idx, minlength=n_customers), (6,))
+
+    counterparty = np.where(employed[cust_idx], 'Employer', 'Bank Account').astype(object)
+    counterparty[trans_type == WITHDRAWAL] = 'Agent'
+    payments = np.flatnonzero(trans_type == PAYMENT)
+    counterparty[payments] = PAYMENT_COUNTERPARTY_SAMPLER.sample_from(transaction_draws[payments, 0])
+    transfers = np.flatnonzero(trans_type == TRANSFER)
+    counterparty[transfers] = TRANSFER_COUNTERPARTY_SAMPLER.sample_from(transaction_draws[transfers, 0])
+
+    # Random time of day (more during daytime)
+    band = HOUR_BAND_SAMPLER.indices_from(transaction_draws[:, 1])
+    first_hour = np.array([h for h, _ in HOUR_BAND_SAMPLER.values])[band]
+    extra_hours = np.array([e for _, e in HOUR_BAND_SAMPLER.values])[band]
+    hour = first_hour + (transaction_draws[:, 2] * (extra_hours + 1)).astype(np.int64)
+    seconds = (hour * 3600 + (transaction_draws[:, 3] * 60).astype(np.int64) * 60
+               + (transaction_draws[:, 4] * 60).astype(np.int64))
+    transaction_date = days[row_day[row_idx]].astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+
+    type_names = TRANSACTION_TYPES[trans_type]
+    provider_prefix = np.array([(p or '')[:3] for p in providers], dtype=str)[cust_idx]
+    reference = np.char.add(np.char.add(np.char.add(provider_prefix, '_'), np.array([t[:2] for t in TRANSACTION_TYPES])[trans_type]),
+                            np.char.add('_', (100000000 + (transaction_draws[:, 5] * 900000000).astype(np.int64)).astype(str)))
+
+    is_overdraft = is_overdraft[keep]
+    overdraft_fee = overdraft_fee[keep]
+    columns = {
+        'CustomerID': np.array(customer_ids)[cust_idx],
+        'TransactionDate': transaction_date,
+        'TransactionType': type_names,
+        'Amount': amount[keep],
+        'Balance': balance[keep],
+        'Counterparty': counterparty,
+        'Reference': reference,
+        'IsOverdraft': is_overdraft,
+        'OverdraftFee': overdraft_fee
+    }
+    times_overdrafted = np.bincount(cust_idx, weights=is_overdraft, minlength=n_customers).astype(int)
+    total_overdraft_fees = np.bincount(cust_idx, weights=overdraft_fee, minlength=n_customers)
+    return columns, times_overdrafted, total_overdraft_fees
+
+class MonthlyActivityRollup:
+    """Accumulates CustomerMonthlyActivity deltas from simulated transactions and merges them in one statement"""
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, columns):
+        """Fold a batch of simulated mobile money columns into per customer-month totals"""
+        if not len(columns['CustomerID']):
+            return
+        customer_ids = columns['CustomerID'].astype(np.int64)
+        months = columns['TransactionDate'].astype('datetime64[M]').astype(np.int64)
+        keys, inverse = np.unique(np.stack([customer_ids, months], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        deposit = columns['TransactionType'] == 'Deposit'
+        # Amounts are stored as DECIMAL(20,2), so sum what the table will hold
+        overdrafts = np.bincount(inverse, weights=columns['IsOverdraft'], minlength=len(keys))
+        deposit_sums = np.bincount(inverse, weights=np.where(deposit, np.round(columns['Amount'], 2), 0.0), minlength=len(keys))
+        deposit_counts = np.bincount(inverse, weights=deposit, minlength=len(keys))
+        for (customer_id, month), overdraft_count, deposit_sum, deposit_count in zip(
+                keys.tolist(), overdrafts.tolist(), deposit_sums.tolist(), deposit_counts.tolist()):
+            totals = self.totals.setdefault((customer_id, month), [0, 0.0, 0])
+            totals[0] += int(overdraft_count)
+            totals[1] += deposit_sum
+            totals[2] += int(deposit_count)
+
+    def add_rows(self, rows):
+        """Fold MobileMoneyTransactions insert tuples (see mobile_money_rows) into the totals"""
+        if not rows:
+            return
+        customer_ids, dates, types, amounts, _, _, _, is_overdraft, _ = zip(*rows)
+        self.add({'CustomerID': np.array(customer_ids), 'TransactionDate': np.array(dates, dtype='datetime64[us]'),
+                  'TransactionType': np.array(types, dtype=object), 'Amount': np.array(amounts, dtype=float),
+                  'IsOverdraft': np.array(is_overdraft, dtype=float)})
+
+    def write(self, cursor):
+        """Add the accumulated deltas to CustomerMonthlyActivity (insert new customer-months, increment existing ones)"""
+        if not self.totals:
+            return 0
+        cursor.execute("""
+            CREATE TABLE #ActivityDelta (
+                CustomerID INT NOT NULL,
+                MonthStart DATE NOT NULL,
+                OverdraftCount INT NOT NULL,
+                DepositSum DECIMAL(20,2) NOT NULL,
+                DepositCount INT NOT NULL,
+                PRIMARY KEY (CustomerID, MonthStart)
+            )
+        """)
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany(
+                "INSERT INTO #ActivityDelta (CustomerID, MonthStart, OverdraftCount, DepositSum, DepositCount) VALUES (?, ?, ?, ?, ?)",
+                [(customer_id, np.datetime64(month, 'M').astype('datetime64[D]').item(), overdraft_count, round(deposit_sum, 2), deposit_count)
+                 for (customer_id, month), (overdraft_count, deposit_sum, deposit_count) in self.totals.items()])
+            cursor.execute("""
+                MERGE CustomerMonthlyActivity WITH (HOLDLOCK) AS target
+                USING #ActivityDelta AS delta
+                    ON target.CustomerID = delta.CustomerID AND target.MonthStart = delta.MonthStart
+                WHEN MATCHED THEN UPDATE SET
+                    OverdraftCount = target.OverdraftCount + delta.OverdraftCount,
+                    DepositSum = target.DepositSum + delta.DepositSum,
+                    DepositCount = target.DepositCount + delta.DepositCount
+                WHEN NOT MATCHED THEN
+                    INSERT (CustomerID, MonthStart, OverdraftCount, DepositSum, DepositCount)
+                    VALUES (delta.CustomerID, delta.MonthStart, delta.OverdraftCount, delta.DepositSum, delta.DepositCount);
+            """)
+        finally:
+            cursor.execute("DROP TABLE #ActivityDelta")
+        written = len(self.totals)
+        self.totals = {}
+        return written
+
+def mobile_money_rows(columns):
+    """Turn simulated mobile money columns into MobileMoneyTransactions insert tuples"""
+    names = ['CustomerID', 'TransactionDate', 'TransactionType', 'Amount',
+             'Balance', 'Counterparty', 'Reference', 'IsOverdraft', 'OverdraftFee']
+    return list(zip(*(columns[name].tolist() for name in names)))
+
+def write_activity_rollup(cursor, rows):
+    """Merge the monthly activity of a batch of inserted transactions (WritePipeline before_commit hook)"""
+    rollup = MonthlyActivityRollup()
+    rollup.add_rows(rows)
+    rollup.write(cursor)
+
+def customer_rng(run_seed, customer_id):
+    """Independent, reproducible random stream for one customer within a run"""
+    return np.random.default_rng([run_seed, int(customer_id)])
+
+def simulate_mobile_money_shard(profiles, start_date, end_date, run_seed, transaction_intensity=3):
+    """Simulate a shard of customers in one cohort-wide pass, each on its own seeded stream
+
+    The output depends only on run_seed and the customer IDs, never on how customers were sharded.
+    """
+    streams = CustomerStreams(run_seed, [profile[0] for profile in profiles])
+    return simulate_mobile_money(profiles, start_date, end_date, streams, transaction_intensity)
+
+def bounded_map(executor, fn, items, window, *args):
+    """executor.map in submission order, with at most `window` tasks submitted and not yet consumed
+
+    Results are only produced as fast as the caller consumes them, so a slow consumer holds
+    back the workers instead of letting finished results pile up.
+    """
+    pending = deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item, *args))
+    while pending:
+        yield pending.popleft().result()
+
+def generate_mobile_money_stage(months_back=24, transaction_intensity=3, flush_rows=50000, cohort_size=100, rng=None,
+                                workers=1, run_seed=None, queue_batches=4):
+    """Generate mobile money for all active customers, writing through a WritePipeline
+
+    Transactions and overdraft updates go onto bounded queues drained by one writer thread per table,
+    so the simulation of the next cohorts overlaps the inserts. Each transaction batch merges its
+    CustomerMonthlyActivity delta in the same transaction, so the rollup never drifts from the rows
+    committed, even when the stage fails part way. With a run_seed every customer gets its
+    own stream, so the output is the same for any number of workers; workers > 1 shards the simulation
+    across a process pool feeding the pipeline.
+    """
+    rng = rng if rng is not None else np_random
+    workers = workers if workers > 0 else os.cpu_count()
+    if workers > 1 and run_seed is None:
+        raise ValueError("Parallel mobile money generation needs a run seed")
+    executor = None
     with db_connection() as conn:
         cursor = conn.cursor()
         try:
-        
             start_date = datetime.datetime.now() - datetime.timedelta(days=730)  # 2 years back
             end_date = datetime.datetime.now() - datetime.timedelta(days=365)    # 1 year back
-            current_date = start_date
-            
-            # Get customer details
-            cursor.execute("""
-                SELECT MobileMoneyProvider, MonthlyMobileMoneyVolume, County, EmploymentStatus
-                FROM Customers WHERE CustomerID = ?
-            """, customer_id)
-            provider, monthly_volume, county, employment = cursor.fetchone()
-            
-            cursor.execute("SELECT CreditScore, OverdraftLimit FROM CustomerCreditInfo WHERE CustomerID = ?", customer_id)
-            credit_score, overdraft_limit = cursor.fetchone()
-            
-            # Convert decimal values to float for calculations
-            monthly_volume = float(monthly_volume) if monthly_volume else 0.0
-            overdraft_limit = float(overdraft_limit) if overdraft_limit else 0.0
-            
-            # Adjust overdraft limit based on credit score
-            overdraft_limit = max(0, min(
-                overdraft_limit * (credit_score / 700),
-                20000  # Max overdraft limit
-            ))
-            
-            # Determine if urban
-            is_urban = county in ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru'] or (
-                county in ['Kiambu', 'Machakos', 'Uasin Gishu'] and random.random() > 0.3
-            )
-            
-            # Base transaction values
-            base_daily = transaction_intensity
-            
-            # Track overdraft usage
-            total_overdraft_fees = 0.0
-            times_overdrafted = 0
-            
-            # Generate daily transactions
-            while current_date <= end_date:
-                # Adjust for day of week
-                daily_multiplier = 0.7 if current_date.weekday() in [5, 6] else 1.0
-                
-                # More activity at month end
-                if current_date.day >= 25:
-                    daily_multiplier *= 1.5
-                
-                # Calculate transactions for this day
-                daily_transactions = math.ceil(base_daily * daily_multiplier * (0.8 + random.random() * 0.4))
-                
-                # Starting balance
-                balance = 500.0 + random.random() * 5000.0
-                daily_overdraft_fees = 0.0
-                
-                while daily_transactions > 0 and monthly_volume > 0:
-                    # Determine transaction type
-                    if employment == 'Employed' and current_date.day >= 25 and random.random() > 0.7:
-                        trans_type = 'Deposit'  # Salary deposit
-                    else:
-                        trans_type = weighted_choice([
-                            ('Payment', 40),
-                            ('Transfer', 30),
-                            ('Withdrawal', 30)
-                        ])
-                    
-                    # Generate amount based on type
-                    if trans_type == 'Deposit':
-                        amount = 10000.0 + random.random() * 50000.0 if employment == 'Employed' else 500.0 + random.random() * 5000.0
-                    elif trans_type == 'Withdrawal':
-                        amount = 200.0 + random.random() * 3000.0 if is_urban else 100.0 + random.random() * 2000.0
-                    else:  # Payment or transfer
-                        amount = 50.0 + random.random() * 5000.0 if trans_type == 'Payment' else 100.0 + random.random() * 3000.0
-                    
-                    # Adjust amount to customer's typical volume
-                    amount *= (0.8 + random.random() * 0.4)
-                    
-                    # Generate counterparty
-                    if trans_type == 'Payment':
-                        counterparty = weighted_choice([
-                            ('Utility Company', 30),
-                            ('School Fees', 25),
-                            ('Online Shopping', 20),
-                            ('Merchant Payment', 25)
-                        ])
-                    elif trans_type == 'Transfer':
-                        counterparty = weighted_choice([
-                            ('Family Member', 40),
-                            ('Business Partner', 30),
-                            ('Friend', 30)
-                        ])
-                    elif trans_type == 'Withdrawal':
-                        counterparty = 'Agent'
-                    else:  # Deposit
-                        counterparty = 'Employer' if employment == 'Employed' else 'Bank Account'
-                    
-                    # Generate random hour (more during daytime)
-                    hour = weighted_choice([
-                        (7 + random.randint(0, 3), 30),  # Morning (7-10am)
-                        (11 + random.randint(0, 3), 25),  # Midday (11am-2pm)
-                        (15 + random.randint(0, 4), 25),  # Afternoon (3-7pm)
-                        (20 + random.randint(0, 3), 20)   # Evening (8-11pm)
-                    ])
-                    
-                    # Process transaction with overdraft
-                    is_overdraft = False
-                    overdraft_fee = 0.0
-                    
-                    if trans_type in ['Deposit', 'Transfer']:
-                        balance += amount
-                    else:  # Withdrawal or Payment
-                        if (balance - amount) >= -overdraft_limit:
-                            # Check for overdraft
-                            if (balance - amount) < 0:
-                                is_overdraft = True
-                                overdraft_amount = abs(balance - amount)
-                                overdraft_fee = overdraft_amount * 0.05  # 5% fee
-                                daily_overdraft_fees += overdraft_fee
-                                times_overdrafted += 1
-                            
-                            balance -= amount
-                        else:
-                            # Reduce amount to available balance + overdraft
-                            amount = balance + overdraft_limit
-                            
-                            if amount > 0:
-                                is_overdraft = True
-                                overdraft_amount = abs(balance - amount)
-                                overdraft_fee = overdraft_amount * 0.05
-                                daily_overdraft_fees += overdraft_fee
-                                times_overdrafted += 1
-                                balance -= amount
-                            else:
-                                # Skip transaction if no available balance
-                                daily_transactions -= 1
-                                continue
-                    
-                    # Insert transaction
-                    if amount > 0:
-                        trans_date = current_date.replace(
-                            hour=hour,
-                            minute=random.randint(0, 59),
-                            second=random.randint(0, 59)
-                        )
-                        
-                        reference = f"{provider[:3]}_{trans_type[:2]}_{random.randint(100000000, 999999999)}"
-                        
-                        cursor.execute("""
-                            INSERT INTO MobileMoneyTransactions (
-                                CustomerID, TransactionDate, TransactionType, Amount,
-                                Balance, Counterparty, Reference, IsOverdraft, OverdraftFee
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
-                            customer_id, trans_date, trans_type, float(amount),
-                            float(balance), counterparty, reference, is_overdraft, float(overdraft_fee)
-                        ))
-                    
-                    daily_transactions -= 1
-                
-                total_overdraft_fees += daily_overdraft_fees
-                current_date += datetime.timedelta(days=1)
-            
-            # Update overdraft info in credit record
+
+            # All customer profiles in one round trip
             cursor.execute("""
-                UPDATE CustomerCreditInfo
-                SET TimesOverdrafted = TimesOverdrafted + ?,
-                    TotalOverdraftFees = TotalOverdraftFees + ?,
-                    LastUpdated = ?
-                WHERE CustomerID = ?
-            """, (times_overdrafted, total_overdraft_fees, datetime.datetime.now(), customer_id))
-        
-            conn.commit()
+                SELECT c.CustomerID, c.MobileMoneyProvider, c.MonthlyMobileMoneyVolume, c.County, c.EmploymentStatus,
+                       cci.CreditScore, cci.OverdraftLimit
+                FROM Customers c JOIN CustomerCreditInfo cci ON c.CustomerID = cci.CustomerID
+                WHERE c.IsActive = 1
+                ORDER BY c.CustomerID
+            """)
+            profiles = [tuple(row) for row in cursor.fetchall()]
+            print(f"Generating mobile money transactions for {len(profiles)} active customers...")
+
+            start_time = datetime.datetime.now()
+            cohorts = [profiles[i:i + cohort_size] for i in range(0, len(profiles), cohort_size)]
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            if executor is not None:
+                print(f"Simulating across {workers} worker processes")
+                # Shards come back in submission order, so the write order is fixed too
+                results = bounded_map(executor, simulate_mobile_money_shard, cohorts, 2 * workers,
+                                      start_date, end_date, run_seed, transaction_intensity)
+            elif run_seed is not None:
+                results = (simulate_mobile_money_shard(cohort, start_date, end_date, run_seed, transaction_intensity)
+                           for cohort in cohorts)
+            else:
+                results = (simulate_mobile_money(cohort, start_date, end_date, rng, transaction_intensity)
+                           for cohort in cohorts)
+
+            pipeline = WritePipeline({'MobileMoneyTransactions': MOBILE_MONEY_INSERT_SQL,
+                                      'CustomerCreditInfo': OVERDRAFT_UPDATE_SQL},
+                                     batch_rows=flush_rows, queue_batches=queue_batches,
+                                     before_commit={'MobileMoneyTransactions': write_activity_rollup})
+            done = 0
+            with pipeline:
+                for cohort, (columns, times_overdrafted, total_overdraft_fees) in zip(cohorts, results):
+                    pipeline.extend('MobileMoneyTransactions', mobile_money_rows(columns))
+
+                    # Update overdraft info in credit records
+                    updated_at = datetime.datetime.now()
+                    pipeline.extend('CustomerCreditInfo', [
+                        (times, fees, updated_at, profile[0])
+                        for profile, times, fees in zip(cohort, times_overdrafted.tolist(), total_overdraft_fees.tolist())])
+                    done += len(cohort)
+                    show_progress(done, len(profiles), start_time, f"Mobile Money ({pipeline.status()}): ")
+
+            pipeline.report()
         except Exception as e:
             conn.rollback()
-            raise
+            raise GenerationError(f"Error generating mobile money transactions: {str(e)}")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+#In-memory credit state for the application stage
+class CreditStateStore:
+    """Credit state for every customer, loaded once; approvals are applied in memory and flushed in batches"""
+    def __init__(self):
+        self.state = {}
+        self.pending = {}
+
+    def load(self, cursor):
+        """Load first-time flag and credit info for all customers in one query"""
+        cursor.execute("""
+            SELECT cci.CustomerID, cci.CreditScore, cci.ActiveLoans, cci.CurrentLoanTier,
+                   cci.MaxEligibleLoanAmount, cci.ConsecutiveOnTimeRepayments,
+                   CASE WHEN b.CustomerID IS NULL THEN 1 ELSE 0 END AS IsFirstTime
+            FROM CustomerCreditInfo cci
+            LEFT JOIN (
+                SELECT DISTINCT la.CustomerID
+                FROM LoanApplications la JOIN Loans l ON la.ApplicationID = l.ApplicationID
+                WHERE la.Status = 'Approved'
+            ) b ON b.CustomerID = cci.CustomerID
+        """)
+        self.state = {
+            row[0]: {
+                'credit_score': row[1],
+                'active_loans': row[2],
+                'current_loan_tier': row[3],
+                'max_eligible_loan_amount': row[4],
+                'consecutive_on_time_repayments': row[5],
+                'is_first_time': row[6]
+            }
+            for row in cursor.fetchall()
+        }
+        self.pending = {}
+        return len(self.state)
+
+    def get(self, customer_id):
+        return self.state.get(customer_id)
+
+    def record_approval(self, customer_id, principal):
+        """Apply a newly disbursed loan to the in-memory state and queue the credit info update"""
+        state = self.state[customer_id]
+        state['is_first_time'] = 0
+        state['active_loans'] = (state['active_loans'] or 0) + 1
+        loans, amount = self.pending.get(customer_id, (0, 0.0))
+        self.pending[customer_id] = (loans + 1, amount + principal)
+
+    def flush(self, cursor):
+        """Write all queued approvals to CustomerCreditInfo in one batch"""
+        if not self.pending:
+            return 0
+        updated_at = datetime.datetime.now()
+        cursor.fast_executemany = True
+        cursor.executemany("""
+            UPDATE CustomerCreditInfo
+            SET TotalLoansTaken = ISNULL(TotalLoansTaken, 0) + ?,
+                TotalAmountBorrowed = ISNULL(TotalAmountBorrowed, 0) + ?,
+                ActiveLoans = ISNULL(ActiveLoans, 0) + ?,
+                ActiveLoanAmount = ISNULL(ActiveLoanAmount, 0) + ?,
+                -- CreditUtilization might be better calculated separately or based on a limit
+                RecentInquiries = ISNULL(RecentInquiries, 0) + ?,
+                CreditHistoryLength = ISNULL(CreditHistoryLength, 0) + ?, -- Increment a simple counter for months/loans
+                LastUpdated = ?
+            WHERE CustomerID = ?
+        """, [(loans, amount, loans, amount, loans, loans, updated_at, customer_id)
+              for customer_id, (loans, amount) in self.pending.items()])
+        flushed = len(self.pending)
+        self.pending = {}
+        return flushed
+
+#Loan product catalog for the application stage
+class LoanProductCatalog:
+    """LoanProducts loaded once, indexed for eligibility lookups without touching the database"""
+    def __init__(self, products):
+        # products: (ProductID, ProductName, MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate, IsFirstTime)
+        self.products = {}
+        first_time, regular = [], []
+        for product_id, name, min_amount, max_amount, min_term, max_term, proc_fee, int_rate, is_first_time in products:
+            row = (product_id, float(min_amount), float(max_amount), min_term, max_term, float(proc_fee), float(int_rate))
+            self.products[product_id] = row
+            if name == 'First Time Loan':
+                first_time.append(row)
+            if not is_first_time:
+                regular.append(row)
+
+        # First time loans by MaxAmount: eligible products are a prefix
+        self.first_time = sorted(first_time, key=lambda row: row[2])
+        self.first_time_max = [row[2] for row in self.first_time]
+
+        # Regular products by MinAmount: eligible products are a prefix, and the best
+        # candidates (largest MaxAmount) for each prefix are precomputed
+        self.regular = sorted(regular, key=lambda row: row[1])
+        self.regular_min = [row[1] for row in self.regular]
+        self.regular_best = []
+        best = []
+        for row in self.regular:
+            if not best or row[2] > best[0][2]:
+                best = [row]
+            elif row[2] == best[0][2]:
+                best = best + [row]
+            self.regular_best.append(best)
+
+    @classmethod
+    def load(cls, cursor):
+        cursor.execute("""
+            SELECT ProductID, ProductName, MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate, IsFirstTime
+            FROM LoanProducts
+        """)
+        return cls(cursor.fetchall())
+
+    def __len__(self):
+        return len(self.products)
+
+    def select(self, current_loan_tier, max_eligible_loan_amount, rng=random):
+        """Pick a product for a customer's tier and eligible amount, or None if nothing fits"""
+        if current_loan_tier == 0:
+            # Even the first time loan must be within their absolute max; otherwise fall back to any first time loan
+            eligible = bisect.bisect_right(self.first_time_max, max_eligible_loan_amount)
+            if eligible:
+                return rng.choice(self.first_time[:eligible])
+            return rng.choice(self.first_time) if self.first_time else None
+
+        # Higher tiers: products whose MinAmount is within reach, prioritising the largest MaxAmount
+        eligible = bisect.bisect_right(self.regular_min, max_eligible_loan_amount)
+        if eligible:
+            return rng.choice(self.regular_best[eligible - 1])
+        return None
+
+#Set-based writer for applications and their loans
+class LoanApplicationWriter:
+    """Buffers applications (and loans for approved ones) and writes them as two batches with pre-allocated IDs"""
+    def __init__(self, conn, flush_rows=10000):
+        self.cursor = conn.cursor()
+        self.cursor.fast_executemany = True
+        self.flush_rows = flush_rows
+        self.applications = []
+        self.loans = []
+        self.applications_written = 0
+        self.loans_written = 0
+
+    def add(self, application, loan=None):
+        """Queue an application row (without ApplicationID) and optionally its loan row (without ApplicationID)
+
+        Never writes: the caller flushes once full() is true, outside any per-application error handling,
+        so a failed batch insert stops the stage instead of passing for one skipped application.
+        """
+        if loan is not None:
+            self.loans.append((len(self.applications), loan))
+        self.applications.append(application)
+
+    def full(self):
+        return len(self.applications) >= self.flush_rows
+
+    def flush(self):
+        """Reserve an ApplicationID range and insert the buffered applications and loans; the caller commits"""
+        if not self.applications:
+            return 0
+        cursor = self.cursor
+        # The exclusive lock is held until the caller commits, so the reserved range cannot be taken by another session
+        cursor.execute("SELECT ISNULL(MAX(ApplicationID), 0) FROM LoanApplications WITH (TABLOCKX, HOLDLOCK)")
+        first_id = cursor.fetchone()[0] + 1
+
+        cursor.execute("SET IDENTITY_INSERT LoanApplications ON")
+        try:
+            cursor.executemany(""" INSERT INTO LoanApplications (ApplicationID, CustomerID, ProductID, ApplicationDate, AmountRequested, TermDays, Purpose, Status, StatusDate, RejectionReason, DeviceUsed, IPAddress) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) """,
+                               [(first_id + i,) + application for i, application in enumerate(self.applications)])
+        finally:
+            cursor.execute("SET IDENTITY_INSERT LoanApplications OFF")
+
+        if self.loans:
+            cursor.executemany(""" INSERT INTO Loans (ApplicationID, DisbursementDate, PrincipalAmount, InterestAmount, ProcessingFee, TotalRepayable, DueDate, Status) VALUES (?, ?, ?, ?, ?, ?, ?, ?) """,
+                               [(first_id + i,) + loan for i, loan in self.loans])
+
+        written = len(self.applications)
+        self.applications_written += written
+        self.loans_written += len(self.loans)
+        self.applications = []
+        self.loans = []
+        return written
 
 #Core business logic of the lending application
 def generate_loan_applications(start_date, end_date, apps_per_day):
@@ -1173,9 +2447,11 @@ def generate_loan_applications(start_date, end_date, apps_per_day):
             if cursor.fetchone()[0] == 0: raise ValueError("No loan products found")
             cursor.execute("SELECT c.CustomerID, DATEDIFF(YEAR, c.DateOfBirth, GETDATE()) AS age, c.County FROM Customers c")
             rows = cursor.fetchall(); customers = [(row[0], row[1], row[2]) for row in rows] if rows else []
-            cursor.execute("SELECT ProductID FROM LoanProducts")
-            product_ids = [row[0] for row in cursor.fetchall()]
-            if not customers or not product_ids: raise GenerationError("No customers or products found")
+            catalog = LoanProductCatalog.load(cursor)
+            if not customers or not len(catalog): raise GenerationError("No customers or products found")
+            credit_store = CreditStateStore()
+            application_writer = LoanApplicationWriter(conn)
+            print(f"Loaded credit state for {credit_store.load(cursor)} customers")
 
             current_date = start_date
             # <<<--- START Generation Loop ---<<<
@@ -1193,71 +2469,33 @@ def generate_loan_applications(start_date, end_date, apps_per_day):
                     try:
                         customer_id, age, county = random.choice(customers)
 
-                        # Check if first time borrower
-                        cursor.execute("SELECT CASE WHEN EXISTS (SELECT 1 FROM LoanApplications la JOIN Loans l ON la.ApplicationID = l.ApplicationID WHERE la.CustomerID = ? AND la.Status = 'Approved') THEN 0 ELSE 1 END", customer_id)
-                        is_first_time = cursor.fetchone()[0]
-
-                        #Fetch current loan eligibility and other credit info ---
-                        cursor.execute("""
-                            SELECT CreditScore, ActiveLoans, CurrentLoanTier, MaxEligibleLoanAmount, ConsecutiveOnTimeRepayments 
-                            FROM CustomerCreditInfo WHERE CustomerID = ?
-                        """, customer_id)
-                        credit_info_row = cursor.fetchone()
+                        #Current loan eligibility and other credit info from the in-memory store
+                        credit_state = credit_store.get(customer_id)
 
-                        if not credit_info_row: # Should not happen if customers are generated with credit info
+                        if not credit_state: # Should not happen if customers are generated with credit info
                             print(f"Warning: No CustomerCreditInfo found for CustomerID {customer_id}. Skipping application.")
                             continue
 
-                        credit_score, active_loans, current_loan_tier, max_eligible_loan_amount, consecutive_on_time_repayments = credit_info_row
+                        is_first_time = credit_state['is_first_time']
+                        credit_score = credit_state['credit_score']
+                        active_loans = credit_state['active_loans']
+                        current_loan_tier = credit_state['current_loan_tier']
+                        max_eligible_loan_amount = credit_state['max_eligible_loan_amount']
+                        consecutive_on_time_repayments = credit_state['consecutive_on_time_repayments']
                         credit_score = credit_score if credit_score else 400 # Default if NULL
                         active_loans = active_loans if active_loans else 0   # Default if NULL
                         current_loan_tier = current_loan_tier if current_loan_tier else 0
                         max_eligible_loan_amount = float(max_eligible_loan_amount if max_eligible_loan_amount else 1000.00)
                         consecutive_on_time_repayments = consecutive_on_time_repayments if consecutive_on_time_repayments else 0
                         
-                        #Select a suitable loan product 
-                        # For tier 0, you might still want to restrict to the "First Time Loan" or similar low-value products
-                        if current_loan_tier == 0:
-                            cursor.execute("""
-                                SELECT ProductID, MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate 
-                                FROM LoanProducts 
-                                WHERE ProductName = 'First Time Loan' AND MaxAmount <= ? 
-                                ORDER BY NEWID()
-                            """, (max_eligible_loan_amount,)) # Ensure even first time loan product is within their absolute max
-                        else:
-                            # For higher tiers, allow other products, ensuring the product's MinAmount is not above their MaxEligible
-                            cursor.execute("""
-                                SELECT ProductID, MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate 
-                                FROM LoanProducts 
-                                WHERE IsFirstTime = 0 AND MinAmount <= ? 
-                                ORDER BY MaxAmount DESC, NEWID() -- Prioritize products they might qualify for
-                            """, (max_eligible_loan_amount,))
-
-                        product_row = cursor.fetchone()
+                        #Select a suitable loan product from the cached catalog
+                        # For tier 0, restrict to the "First Time Loan" products; higher tiers prioritise the largest products they reach
+                        product_row = catalog.select(current_loan_tier, max_eligible_loan_amount)
                         if not product_row:
-                            # Fallback: If no specific product matches, try a very basic one if they are tier 0, or skip
-                            if current_loan_tier == 0:
-                                cursor.execute("""
-                                    SELECT ProductID, MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate 
-                                    FROM LoanProducts 
-                                    WHERE ProductName = 'First Time Loan'
-                                    ORDER BY NEWID()
-                                """)
-                                product_row = cursor.fetchone()
-                            if not product_row:
-                                # print(f"Debug: No suitable product for Cust {customer_id}, Tier {current_loan_tier}, MaxElig {max_eligible_loan_amount}")
-                                continue # Skip if no suitable product found
+                            # print(f"Debug: No suitable product for Cust {customer_id}, Tier {current_loan_tier}, MaxElig {max_eligible_loan_amount}")
+                            continue # Skip if no suitable product found
 
                         product_id, min_amount_prod, max_amount_prod, min_term, max_term, proc_fee_pct, int_rate = product_row
-                        min_amount_prod = float(min_amount_prod)
-                        max_amount_prod = float(max_amount_prod)
-
-                        # Get product details, calculate amount, term, purpose
-                        cursor.execute("SELECT MinAmount, MaxAmount, MinTermDays, MaxTermDays, ProcessingFee, InterestRate FROM LoanProducts WHERE ProductID = ?", product_id)
-                        product_details = cursor.fetchone()
-                        if not product_details: continue
-                        min_amount, max_amount, min_term, max_term, proc_fee_pct, int_rate = product_details
-                        min_amount=float(min_amount); max_amount=float(max_amount); proc_fee_pct=float(proc_fee_pct); int_rate=float(int_rate)
                        
                         # Effective maximum for this application is the lower of product's max and customer's eligible max
                         effective_application_max_amount = min(max_amount_prod, max_eligible_loan_amount)
@@ -1289,10 +2527,7 @@ def generate_loan_applications(start_date, end_date, apps_per_day):
                         term_multiplier = 1.0 
 
                         # Purpose selection 
-                        purpose = random.choice(loan_purposes) # Basic choice
-                        if age < 25: purpose = weighted_choice([('School Fees', 50),('Business Capital', 20),('Holiday Spending', 15),('Other', 15)])
-                        elif age < 35: purpose = weighted_choice([('Business Capital', 40),('Household Expenses', 25),('Rent', 20),('Other', 15)])
-                        else: purpose = weighted_choice([('Medical Expenses', 35),('Family Emergency', 30),('Business Capital', 20),('Other', 15)])
+                        purpose = loan_purpose_sampler(age).draw()
                         if current_date.month in [1, 5, 9] and random.random() < 0.5: purpose = 'School Fees'
                         elif current_date.month in [4, 10] and random.random() < 0.3: purpose = 'Business Capital'
                         elif current_date.month == 12 and random.random() < 0.4: purpose = 'Holiday Spending'
@@ -1301,13 +2536,8 @@ def generate_loan_applications(start_date, end_date, apps_per_day):
                         term = max(min_term, min(term, max_term))
 
                         # Approval logic
-                        cursor.execute("SELECT CreditScore, ActiveLoans FROM CustomerCreditInfo WHERE CustomerID = ?", customer_id)
-                        credit_info = cursor.fetchone()
-                        credit_score = 500 # Default
-                        active_loans_count = 0 # Default
-                        if credit_info:
-                            credit_score = credit_info[0] if credit_info[0] is not None else 500
-                            active_loans_count = credit_info[1] if credit_info[1] is not None else 0
+                        credit_score = credit_state['credit_score'] if credit_state['credit_score'] is not None else 500
+                        active_loans_count = credit_state['active_loans'] if credit_state['active_loans'] is not None else 0
 
                         approval_prob = 0.85  # Lowered base probability
 
@@ -1335,45 +2565,37 @@ def generate_loan_applications(start_date, end_date, apps_per_day):
                         if status == 'Rejected': rejection_reason = random.choice(['Insufficient Credit History', 'High Default Risk', 'Incomplete Information'])
                         device = random.choice(device_models); ip_address = f"197.156.{random.randint(0, 255)}.{random.randint(0, 255)}"
 
-                        # Insert application and get ID
-                        cursor.execute(""" INSERT INTO LoanApplications (CustomerID, ProductID, ApplicationDate, AmountRequested, TermDays, Purpose, Status, StatusDate, RejectionReason, DeviceUsed, IPAddress) OUTPUT INSERTED.ApplicationID VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) """, (customer_id, product_id, app_time, float(amount), term, purpose, status, status_time, rejection_reason, device, ip_address))
-                        app_id_row = cursor.fetchone()
-                        if app_id_row is None: raise GenerationError(f"Failed to retrieve ApplicationID after insert for Customer {customer_id}")
-                        app_id = app_id_row[0]
-
-                        # If approved, create loan and update credit info
+                        # If approved, create loan
+                        loan = None
                         if status == 'Approved':
                             if is_first_time: proc_fee = float(amount) * 0.05
                             else: proc_fee = float(amount) * (proc_fee_pct / 100)
                             interest = float(amount) * (int_rate / 100) * (float(term) / 30.0)
                             total_repayable = float(amount) + float(interest) + float(proc_fee)
+                            loan = (status_time, float(amount), float(interest), float(proc_fee), float(total_repayable), status_time + datetime.timedelta(days=term), 'Active')
 
-                            cursor.execute(""" INSERT INTO Loans (ApplicationID, DisbursementDate, PrincipalAmount, InterestAmount, ProcessingFee, TotalRepayable, DueDate, Status) VALUES (?, ?, ?, ?, ?, ?, ?, ?) """, (app_id, status_time, float(amount), float(interest), float(proc_fee), float(total_repayable), status_time + datetime.timedelta(days=term), 'Active'))
-
-                            # Update credit info (using correct float conversions)
-                            principal_float = float(amount) # Use consistent variable
-                            cursor.execute("""
-                                UPDATE CustomerCreditInfo
-                                SET TotalLoansTaken = ISNULL(TotalLoansTaken, 0) + 1,
-                                    TotalAmountBorrowed = ISNULL(TotalAmountBorrowed, 0) + ?,
-                                    ActiveLoans = ISNULL(ActiveLoans, 0) + 1,
-                                    ActiveLoanAmount = ISNULL(ActiveLoanAmount, 0) + ?,
-                                    -- CreditUtilization might be better calculated separately or based on a limit
-                                    RecentInquiries = ISNULL(RecentInquiries, 0) + 1,
-                                    CreditHistoryLength = ISNULL(CreditHistoryLength, 0) + 1, -- Increment a simple counter for months/loans
-                                    LastUpdated = ?
-                                WHERE CustomerID = ?
-                            """, (principal_float, principal_float, datetime.datetime.now(), customer_id))
+                        # Queue application and loan; ApplicationIDs are assigned when the batch is written
+                        application_writer.add((customer_id, product_id, app_time, float(amount), term, purpose, status, status_time, rejection_reason, device, ip_address), loan)
+                        if loan is not None:
+                            # Update credit info in memory; written out with the day's batch
+                            credit_store.record_approval(customer_id, float(amount))
 
                         apps_generated += 1
 
                     except Exception as e:
-                        # Log error but continue generating for the day
+                        # Log error but continue generating for the day (nothing is written until the day's batch)
                         print(f"\nError processing one application on {current_date.date()}: {str(e)}. Skipping.")
-                        # Maybe add more robust error tracking here if needed
-                        conn.rollback() # Rollback the failed transaction for this app
                         continue # Continue to next application for the day
 
+                    # Busy days are written in several batches, all committed with the day
+                    if application_writer.full():
+                        application_writer.flush()
+
+                # Write the day's applications, loans and credit updates as batches
+                application_writer.flush()
+                credit_store.flush(cursor)
+                conn.commit()
+
                 # Progress Reporting 
                 days_processed += 1
                 if days_processed % 5 == 0 or current_date == end_date or days_processed == 1:
@@ -1437,6 +2659,157 @@ def validate_decimal(value, max_digits=30, decimal_places=2):
     except Exception as e:
         raise ValueError(f"Decimal validation failed: {str(e)}")
 
+#Folded credit updates for the repayment stage
+CREDIT_FOLD_COLUMNS = ['PaymentHistoryScore', 'CreditUtilization', 'DaysSinceLastDefault', 'TotalAmountRepaid',
+                       'ActiveLoans', 'ActiveLoanAmount', 'CurrentLoanTier', 'MaxEligibleLoanAmount',
+                       'ConsecutiveOnTimeRepayments', 'TimesDefaulted', 'LastDefaultDate', 'LastUpdated']
+
+def _sql_add(value, delta):
+    # NULL + x is NULL
+    return None if value is None else value + delta
+
+def _sql_greatest(floor, value):
+    # GREATEST/LEAST ignore NULL arguments
+    return floor if value is None else max(floor, value)
+
+def _sql_least(cap, value):
+    return cap if value is None else min(cap, value)
+
+def _money(value):
+    return None if value is None else round(value, 2)
+
+class RepaymentCreditFold:
+    """Folds repayment credit events into one final CustomerCreditInfo row per customer, applied set-based"""
+    def __init__(self, config):
+        self.config = config
+        self.state = {}
+        self.touched = set()
+
+    def load(self, cursor):
+        """Load the columns the repayment events read and write for all customers"""
+        cursor.execute(f"SELECT CustomerID, TimesOverdrafted, {', '.join(CREDIT_FOLD_COLUMNS)} FROM CustomerCreditInfo")
+        self.state = {}
+        for row in cursor.fetchall():
+            values = {name: float(value) if isinstance(value, Decimal) else value
+                      for name, value in zip(CREDIT_FOLD_COLUMNS, row[2:])}
+            values['TimesOverdrafted'] = row[1]
+            self.state[row[0]] = values
+        self.touched = set()
+        return len(self.state)
+
+    def times_overdrafted(self, customer_id):
+        state = self.state.get(customer_id)
+        return (state['TimesOverdrafted'] or 0) if state else 0
+
+    def apply(self, update):
+        """Apply one ('success' | 'default' | 'partial', ...) event in order, with the same SQL semantics as before"""
+        update_type, cust_id = update[0], update[1]
+        state = self.state.get(cust_id)
+        if state is None:
+            return  # UPDATE ... WHERE CustomerID = ? would match nothing
+        self.touched.add(cust_id)
+        generation = self.config['generation']
+
+        if update_type == 'success':
+            _, cust_id, days_early_val, amt_paid, principal_amt, ts = update
+            active_loan_amt_before = state['ActiveLoanAmount'] or 0.0
+            util_reduction = (float(principal_amt) / active_loan_amt_before * 100) if active_loan_amt_before > 0 else 0
+            days_since_val = None
+            if state['LastDefaultDate'] is not None:
+                days_since_val = (datetime.date.today() - state['LastDefaultDate'].date()).days
+            payment_hist_increase = 10 if days_early_val > 0 else 5
+
+            state['PaymentHistoryScore'] = _sql_least(100, _sql_add(state['PaymentHistoryScore'], payment_hist_increase))
+            state['CreditUtilization'] = _money(_sql_greatest(0, _sql_add(state['CreditUtilization'], -util_reduction)))
+            state['DaysSinceLastDefault'] = days_since_val
+            state['TotalAmountRepaid'] = _money(_sql_add(state['TotalAmountRepaid'], float(amt_paid)))
+            state['ActiveLoans'] = _sql_greatest(0, _sql_add(state['ActiveLoans'], -1))
+            state['ActiveLoanAmount'] = _money(_sql_greatest(0, _sql_add(state['ActiveLoanAmount'], -float(principal_amt))))
+            state['LastUpdated'] = ts
+
+            if days_early_val >= 0: # Paid on time or early
+                current_tier = state['CurrentLoanTier'] if state['CurrentLoanTier'] is not None else 0
+                current_max_eligible = float(state['MaxEligibleLoanAmount'] if state['MaxEligibleLoanAmount'] is not None else 500.00)
+                consecutive_repayments = state['ConsecutiveOnTimeRepayments'] if state['ConsecutiveOnTimeRepayments'] is not None else 0
+
+                new_consecutive_repayments = consecutive_repayments + 1
+                new_tier = current_tier
+                new_max_eligible = current_max_eligible
+                if new_consecutive_repayments >= generation['tier_upgrade_threshold'] and current_tier < generation['max_tier']:
+                    new_tier += 1
+                    new_max_eligible = current_max_eligible * generation['tier_amount_multiplier'] + (generation['tier_amount_increment'] * new_tier)
+                    new_max_eligible = min(new_max_eligible, generation['absolute_max_loan_amount'])
+                    new_consecutive_repayments = 0
+
+                # The tier update repeats the repayment deltas on top of the first update
+                state['CurrentLoanTier'] = new_tier
+                state['MaxEligibleLoanAmount'] = round(new_max_eligible, 2)
+                state['ConsecutiveOnTimeRepayments'] = new_consecutive_repayments
+                state['PaymentHistoryScore'] = _sql_least(100, _sql_add(state['PaymentHistoryScore'], payment_hist_increase))
+            else: # Paid late: reset consecutive on-time payments
+                state['ConsecutiveOnTimeRepayments'] = 0
+                state['PaymentHistoryScore'] = _sql_greatest(0, _sql_add(state['PaymentHistoryScore'], -5))
+            state['TotalAmountRepaid'] = _money((state['TotalAmountRepaid'] or 0.0) + float(amt_paid))
+            state['ActiveLoans'] = _sql_greatest(0, _sql_add(state['ActiveLoans'], -1))
+            state['ActiveLoanAmount'] = _money(_sql_greatest(0, _sql_add(state['ActiveLoanAmount'], -float(principal_amt))))
+
+        elif update_type == 'default':
+            _, cust_id, default_dt, update_dt = update
+            # Reset tier progression significantly on default
+            state['CurrentLoanTier'] = 0
+            state['MaxEligibleLoanAmount'] = float(generation['initial_max_eligible_amount'])
+            state['ConsecutiveOnTimeRepayments'] = 0
+            state['TimesDefaulted'] = (state['TimesDefaulted'] or 0) + 1
+            state['LastDefaultDate'] = default_dt
+            state['DaysSinceLastDefault'] = 0
+            state['PaymentHistoryScore'] = _sql_greatest(0, _sql_add(state['PaymentHistoryScore'], -15))
+            state['LastUpdated'] = update_dt
+
+        elif update_type == 'partial':
+            _, cust_id, amt_paid, ts = update
+            state['PaymentHistoryScore'] = _sql_greatest(0, _sql_add(state['PaymentHistoryScore'], -5))
+            state['TotalAmountRepaid'] = _money(_sql_add(state['TotalAmountRepaid'], float(amt_paid)))
+            state['TimesDefaulted'] = _sql_add(state['TimesDefaulted'], 1)
+            state['LastDefaultDate'] = ts
+            state['DaysSinceLastDefault'] = 0
+            state['LastUpdated'] = ts
+
+    def write(self, cursor):
+        """Stage the final rows of every touched customer and apply them with one UPDATE ... FROM"""
+        if not self.touched:
+            return 0
+        cursor.execute("""
+            CREATE TABLE #CreditFold (
+                CustomerID INT PRIMARY KEY,
+                PaymentHistoryScore INT,
+                CreditUtilization DECIMAL(5,2),
+                DaysSinceLastDefault INT,
+                TotalAmountRepaid DECIMAL(20,2),
+                ActiveLoans INT,
+                ActiveLoanAmount DECIMAL(20,2),
+                CurrentLoanTier INT,
+                MaxEligibleLoanAmount DECIMAL(18,2),
+                ConsecutiveOnTimeRepayments INT,
+                TimesDefaulted INT,
+                LastDefaultDate DATETIME,
+                LastUpdated DATETIME
+            )
+        """)
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany(
+                f"INSERT INTO #CreditFold (CustomerID, {', '.join(CREDIT_FOLD_COLUMNS)}) VALUES ({', '.join(['?'] * (len(CREDIT_FOLD_COLUMNS) + 1))})",
+                [(cust_id,) + tuple(self.state[cust_id][name] for name in CREDIT_FOLD_COLUMNS) for cust_id in sorted(self.touched)])
+            cursor.execute(f"""
+                UPDATE cci
+                SET {', '.join(f'{name} = f.{name}' for name in CREDIT_FOLD_COLUMNS)}
+                FROM CustomerCreditInfo cci
+                JOIN #CreditFold f ON cci.CustomerID = f.CustomerID
+            """)
+        finally:
+            cursor.execute("DROP TABLE #CreditFold")
+        return len(self.touched)
+
 #Simulate hoe customers repay their loans            
 def generate_repayments():
     with db_connection() as conn:
@@ -1452,6 +2825,8 @@ def generate_repayments():
             start_time = datetime.datetime.now()
             cursor.execute(""" SELECT l.LoanID, l.DueDate, l.TotalRepayable, l.PrincipalAmount, la.CustomerID, lp.Category, cci.CreditScore, cci.TimesDefaulted, DATEDIFF(YEAR, c.DateOfBirth, GETDATE()) as age, c.MonthlyIncome FROM Loans l JOIN LoanApplications la ON l.ApplicationID = la.ApplicationID JOIN LoanProducts lp ON la.ProductID = lp.ProductID JOIN CustomerCreditInfo cci ON la.CustomerID = cci.CustomerID JOIN Customers c ON la.CustomerID = c.CustomerID WHERE l.DueDate BETWEEN DATEADD(month, -12, GETDATE()) AND DATEADD(day, 30, GETDATE()) AND l.Status IN ('Active', 'Defaulted') """)
             loans = cursor.fetchall()
+            credit_fold = RepaymentCreditFold(config)
+            credit_fold.load(cursor)
 
             repayments_to_insert = []
             loans_to_update = []
@@ -1479,8 +2854,7 @@ def generate_repayments():
                 elif age < 35: repayment_prob *= 0.95; late_prob = 0.5
                 else: repayment_prob *= 1.1; late_prob = 0.2
                 if monthly_income_float > 50000: repayment_prob = min(0.95, repayment_prob * 1.2); late_prob *= 0.8
-                cursor.execute("SELECT TimesOverdrafted FROM CustomerCreditInfo WHERE CustomerID = ?", customer_id)
-                overdraft_res = cursor.fetchone(); overdraft_count = overdraft_res[0] if overdraft_res else 0
+                overdraft_count = credit_fold.times_overdrafted(customer_id)
                 if overdraft_count > 3: repayment_prob *= 0.8; late_prob *= 1.3
                 if category == 'Business': repayment_prob *= 1.1
                 elif category == 'Agricultural': repayment_prob *= 0.9
@@ -1503,7 +2877,7 @@ def generate_repayments():
                         days_paid_early = days_early
                     repayment_date = min(repayment_date, datetime.datetime.now())
                     repayment_date = repayment_date.replace(hour=random.randint(0, 23), minute=random.randint(0, 59))
-                    if age < 30 or random.random() < 0.3: payment_type = weighted_choice([('full', 60), ('partial', 40)])
+                    if age < 30 or random.random() < 0.3: payment_type = PAYMENT_TYPE_SAMPLER.draw()
                     else: payment_type = 'full'
                     payment_method = random.choice(payment_methods)
 
@@ -1573,128 +2947,14 @@ def generate_repayments():
                 if params_list:
                     cursor.executemany("""UPDATE Loans SET Status = ?, LastPaymentDate = ?, DaysDelayed = ? WHERE LoanID = ?""", params_list)
 
-            # --- Process credit updates ---
+            # --- Process credit updates: fold per customer, then apply set-based ---
             print(f"Processing {len(credit_updates)} credit updates...")
             for update in credit_updates:
-                update_type = update[0]
                 try:
-                    if update_type == 'success':
-                        # Check for length 6 
-                        if len(update) != 6:
-                            print(f"Skipping success update due to incorrect length: {len(update)}")
-                            continue
-                        # Unpack 5 values after type 
-                        _, cust_id, days_early_val, amt_paid, principal_amt, ts = update
-                        
-                        # Keep the SQL logic, it uses the correct variables now
-                        cursor.execute("SELECT ActiveLoanAmount FROM CustomerCreditInfo WHERE CustomerID = ?", cust_id)
-                        active_loan_amt_before_res = cursor.fetchone()
-                        active_loan_amt_before = float(active_loan_amt_before_res[0]) if active_loan_amt_before_res and active_loan_amt_before_res[0] else 0.0
-                        util_reduction = (float(principal_amt) / active_loan_amt_before * 100) if active_loan_amt_before > 0 else 0
-                        cursor.execute("SELECT DATEDIFF(day, LastDefaultDate, GETDATE()) FROM CustomerCreditInfo WHERE CustomerID = ? AND LastDefaultDate IS NOT NULL", cust_id)
-                        days_since_res = cursor.fetchone()
-                        days_since_val = days_since_res[0] if days_since_res else None
-                        payment_hist_increase = 10 if days_early_val > 0 else 5
-                        cursor.execute("""UPDATE CustomerCreditInfo SET PaymentHistoryScore = LEAST(100, PaymentHistoryScore + ?), CreditUtilization = GREATEST(0, CreditUtilization - ?), DaysSinceLastDefault = ?, TotalAmountRepaid = TotalAmountRepaid + ?, ActiveLoans = GREATEST(0, ActiveLoans - 1), ActiveLoanAmount = GREATEST(0, ActiveLoanAmount - ?), LastUpdated = ? WHERE CustomerID = ? """, (payment_hist_increase, util_reduction, days_since_val, float(amt_paid), float(principal_amt), ts, cust_id))
-                        
-                        if days_early_val >= 0: # Paid on time or early (days_early_val is positive for early, 0 for on-time in your setup)
-                            cursor.execute("""
-                                SELECT CurrentLoanTier, MaxEligibleLoanAmount, ConsecutiveOnTimeRepayments
-                                FROM CustomerCreditInfo WHERE CustomerID = ?
-                            """, cust_id)
-                            tier_info = cursor.fetchone()
-                            if tier_info:
-                                current_tier_db, current_max_eligible_db, consecutive_repayments_db = tier_info
-                                current_tier_db = current_tier_db if current_tier_db is not None else 0
-                                current_max_eligible_db = float(current_max_eligible_db if current_max_eligible_db is not None else 500.00)
-                                consecutive_repayments_db = consecutive_repayments_db if consecutive_repayments_db is not None else 0
-
-                                new_consecutive_repayments = consecutive_repayments_db + 1
-
-                                new_tier = current_tier_db
-                                new_max_eligible = current_max_eligible_db
-                                
-                                tier_upgrade_thresh = config['generation']['tier_upgrade_threshold']
-                                max_possible_tier = config['generation']['max_tier']
-                                increase_factor = config['generation']['tier_amount_multiplier']
-                                increase_flat = config['generation']['tier_amount_increment']
-                                abs_max_loan_amount = config['generation']['absolute_max_loan_amount']
-
-                                if new_consecutive_repayments >= tier_upgrade_thresh and \
-                                current_tier_db < max_possible_tier :
-                                    new_tier += 1
-                                    new_max_eligible = current_max_eligible_db * increase_factor + (increase_flat * new_tier)
-                                    new_max_eligible = min(new_max_eligible, abs_max_loan_amount)
-                                    new_consecutive_repayments = 0
-
-                                # Update CustomerCreditInfo with new tier, max_eligible_amount, and consecutive_repayments
-                                cursor.execute("""
-                                    UPDATE CustomerCreditInfo 
-                                    SET CurrentLoanTier = ?, MaxEligibleLoanAmount = ?, ConsecutiveOnTimeRepayments = ?,
-                                        PaymentHistoryScore = LEAST(100, PaymentHistoryScore + ?), -- Existing update
-                                        TotalAmountRepaid = ISNULL(TotalAmountRepaid,0) + ?,      -- Existing update
-                                        ActiveLoans = GREATEST(0, ActiveLoans - 1),              -- Existing update
-                                        ActiveLoanAmount = GREATEST(0, ActiveLoanAmount - ?),    -- Existing update
-                                        LastUpdated = ?                                          -- Existing update
-                                    WHERE CustomerID = ?
-                                """, (
-                                    new_tier, Decimal(str(round(new_max_eligible,2))), new_consecutive_repayments,
-                                    (10 if days_early_val > 0 else 5), # payment_hist_increase
-                                    Decimal(str(amt_paid)), 
-                                    Decimal(str(principal_amt)), 
-                                    ts, 
-                                    cust_id
-                                ))
-                        else: # Paid late (days_early_val is negative, representing days_late)
-                            # Reset consecutive on-time payments, potentially penalize tier/limit slightly
-                            cursor.execute("""
-                                UPDATE CustomerCreditInfo 
-                                SET ConsecutiveOnTimeRepayments = 0,
-                                    PaymentHistoryScore = GREATEST(0, PaymentHistoryScore - 5), -- Existing update for late
-                                    TotalAmountRepaid = ISNULL(TotalAmountRepaid,0) + ?,      -- Existing update
-                                    ActiveLoans = GREATEST(0, ActiveLoans - 1),              -- Existing update
-                                    ActiveLoanAmount = GREATEST(0, ActiveLoanAmount - ?),    -- Existing update
-                                    LastUpdated = ?                                          -- Existing update
-                                WHERE CustomerID = ?
-                            """, (
-                                Decimal(str(amt_paid)), 
-                                Decimal(str(principal_amt)), 
-                                ts, 
-                                cust_id
-                            ))
-                    elif update_type == 'default':
-                         # Check for length 4 (unchanged)
-                         if len(update) != 4: print(f"Skipping default update due to incorrect length: {len(update)}"); continue
-                         _, cust_id, default_dt, update_dt = update
-                         # Reset tier progression significantly on default
-                         cursor.execute("""
-                            UPDATE CustomerCreditInfo 
-                            SET CurrentLoanTier = 0, MaxEligibleLoanAmount = ?, ConsecutiveOnTimeRepayments = 0,
-                                TimesDefaulted = ISNULL(TimesDefaulted, 0) + 1, 
-                                LastDefaultDate = ?, 
-                                DaysSinceLastDefault = 0, 
-                                PaymentHistoryScore = GREATEST(0, PaymentHistoryScore - 15), -- Existing penalty
-                                LastUpdated = ?
-                                -- If 'partial_hist', also update TotalAmountRepaid if applicable from your existing logic
-                            WHERE CustomerID = ?
-                         """, (
-                            Decimal(str(config['generation']['initial_max_eligible_amount'])),
-                            (update[2] if update_type == 'default_hist' else update[1]), # default_date or lastdefaultdate from tuple
-                            (update[3] if update_type == 'default_hist' else update[2]), # last_updated_date or ts
-                            cust_id
-                         ))
-                         
-                    elif update_type == 'partial':
-                         # --- Check for length 4 ---
-                         if len(update) != 4:
-                             print(f"Skipping partial update due to incorrect length: {len(update)}")
-                             continue
-                         # --- Unpack 3 values after type ---
-                         _, cust_id, amt_paid, ts = update
-                         # (Keep the SQL logic, it uses the correct variables now)
-                         cursor.execute("""UPDATE CustomerCreditInfo SET PaymentHistoryScore = GREATEST(0, PaymentHistoryScore - 5), TotalAmountRepaid = TotalAmountRepaid + ?, TimesDefaulted = TimesDefaulted + 1, LastDefaultDate = ?, DaysSinceLastDefault = 0, LastUpdated = ? WHERE CustomerID = ?""", (float(amt_paid), ts, ts, cust_id))
+                    credit_fold.apply(update)
                 except Exception as credit_e:
-                    print(f"\nError processing credit update for CustomerID {update[1]} ({update_type}): {credit_e}")
+                    print(f"\nError processing credit update for CustomerID {update[1]} ({update[0]}): {credit_e}")
+            print(f"Applying folded credit updates for {credit_fold.write(cursor)} customers...")
 
 
             # --- (Keep CRB update processing logic - unchanged) ---
@@ -2180,18 +3440,8 @@ def generate_credit_inquiries(months_back=12):
                 for _ in range(inquiry_count):
                     inquiry_date = random_date(start_date, end_date)
                     
-                    lender = weighted_choice([
-                        ('Commercial Bank', 30),
-                        ('Sacco', 25),
-                        ('Microfinance', 20),
-                        ('Mobile Lender', 25)
-                    ])
-                    
-                    purpose = weighted_choice([
-                        ('Loan Application', 40),
-                        ('Credit Card', 30),
-                        ('Overdraft', 30)
-                    ])
+                    lender = LENDER_SAMPLER.draw()
+                    purpose = INQUIRY_PURPOSE_SAMPLER.draw()
                     
                     # Generate amount based on lender type
                     if lender == 'Commercial Bank':
@@ -2203,11 +3453,7 @@ def generate_credit_inquiries(months_back=12):
                     else:  # Mobile Lender
                         amount = 1000 + random.random() * 50000
                     
-                    status = weighted_choice([
-                        ('Approved', 40),
-                        ('Pending', 30),
-                        ('Rejected', 30)
-                    ])
+                    status = INQUIRY_STATUS_SAMPLER.draw()
                     
                     cursor.execute("""
                         INSERT INTO CreditInquiries (
@@ -2267,42 +3513,65 @@ def validate_age_distribution():
 #Main execution logic
 def main():
     """Main execution function with proper error handling"""
+    indexes_disabled = False
     try:
         config = load_config()
+        query_profiler.configure(config['generation']['profile_queries'], config['generation']['n_plus_one_threshold'])
+        if config['db_connection']['pool_size'] < MIN_POOL_SIZE:
+            raise ValueError(f"pool_size must be at least {MIN_POOL_SIZE} (the mobile money stage and its writer threads)")
+        connection_pool.configure(config['db_connection']['pool_size'], config['db_connection']['pool_checkout_timeout'],
+                                  config['db_connection']['pool_health_check_seconds'])
 
         print("Initializing database...")
-        initialize_database()
+        with query_profiler.stage('initialize_database'):
+            initialize_database()
+
+        # The insert-only stages run without index maintenance on their tables; the indexes are
+        # rebuilt before the stages that read and update by them
+        if config['generation']['disable_indexes_during_load']:
+            with query_profiler.stage('disable_indexes'):
+                disable_nonclustered_indexes()
+            indexes_disabled = True
 
         print("Generating customers...")
-        generate_customers(
-            count=config['generation']['customer_count'],
-            batch_size=config['generation']['batch_size']
-        )
+        with query_profiler.stage('customers'):
+            if config['generation']['customer_engine'] == 'vectorized':
+                generate_customers_vectorized(
+                    count=config['generation']['customer_count'],
+                    batch_size=config['generation']['batch_size']
+                )
+            else:
+                generate_customers(
+                    count=config['generation']['customer_count'],
+                    batch_size=config['generation']['batch_size']
+                )
 
         print("Generating device info...")
-        generate_device_info()
+        with query_profiler.stage('device_info'):
+            generate_device_info(
+                batch_rows=config['generation']['mm_flush_rows'],
+                queue_batches=config['generation']['write_queue_batches']
+            )
 
         print("Generating mobile money transactions...")
-        with db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT CustomerID FROM Customers WHERE IsActive = 1")
-            active_customers = [row[0] for row in cursor.fetchall()]
+        with query_profiler.stage('mobile_money'):
+            generate_mobile_money_stage(
+                months_back=config['generation']['transaction_months'],
+                flush_rows=config['generation']['mm_flush_rows'],
+                workers=config['generation']['mm_workers'],
+                run_seed=config['generation']['random_seed'],
+                queue_batches=config['generation']['write_queue_batches']
+            )
 
-        # Process transactions with progress reporting
-        start_time_mm = datetime.datetime.now() # Use different start_time variable
-        total_mm = len(active_customers)
-        for i, customer_id in enumerate(active_customers, 1):
-            try:
-                generate_mobile_money_transactions(
-                    customer_id,
-                    months_back=config['generation']['transaction_months']
-                )
-                show_progress(i, total_mm, start_time_mm, "Mobile Money: ")
-            except Exception as e:
-                print(f"\nError processing mobile money for customer {customer_id}: {str(e)}")
+        if indexes_disabled:
+            print("\nRebuilding indexes...")
+            with query_profiler.stage('rebuild_indexes'):
+                rebuild_nonclustered_indexes()
+            indexes_disabled = False
 
         print("\nGenerating credit inquiries...")
-        generate_credit_inquiries(months_back=config['generation']['transaction_months'])
+        with query_profiler.stage('credit_inquiries'):
+            generate_credit_inquiries(months_back=config['generation']['transaction_months'])
         
         print("Generating SEED historical loan applications...")
         seed_app_duration_months = 4 # Generate seed loans over a 4-month application period
@@ -2311,15 +3580,17 @@ def main():
         seed_app_start_date = seed_app_end_date - datetime.timedelta(days=30 * seed_app_duration_months) # Start applications 2 months before that
 
         print(f"Generating SEED applications from {seed_app_start_date.date()} to {seed_app_end_date.date()}")
-        generate_loan_applications(
-            seed_app_start_date,
-            seed_app_end_date,
-            # Use a fraction of normal daily apps for the seed period to keep it manageable
-            apps_per_day=config['generation']['loan_apps_per_day']  
-        )
+        with query_profiler.stage('seed_loan_applications'):
+            generate_loan_applications(
+                seed_app_start_date,
+                seed_app_end_date,
+                # Use a fraction of normal daily apps for the seed period to keep it manageable
+                apps_per_day=config['generation']['loan_apps_per_day']  
+            )
         
         print("Generating historical repayments (processing SEED loans and updating tiers)...")
-        generate_historical_repayments(months_back=config['generation']['transaction_months'])
+        with query_profiler.stage('historical_repayments'):
+            generate_historical_repayments(months_back=config['generation']['transaction_months'])
 
         
         print("Generating MAIN loan applications (for analysis)...")
@@ -2327,14 +3598,16 @@ def main():
         end_date = datetime.datetime.now() - datetime.timedelta(days=60)
         
         print(f"Generating MAIN applications from {start_date.date()} to {end_date.date()}")
-        generate_loan_applications(
-            start_date, end_date,
-            apps_per_day=config['generation']['loan_apps_per_day']
-        )
+        with query_profiler.stage('main_loan_applications'):
+            generate_loan_applications(
+                start_date, end_date,
+                apps_per_day=config['generation']['loan_apps_per_day']
+            )
 
         print("Generating current repayments...")
          # This will also use the modified logic
-        generate_repayments()  
+        with query_profiler.stage('repayments'):
+            generate_repayments()  
 
         with db_connection() as conn:
             cursor = conn.cursor()
@@ -2408,6 +3681,16 @@ def main():
         print(f"\nUnexpected error: {str(e)}")
         return 1
     finally:
+        if indexes_disabled:
+            # A stage failed: leave the database indexed for whatever runs next
+            try:
+                rebuild_nonclustered_indexes()
+            except DatabaseError as e:
+                print(f"\nIndex rebuild failed: {str(e)}")
+        if query_profiler.enabled:
+            query_profiler.write_report(config['generation']['profile_report'])
+        connection_pool.report()
+        connection_pool.close()
         print("\nData generation complete!")
 
 if __name__ == "__main__":
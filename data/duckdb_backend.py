@@ -0,0 +1,116 @@
+"""Embedded DuckDB backend for the extraction query over Parquet exports.
+
+export_tables() copies the QuickPesaDB tables the extraction reads into one
+Parquet file each (typed from the ODBC cursor description, DECIMAL as double).
+connect() opens an in-process DuckDB database with a view per exported table,
+and main_data_extraction_duckdb.sql is the DuckDB version of the extraction
+query: the same five-way join, window features and output columns. DuckDB scans
+the Parquet columns it needs on all cores, so the whole preprocessing pipeline
+can run offline without a SQL Server:
+
+    python duckdb_backend.py export          # once, with the database reachable
+    python duckdb_backend.py extract         # any time after, no database needed
+
+The connection plugs into extraction.stream_extract (connect=duckdb_backend.connect),
+which then reads the result as Arrow record batches instead of ODBC rows.
+"""
+import argparse
+import decimal
+import os
+import sys
+
+import duckdb
+import pandas as pd
+
+from extraction import arrow_schema, build_connection_string, read_query, stream_extract
+from persistence import ChunkedDatasetWriter
+
+# Tables read by the extraction query
+EXPORT_TABLES = ['Customers', 'CustomerCreditInfo', 'LoanProducts', 'LoanApplications', 'Loans', 'MobileMoneyTransactions']
+
+DUCKDB_QUERY_PATH = '../sql_queries/main_data_extraction_duckdb.sql'
+
+
+def export_table(conn, table, export_dir, chunksize=100000):
+    """Stream one table into <export_dir>/<table>.parquet; returns the row count.
+
+    The file is written under a temporary name and renamed at the end, so a failed export
+    never leaves a truncated file behind.
+    """
+    path = os.path.join(export_dir, f"{table}.parquet")
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM {table}")
+    schema = arrow_schema(cursor.description)
+    decimal_columns = [column[0] for column in cursor.description if column[1] is decimal.Decimal]
+    rows = 0
+    with ChunkedDatasetWriter(path + '.tmp.parquet', schema=schema) as writer:
+        while True:
+            batch = cursor.fetchmany(chunksize)
+            if not batch and rows:
+                break
+            df = pd.DataFrame.from_records([tuple(row) for row in batch], columns=schema.names)
+            for column in decimal_columns:
+                df[column] = pd.to_numeric(df[column])
+            writer.write(df)
+            rows += len(df)
+            if not batch:
+                break
+    cursor.close()
+    os.replace(path + '.tmp.parquet', path)
+    return rows
+
+
+def export_tables(conn_str, export_dir='../data/export', tables=None, chunksize=100000, connect=None):
+    """Export the extraction's source tables from SQL Server to Parquet"""
+    if connect is None:
+        import pyodbc
+        connect = pyodbc.connect
+    os.makedirs(export_dir, exist_ok=True)
+    conn = connect(conn_str)
+    try:
+        for table in tables or EXPORT_TABLES:
+            rows = export_table(conn, table, export_dir, chunksize)
+            print(f"Exported {rows} rows from {table}")
+    finally:
+        conn.close()
+
+
+def connect(export_dir='../data/export', threads=None):
+    """In-process DuckDB connection with one view per exported table (all cores unless threads is set)"""
+    missing = [table for table in EXPORT_TABLES if not os.path.exists(os.path.join(export_dir, f"{table}.parquet"))]
+    if missing:
+        raise FileNotFoundError(f"Missing Parquet exports in {export_dir}: {', '.join(missing)}. Run export_tables first.")
+    con = duckdb.connect()
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    for table in EXPORT_TABLES:
+        path = os.path.abspath(os.path.join(export_dir, f"{table}.parquet")).replace("'", "''")
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path}')")
+    return con
+
+
+def extract(export_dir='../data/export', raw_path='../data/raw_loan_data.csv',
+            processed_path='../data/processed_loan_data.parquet', chunksize=50000, **kwargs):
+    """stream_extract over the Parquet exports instead of SQL Server"""
+    return stream_extract(export_dir, read_query(DUCKDB_QUERY_PATH), raw_path=raw_path,
+                          processed_path=processed_path, chunksize=chunksize, connect=connect, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline extraction over Parquet exports with DuckDB")
+    parser.add_argument('command', choices=['export', 'extract'])
+    parser.add_argument('--config', default='../config.ini')
+    parser.add_argument('--export-dir', default='../data/export')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        export_tables(build_connection_string(args.config), args.export_dir)
+    else:
+        rows, _, _ = extract(args.export_dir, chunksize=args.chunksize)
+        print(f"Extracted and processed {rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Binned summaries and plots for exploratory analysis at scale.
+
+Seaborn's histplot/boxplot/violinplot keep every row and redraw from it, so
+render time and notebook size grow with the dataset. Here each feature is
+reduced once, per default class, to a fixed-size summary:
+
+- counts on a fine grid of equal-width bins (the plotted histogram is the fine
+  grid summed back to `bins` bins, so both come from one bincount);
+- a Gaussian KDE evaluated on that grid by convolving the binned counts
+  (Scott's bandwidth, like seaborn);
+- box-plot statistics (quartiles, 1.5 IQR whiskers, mean) and a bounded random
+  sample of the outliers.
+
+Plots are drawn from the summaries only, so drawing cost depends on the number
+of bins, not on the number of rows.
+"""
+import numpy as np
+import matplotlib.pyplot as plt
+
+CLASS_LABELS = {0: 'Paid', 1: 'Defaulted'}
+
+
+def _finite_values(series):
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def _box_stats(values, rng, max_fliers):
+    """matplotlib bxp statistics for one class, with at most max_fliers outliers"""
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(fliers) > max_fliers:
+        fliers = rng.choice(fliers, max_fliers, replace=False)
+    return {
+        'mean': float(values.mean()), 'med': float(median), 'q1': float(q1), 'q3': float(q3),
+        'whislo': float(inside.min()) if len(inside) else float(q1),
+        'whishi': float(inside.max()) if len(inside) else float(q3),
+        'fliers': fliers, 'min': float(values.min()), 'max': float(values.max()),
+    }
+
+
+def _binned_kde(counts, values, width):
+    """Gaussian KDE on the bin centres from binned counts (density, integrates to ~1 over the grid)"""
+    n = counts.sum()
+    if n < 2:
+        return np.zeros(len(counts))
+    bandwidth = values.std(ddof=1) * n ** (-1 / 5)
+    if bandwidth <= 0:
+        return counts / (n * width)
+    sigma = bandwidth / width
+    half = int(min(np.ceil(4 * sigma), len(counts)))
+    offsets = np.arange(-half, half + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+    # 'full' then slice: with 'same', a kernel longer than the grid would return the kernel's length
+    return np.convolve(counts, kernel, mode='full')[half:half + len(counts)] / (n * width)
+
+
+def summarize_feature(df, column, by='IsDefault', bins=50, oversample=8, max_fliers=200, value_range=None, seed=42):
+    """Histogram, KDE and box statistics for one numeric column, per value of `by`.
+
+    by=None summarises the whole column as a single class. The returned dict holds only
+    fixed-size arrays (plus at most max_fliers outliers per class).
+    """
+    rng = np.random.default_rng(seed)
+    groups = {'all': df[column]} if by is None else {key: group for key, group in df.groupby(by, observed=True)[column]}
+    values_by_class = {key: _finite_values(series) for key, series in groups.items()}
+    values_by_class = {key: values for key, values in values_by_class.items() if len(values)}
+
+    if value_range is None:
+        if not values_by_class:
+            value_range = (0.0, 1.0)
+        else:
+            value_range = (min(v.min() for v in values_by_class.values()), max(v.max() for v in values_by_class.values()))
+    low, high = float(value_range[0]), float(value_range[1])
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+
+    fine_bins = bins * oversample
+    width = (high - low) / fine_bins
+    edges = np.linspace(low, high, bins + 1)
+    grid = low + width * (np.arange(fine_bins) + 0.5)
+
+    classes = {}
+    for key, values in values_by_class.items():
+        codes = np.clip(((values - low) / width).astype(np.int64), 0, fine_bins - 1)
+        fine_counts = np.bincount(codes, minlength=fine_bins).astype(np.float64)
+        classes[key] = {
+            'count': len(values),
+            'hist': fine_counts.reshape(bins, oversample).sum(axis=1),
+            'kde': _binned_kde(fine_counts, values, width),
+            'box': _box_stats(values, rng, max_fliers),
+        }
+    return {'feature': column, 'by': by, 'edges': edges, 'grid': grid, 'classes': classes}
+
+
+def summarize_features(df, columns, by='IsDefault', **kwargs):
+    """summarize_feature for every column present in df"""
+    return {column: summarize_feature(df, column, by=by, **kwargs) for column in columns if column in df.columns}
+
+
+def summarize_groups(df, column, group, by='IsDefault', **kwargs):
+    """One summary per value of `group` (e.g. per EmploymentStatus), all on the same value range"""
+    values = _finite_values(df[column])
+    kwargs.setdefault('value_range', (values.min(), values.max()) if len(values) else None)
+    return {key: summarize_feature(frame, column, by=by, **kwargs)
+            for key, frame in df.groupby(group, observed=True)}
+
+
+def _label(key):
+    return CLASS_LABELS.get(key, str(key))
+
+
+def plot_histogram(summary, ax=None, kde=True, stacked=True):
+    """Histogram (stacked by class) with the binned KDE scaled to counts"""
+    ax = ax or plt.gca()
+    edges = summary['edges']
+    bin_width = edges[1] - edges[0]
+    bottom = np.zeros(len(edges) - 1)
+    kde_bottom = np.zeros(len(summary['grid']))
+    for index, (key, stats) in enumerate(summary['classes'].items()):
+        color = f'C{index}'
+        ax.bar(edges[:-1], stats['hist'], width=bin_width, bottom=bottom if stacked else None,
+               align='edge', alpha=0.6, color=color, label=_label(key), linewidth=0)
+        if kde:
+            line = stats['kde'] * stats['count'] * bin_width
+            ax.plot(summary['grid'], line + kde_bottom if stacked else line, color=color)
+            if stacked:
+                kde_bottom = kde_bottom + line
+        if stacked:
+            bottom = bottom + stats['hist']
+    ax.set_xlabel(summary['feature'])
+    ax.set_ylabel('Count')
+    if summary['by'] is not None:
+        ax.legend(title=summary['by'])
+    return ax
+
+
+def plot_boxplot(summary, ax=None, showfliers=True):
+    """Box plot per class from the precomputed statistics"""
+    ax = ax or plt.gca()
+    keys = list(summary['classes'])
+    ax.bxp([summary['classes'][key]['box'] for key in keys], showfliers=showfliers, patch_artist=True,
+           flierprops={'markersize': 3, 'alpha': 0.5})
+    ax.set_xticks(range(1, len(keys) + 1), [_label(key) for key in keys])
+    ax.set_ylabel(summary['feature'])
+    return ax
+
+
+def plot_violins(group_summaries, ax=None, width=0.4):
+    """Side-by-side violins per group and class, drawn from the binned KDEs"""
+    ax = ax or plt.gca()
+    groups = list(group_summaries)
+    class_keys = sorted({key for summary in group_summaries.values() for key in summary['classes']})
+    for offset_index, class_key in enumerate(class_keys):
+        offset = (offset_index - (len(class_keys) - 1) / 2) * width
+        positions, vpstats = [], []
+        for position, group in enumerate(groups):
+            summary = group_summaries[group]
+            stats = summary['classes'].get(class_key)
+            if stats is None:
+                continue
+            box = stats['box']
+            positions.append(position + offset)
+            vpstats.append({'coords': summary['grid'], 'vals': stats['kde'], 'mean': box['mean'],
+                            'median': box['med'], 'min': box['min'], 'max': box['max']})
+        if vpstats:
+            parts = ax.violin(vpstats, positions=positions, widths=width, showmedians=True)
+            for body in parts['bodies']:
+                body.set_facecolor(f'C{offset_index}')
+                body.set_alpha(0.6)
+            parts['bodies'][0].set_label(_label(class_key))
+    ax.set_xticks(range(len(groups)), [str(group) for group in groups])
+    feature = next(iter(group_summaries.values()))['feature'] if groups else ''
+    ax.set_ylabel(feature)
+    ax.legend()
+    return ax
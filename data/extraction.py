@@ -0,0 +1,275 @@
+"""Streaming extraction and preprocessing for the loan default dataset.
+
+The extraction query is read in chunks, each chunk is downcast (int32/float32,
+categoricals for low-cardinality strings) and appended to the raw file (CSV, or
+Parquet/Feather with the driver's column types). Cleaning and feature
+engineering then stream over the raw file chunk by chunk, so peak memory is
+bounded by the chunk size rather than the dataset size.
+
+Steps that need dataset-wide statistics are fitted during the first pass and
+then applied to every chunk: medians and IQR bounds of the financial columns
+come from per-column KLL quantile sketches over every row, and the median fills
+of the engineered ratios from a uniform row sample. The steps themselves live
+in features.py.
+"""
+import configparser
+import datetime
+import decimal
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from features import FINANCIAL_COLUMNS, FinancialQuantiles, fit_preprocessing, preprocess_chunk
+from persistence import ChunkedDatasetWriter, dataset_format, iter_dataset_batches
+
+# Low-cardinality strings stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['LoanStatus', 'LoanPurpose', 'ProductName', 'LoanCategory', 'Gender', 'County',
+                       'EmploymentStatus', 'EducationLevel', 'MaritalStatus', 'MobileMoneyProvider']
+
+DATE_COLUMNS = ['DisbursementDate', 'DueDate', 'ApplicationDate', 'CustomerRegistrationDate',
+                'PreviousLastDefaultDate', 'CRBListingDate']
+
+# Raw columns sampled for the engineered-ratio medians (cleaned with the sketched stats first)
+SAMPLE_COLUMNS = FINANCIAL_COLUMNS + ['MaxEligibleLoanAmount']
+
+# pyodbc type codes (cursor.description) -> Arrow types of the fetched columns
+ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    decimal.Decimal: pa.float64(),
+    bool: pa.bool_(),
+    datetime.datetime: pa.timestamp('us'),
+    datetime.date: pa.date32(),
+    bytes: pa.binary(),
+}
+
+
+def build_connection_string(config_path='../config.ini'):
+    """ODBC connection string from the [database] section of config.ini"""
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    db_config = config['database']
+
+    conn_str_parts = [
+        f"Driver={{{db_config['driver']}}}",
+        f"Server={{{db_config['server']}}}",
+        f"Database={{{db_config['database']}}}"
+    ]
+    if db_config.getboolean('trusted_connection', fallback=False):
+        conn_str_parts.append("Trusted_Connection=yes")
+    else:
+        uid = db_config.get('uid')
+        pwd = db_config.get('pwd')
+        if not uid or not pwd:
+            raise ValueError("UID and PWD must be provided in config.ini if Trusted_Connection = 'no'")
+        conn_str_parts.append(f"UID={uid}")
+        conn_str_parts.append(f"PWD={pwd}")
+    if db_config.getboolean('trust_server_certificate', fallback=False):
+        conn_str_parts.append("TrustServerCertificate=yes")
+    return ";".join(conn_str_parts)
+
+
+def read_query(path='../sql_queries/main_data_extraction.sql'):
+    with open(path, 'r') as file:
+        return file.read()
+
+
+# Dtype optimisation
+def optimize_dtypes(df):
+    """Downcast a chunk in place: int32/float32 numerics, categoricals for low-cardinality strings"""
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = series.astype('category')
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(series)
+        elif series.dtype == object:
+            first = series.dropna()
+            first = first.iloc[0] if len(first) else None
+            # pyodbc returns DECIMAL columns as Decimal objects
+            if isinstance(first, (decimal.Decimal, float, int)) and not isinstance(first, bool):
+                df[col] = pd.to_numeric(series, errors='coerce').astype('float32')
+            elif isinstance(first, bool):
+                df[col] = series.astype('boolean')
+        elif pd.api.types.is_bool_dtype(series):
+            continue
+        elif pd.api.types.is_integer_dtype(series):
+            if series.empty or (series.min() >= np.iinfo(np.int32).min and series.max() <= np.iinfo(np.int32).max):
+                df[col] = series.astype('int32')
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = series.astype('float32')
+    return df
+
+
+def arrow_schema(description):
+    """Arrow schema of a DB-API result from its cursor description (DECIMAL as double, unknown types as string)"""
+    return pa.schema([(column[0], ARROW_TYPES.get(column[1], pa.string())) for column in description])
+
+
+def iter_query_tables(conn, sql, chunksize=50000, params=None):
+    """Stream a query as Arrow tables with the driver's column types.
+
+    Connections that return Arrow record batches (DuckDB) are read column-wise; DB-API
+    connections (pyodbc) use fetchmany and the schema from the cursor description, so every
+    chunk has the same types even when a column is all NULL in it.
+    """
+    cursor = conn.cursor()
+    if params:
+        cursor.execute(sql, params)
+    else:
+        cursor.execute(sql)
+    if hasattr(cursor, 'fetch_record_batch'):
+        for batch in cursor.fetch_record_batch(chunksize):
+            yield pa.Table.from_batches([batch])
+        cursor.close()
+        return
+    schema = arrow_schema(cursor.description)
+    decimal_columns = [column[0] for column in cursor.description if column[1] is decimal.Decimal]
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            break
+        df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=schema.names)
+        for column in decimal_columns:
+            df[column] = pd.to_numeric(df[column])
+        yield pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    cursor.close()
+
+
+def iter_query_chunks(conn, sql, chunksize=50000, params=None):
+    """Stream a query as downcast DataFrame chunks"""
+    for table in iter_query_tables(conn, sql, chunksize, params):
+        yield optimize_dtypes(table.to_pandas())
+
+
+class RowReservoir:
+    """Uniform random sample of up to `size` rows across all chunks (Algorithm R, vectorised per chunk)"""
+    def __init__(self, columns, size=200000, seed=42):
+        self.columns = columns
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.sample = np.empty((0, len(columns)), dtype=np.float64)
+        self.seen = 0
+
+    def add(self, df):
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        free = self.size - len(self.sample)
+        if free > 0:
+            self.sample = np.vstack([self.sample, values[:free]])
+            self.seen += min(free, len(values))
+            values = values[free:]
+        if len(values):
+            # Row i (0-based over everything seen) replaces a random slot with probability size / (i + 1)
+            slots = self.rng.integers(0, self.seen + np.arange(1, len(values) + 1))
+            accepted = slots < self.size
+            self.sample[slots[accepted]] = values[accepted]
+            self.seen += len(values)
+
+    def to_frame(self):
+        return pd.DataFrame(self.sample, columns=self.columns)
+
+
+def _append_csv(df, path, first):
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+def read_raw_chunks(raw_path, chunksize=50000):
+    """Re-read the raw CSV (or Parquet/Feather) extract in downcast chunks"""
+    if dataset_format(raw_path) != 'csv':
+        chunks = iter_dataset_batches(raw_path, batch_size=chunksize)
+    else:
+        chunks = pd.read_csv(raw_path, chunksize=chunksize, parse_dates=DATE_COLUMNS)
+    for chunk in chunks:
+        yield optimize_dtypes(chunk)
+
+
+def stream_extract(conn_str, sql, raw_path='../data/raw_loan_data.csv', processed_path='../data/processed_loan_data.parquet',
+                   chunksize=50000, sample_size=200000, connect=None, summary=None):
+    """Extract, clean and engineer features in bounded memory.
+
+    Pass 1 streams the query into raw_path, sketches the financial column quantiles and samples
+    rows for the engineered-ratio medians. raw_path is written as CSV, or as Parquet/Feather with
+    the driver's column types when its extension says so.
+    Pass 2 streams raw_path through the preprocessing and appends to processed_path, as typed
+    Parquet/Feather (one row group per chunk) or CSV depending on its extension.
+    If summary (a streaming_stats.RunningStats) is given, every processed chunk is added to it.
+    Returns (rows, stats, sample) where sample is the raw row sample as a DataFrame.
+    """
+    if connect is None:
+        import pyodbc
+        connect = pyodbc.connect
+    for path in (raw_path, processed_path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    reservoir = RowReservoir(SAMPLE_COLUMNS, size=sample_size)
+    quantiles = FinancialQuantiles()
+    rows = 0
+    raw_writer = ChunkedDatasetWriter(raw_path) if dataset_format(raw_path) != 'csv' else None
+    conn = connect(conn_str)
+    try:
+        for table in iter_query_tables(conn, sql, chunksize):
+            chunk = optimize_dtypes(table.to_pandas())
+            if raw_writer is not None:
+                raw_writer.write_table(table)
+            else:
+                _append_csv(chunk, raw_path, rows == 0)
+            reservoir.add(chunk)
+            quantiles.add(chunk)
+            rows += len(chunk)
+            print(f"\rExtracted {rows} rows", end="")
+    finally:
+        conn.close()
+        if raw_writer is not None:
+            raw_writer.close()
+    print(f"\nRaw data saved to {raw_path}")
+
+    return preprocess_raw(raw_path, processed_path, rows, reservoir, quantiles, chunksize, summary)
+
+
+def preprocess_dataset(raw_path, processed_path='../data/processed_loan_data.parquet', chunksize=50000,
+                       sample_size=200000, summary=None):
+    """stream_extract over an already extracted raw file (e.g. a cached query result) instead of the database"""
+    reservoir = RowReservoir(SAMPLE_COLUMNS, size=sample_size)
+    quantiles = FinancialQuantiles()
+    rows = 0
+    for chunk in read_raw_chunks(raw_path, chunksize):
+        reservoir.add(chunk)
+        quantiles.add(chunk)
+        rows += len(chunk)
+    return preprocess_raw(raw_path, processed_path, rows, reservoir, quantiles, chunksize, summary)
+
+
+def preprocess_raw(raw_path, processed_path, rows, reservoir, quantiles, chunksize=50000, summary=None):
+    """Pass 2 of the extraction: fit the statistics and stream raw_path through the preprocessing.
+
+    reservoir and quantiles are the RowReservoir and FinancialQuantiles fed with every raw row in
+    pass 1. Returns (rows, stats, sample) like stream_extract.
+    """
+    if rows == 0:
+        return 0, None, reservoir.to_frame()
+    # While the reservoir still holds every row the exact fit on it is used instead of the sketches
+    stats = fit_preprocessing(reservoir.to_frame(), quantiles.stats() if rows > reservoir.size else None)
+
+    processed = 0
+    writer = ChunkedDatasetWriter(processed_path) if dataset_format(processed_path) != 'csv' else None
+    try:
+        for chunk in read_raw_chunks(raw_path, chunksize):
+            chunk = preprocess_chunk(chunk, stats)
+            if summary is not None:
+                summary.add(chunk)
+            if writer is not None:
+                writer.write(chunk)
+            else:
+                _append_csv(chunk, processed_path, processed == 0)
+            processed += len(chunk)
+            print(f"\rProcessed {processed}/{rows} rows", end="")
+    finally:
+        if writer is not None:
+            writer.close()
+    print(f"\nProcessed data saved to {processed_path}")
+    return rows, stats, reservoir.to_frame()
@@ -0,0 +1,243 @@
+"""Vectorized cleaning and feature engineering for the loan default dataset.
+
+These are the preprocessing steps of 01_Data_Exploration_and_Preprocessing.ipynb
+as column-at-a-time NumPy/pandas operations (no row-wise apply). Every function
+works on a single chunk or on the whole frame:
+
+- without stats, the dataset-wide statistics (medians, IQR bounds) are fitted on
+  the frame itself, exactly as the notebook does;
+- with stats (from a previous fit, e.g. on a row sample), they are only applied,
+  so every chunk of a streamed dataset is processed identically.
+"""
+import numpy as np
+import pandas as pd
+
+from quantile_sketch import KLLSketch
+
+# Columns that should only contain non-negative values
+FINANCIAL_COLUMNS = ['MonthlyIncome', 'MonthlyMobileMoneyVolume', 'AmountRequested', 'LoanPrincipal']
+
+ENGINEERED_FEATURES = ['DTI', 'LoanToMaxEligibleRatio', 'IncomeToLoanRatio', 'MobileMoneyTurnoverRatio',
+                       'DaysSinceLastDefault', 'CustomerTenureDays', 'OnTimeRepaymentRatio', 'LoanFrequency']
+
+# Fill for customers without a previous default (ten years, in days)
+NO_DEFAULT_DAYS = 365 * 10
+
+
+def add_target(df):
+    # 'Defaulted' as 1 and 'Paid' as 0
+    df['IsDefault'] = (df['LoanStatus'] == 'Defaulted').to_numpy().astype('int8')
+    return df
+
+
+def impute_avg_deposit(df):
+    # The flag is always written so every chunk has the same columns
+    if 'AvgDepositLast6Months' in df.columns:
+        missing = df['AvgDepositLast6Months'].isna().to_numpy()
+        df['AvgDepositLast6Months_ImputedFlag'] = missing.astype('int8')
+        df['AvgDepositLast6Months'] = df['AvgDepositLast6Months'].fillna(0)
+    return df
+
+
+def _float_values(series):
+    """Column as a writable float array (numeric coercion, invalid entries become NaN)"""
+    series = pd.to_numeric(series, errors='coerce')
+    dtype = series.dtype if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f' else np.float64
+    return series.to_numpy(dtype=dtype, na_value=np.nan, copy=True)
+
+
+def _iqr_bounds(q1, q3):
+    iqr = q3 - q1
+    # Only cap if there is variance, and enforce a hard minimum of 0 for financial data
+    if iqr > 0:
+        return max(0, q1 - 1.5 * iqr), q3 + 1.5 * iqr
+    return None, None
+
+
+def clean_financial_columns(df, stats=None, verbose=False):
+    """Sanitize, impute and cap the financial columns.
+
+    With stats=None the medians and IQR bounds are computed from df (as the notebook does on the
+    full frame) and returned; otherwise the given stats are applied.
+    """
+    fitting = stats is None
+    stats = {} if fitting else stats
+    for col in FINANCIAL_COLUMNS:
+        if col not in df.columns:
+            if verbose:
+                print(f"\nWarning: Column '{col}' not found in DataFrame. Skipping.")
+            continue
+        values = _float_values(df[col])
+
+        # Stage 1: Sanitize Data - remove invalid negative values
+        negative = values < 0
+        values[negative] = np.nan
+        if verbose:
+            print(f"\n--- Processing column: '{col}' ---")
+            print(f"Stage 1: {int(negative.sum())} invalid negative values converted to NaN.")
+
+        # Stage 2: Impute Missing Values (median of the valid data, or 0 if the whole column was invalid)
+        missing = np.isnan(values)
+        if fitting:
+            valid = values[~missing].astype(np.float64)
+            stats.setdefault(col, {})['median'] = float(np.median(valid)) if len(valid) else 0.0
+        values[missing] = stats[col]['median']
+        if verbose:
+            print(f"Stage 2: {int(missing.sum())} missing values imputed with {stats[col]['median']:.2f}")
+
+        # Stage 3: Handle Outliers on the clean data
+        if fitting:
+            if len(values):
+                q1, q3 = (float(q) for q in np.quantile(values.astype(np.float64), [0.25, 0.75]))
+            else:
+                q1 = q3 = 0.0
+            stats[col]['lower'], stats[col]['upper'] = _iqr_bounds(q1, q3)
+        if stats[col]['upper'] is not None:
+            np.clip(values, stats[col]['lower'], stats[col]['upper'], out=values)
+        df[col] = values
+        if verbose:
+            print(f"Stage 3: bounds {stats[col]['lower']} - {stats[col]['upper']}")
+            print(df[col].describe())
+    return stats
+
+
+class FinancialQuantiles:
+    """One-pass, bounded-memory fit of the financial column statistics from a chunk stream.
+
+    Valid (non-negative) values go into a KLL sketch per column and invalid or missing ones are
+    counted, which is all clean_financial_columns needs: the median of the valid values, and the
+    quartiles of the column after the median fill (the sketch plus a point mass at the median).
+    Estimates carry the sketch's rank error (about 0.35% of n for k=1000, see quantile_sketch).
+    """
+    def __init__(self, columns=None, k=1000, seed=42):
+        columns = FINANCIAL_COLUMNS if columns is None else columns
+        self.sketches = {col: KLLSketch(k, seed=seed + index) for index, col in enumerate(columns)}
+        self.invalid = {col: 0 for col in columns}
+
+    def add(self, df):
+        for col, sketch in self.sketches.items():
+            if col in df.columns:
+                values = _float_values(df[col])
+                valid = values[values >= 0]
+                sketch.update(valid)
+                self.invalid[col] += len(values) - len(valid)
+        return self
+
+    def merge(self, other):
+        for col, sketch in self.sketches.items():
+            sketch.merge(other.sketches[col])
+            self.invalid[col] += other.invalid[col]
+        return self
+
+    def stats(self):
+        """Financial stats in the format clean_financial_columns applies"""
+        stats = {}
+        for col, sketch in self.sketches.items():
+            median = sketch.quantile(0.5) if sketch.n else 0.0
+            q1, q3 = sketch.quantiles([0.25, 0.75], point_masses=[(median, self.invalid[col])])
+            lower, upper = _iqr_bounds(float(q1), float(q3))
+            stats[col] = {'median': median, 'lower': lower, 'upper': upper}
+        return stats
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator where denominator > 0, NaN elsewhere (no division warnings)"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _fill(values, fill):
+    values[np.isnan(values)] = fill
+    return values
+
+
+def _as_datetime(series):
+    # pd.to_datetime is not free on columns that are already datetime64
+    return series if pd.api.types.is_datetime64_any_dtype(series) else pd.to_datetime(series)
+
+
+def _days_between(later, earlier):
+    """Whole days (floored, like Timedelta.days) between two datetime columns, NaN where either is missing"""
+    delta = (later - earlier).to_numpy(dtype='timedelta64[ns]')
+    days = np.floor_divide(delta.view('int64'), np.timedelta64(1, 'D') // np.timedelta64(1, 'ns')).astype(np.float64)
+    days[np.isnat(delta)] = np.nan
+    return days
+
+
+def fit_feature_stats(df):
+    """Median fills for the ratios the notebook imputes (df must already be cleaned)"""
+    return {
+        'DTI_median': float(np.nanmedian(_ratio(df['AmountRequested'], df['MonthlyIncome']))),
+        'LoanToMaxEligibleRatio_median': float(np.nanmedian(_ratio(df['AmountRequested'], df['MaxEligibleLoanAmount'])))
+    }
+
+
+def engineer_features(df, stats=None):
+    """Add the engineered features; median fills are fitted from df when stats is None"""
+    stats = fit_feature_stats(df) if stats is None else stats
+
+    # Debt-To-Income Ratio(DTI)
+    df['DTI'] = _fill(_ratio(df['AmountRequested'], df['MonthlyIncome']), stats['DTI_median'])
+    # Loan Amount to Max Eligible Amount Ratio
+    df['LoanToMaxEligibleRatio'] = _fill(_ratio(df['AmountRequested'], df['MaxEligibleLoanAmount']),
+                                         stats['LoanToMaxEligibleRatio_median'])
+
+    # Ratio of monthly income to the requested loan amount
+    df['IncomeToLoanRatio'] = _ratio(df['MonthlyIncome'], df['AmountRequested'])
+    # Ratio of total money volume to income, could indicate reliance on mobile money
+    df['MobileMoneyTurnoverRatio'] = _ratio(df['MonthlyMobileMoneyVolume'], df['MonthlyIncome'])
+
+    # Time since last default (in days, at time of application)
+    df['ApplicationDate'] = _as_datetime(df['ApplicationDate'])
+    df['PreviousLastDefaultDate'] = _as_datetime(df['PreviousLastDefaultDate'])
+    df['DaysSinceLastDefault'] = _fill(_days_between(df['ApplicationDate'], df['PreviousLastDefaultDate']), NO_DEFAULT_DAYS)
+
+    # Customer Tenure (in days, at time of application)
+    df['CustomerRegistrationDate'] = _as_datetime(df['CustomerRegistrationDate'])
+    tenure = _fill(_days_between(df['ApplicationDate'], df['CustomerRegistrationDate']), 0)
+    df['CustomerTenureDays'] = tenure
+
+    # Ratio of on-time vs. defaulted previous loans
+    loans = df['PreviousLoansTaken'].to_numpy(dtype=np.float64, na_value=np.nan)
+    defaults = df['PreviousDefaults'].to_numpy(dtype=np.float64, na_value=np.nan)
+    df['OnTimeRepaymentRatio'] = _ratio(loans - defaults, loans)
+    # How frequently a customer takes a loan (loans per day of tenure)
+    df['LoanFrequency'] = _ratio(loans, tenure)
+
+    for col in ENGINEERED_FEATURES:
+        df[col] = df[col].astype('float32')
+    return stats
+
+
+def preprocess(df, stats=None):
+    """Target, imputation, cleaning and engineered features for a chunk or a whole frame.
+
+    Fits the statistics on df when stats is None. Returns (df, stats).
+    """
+    add_target(df)
+    impute_avg_deposit(df)
+    # Principal as booked (NULLs stay missing), for totals that capping and imputation would distort
+    df['LoanPrincipalRaw'] = _float_values(df['LoanPrincipal'])
+    financial = clean_financial_columns(df, None if stats is None else stats['financial'])
+    engineered = engineer_features(df, None if stats is None else stats['features'])
+    return df, {'financial': financial, 'features': engineered}
+
+
+def fit_preprocessing(sample, financial=None):
+    """Fit cleaning and feature statistics on a row sample of the raw data.
+
+    financial (e.g. FinancialQuantiles.stats() over the full stream) replaces the sample-based
+    median/IQR fit; the sample is then only used for the median fills of the engineered ratios.
+    """
+    sample = sample.copy()
+    stats = {'financial': clean_financial_columns(sample, financial)}
+    stats['features'] = fit_feature_stats(sample)
+    return stats
+
+
+def preprocess_chunk(df, stats):
+    """Apply the notebook's cleaning and feature engineering to one chunk with fitted stats"""
+    return preprocess(df, stats)[0]
@@ -0,0 +1,257 @@
+"""Incremental, watermark-based extraction into LoanID-partitioned datasets.
+
+The dataset directory holds the raw query rows and the processed rows as
+Parquet partitions of partition_size consecutive LoanIDs
+(raw/part-00012.parquet, processed/part-00012.parquet), plus _state.json with
+the watermark and the preprocessing statistics of the last run.
+
+The first run (or full=True) extracts every settled loan, fits the statistics
+over the whole stream and writes all partitions. Later runs add one predicate
+to the query's settled-loan filter and pull only the loans that are new or
+changed since the stored watermark:
+
+- LoanID above the highest settled LoanID (new loans);
+- Loans.LastPaymentDate after the last seen one (loans paid off since);
+- CustomerCreditInfo.LastUpdated after the last seen one (credit profile
+  changes, including the default bookkeeping of newly defaulted loans).
+
+The pulled rows are upserted by LoanID into their raw partitions and only those
+partitions are re-run through the preprocessing, with the stored statistics so
+old and new rows stay comparable; refit=True re-fits them from the local raw
+partitions and rebuilds everything without touching the database. Finally the
+processed partitions are concatenated in LoanID order into processed_path, so
+the notebooks keep reading one file.
+
+The watermark is read before the query and saved only after all partitions are
+written, so an interrupted run repeats its increment on the next run; the upsert
+makes that harmless. Loans that leave the settled statuses (e.g. Defaulted to
+CRB) are not removed by an incremental run; run with full=True to drop them.
+"""
+import datetime
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from extraction import (SAMPLE_COLUMNS, RowReservoir, iter_query_tables, optimize_dtypes, preprocess_chunk,
+                        read_raw_chunks)
+from features import FinancialQuantiles, fit_preprocessing
+from partitioned_extraction import partition_query
+from persistence import ChunkedDatasetWriter
+
+STATE_FILE = '_state.json'
+
+# Watermark values read before each run, in this order
+WATERMARK_QUERY = ("SELECT (SELECT MAX(LoanID) FROM Loans WHERE Status IN ('Paid', 'Defaulted')), "
+                   "(SELECT MAX(LastPaymentDate) FROM Loans), "
+                   "(SELECT MAX(LastUpdated) FROM CustomerCreditInfo)")
+
+# Watermark key -> predicate selecting the rows that are new or changed since its stored value
+CHANGED_PREDICATES = {
+    'LoanID': "L.LoanID > ?",
+    'LastPaymentDate': "L.LastPaymentDate > ?",
+    'LastUpdated': "CCI.LastUpdated > ?",
+}
+
+DATE_WATERMARKS = ['LastPaymentDate', 'LastUpdated']
+
+
+def read_watermark(conn):
+    cursor = conn.cursor()
+    cursor.execute(WATERMARK_QUERY)
+    values = cursor.fetchone()
+    cursor.close()
+    return dict(zip(CHANGED_PREDICATES, values))
+
+
+def _encode_watermark(watermark):
+    return {key: value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+            for key, value in watermark.items()}
+
+
+def _decode_watermark(stored):
+    return {key: datetime.datetime.fromisoformat(value) if key in DATE_WATERMARKS and value is not None else value
+            for key, value in stored.items()}
+
+
+def changed_rows_predicate(watermark):
+    """(predicate, params) for the rows past the watermark; keys without a stored value are skipped"""
+    keys = [key for key in CHANGED_PREDICATES if watermark.get(key) is not None]
+    if not keys:
+        return None, []
+    predicate = " OR ".join(CHANGED_PREDICATES[key] for key in keys)
+    return predicate, [watermark[key] for key in keys]
+
+
+def load_state(dataset_dir):
+    path = os.path.join(dataset_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        state = json.load(file)
+    state['watermark'] = _decode_watermark(state['watermark'])
+    return state
+
+
+def save_state(dataset_dir, state):
+    path = os.path.join(dataset_dir, STATE_FILE)
+    stored = dict(state, watermark=_encode_watermark(state['watermark']))
+    with open(path + '.tmp', 'w') as file:
+        json.dump(stored, file, indent=1, default=float)
+    os.replace(path + '.tmp', path)
+
+
+def _part_path(dataset_dir, kind, partition):
+    return os.path.join(dataset_dir, kind, f"part-{partition:05d}.parquet")
+
+
+def _partitions(dataset_dir, kind):
+    directory = os.path.join(dataset_dir, kind)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[5:10]) for name in os.listdir(directory)
+                  if name.startswith('part-') and name.endswith('.parquet'))
+
+
+def raw_partitions(dataset_dir='../data/processed_loans'):
+    """Paths of the raw partitions in LoanID order"""
+    return [_part_path(dataset_dir, 'raw', partition) for partition in _partitions(dataset_dir, 'raw')]
+
+
+def _stage(tables, staging_dir, partition_size, on_chunk=None):
+    """Split the query result by LoanID partition into staging files; returns (rows, partitions)"""
+    writers = {}
+    rows = 0
+    try:
+        for table in tables:
+            partition_ids = pc.divide(table['LoanID'].cast(pa.int64()), partition_size)
+            for partition in pc.unique(partition_ids).to_pylist():
+                if partition not in writers:
+                    writers[partition] = ChunkedDatasetWriter(_part_path(staging_dir, 'raw', partition))
+                writers[partition].write_table(table.filter(pc.equal(partition_ids, partition)))
+            if on_chunk is not None:
+                on_chunk(optimize_dtypes(table.to_pandas()))
+            rows += table.num_rows
+            print(f"\rExtracted {rows} rows", end="")
+    finally:
+        for writer in writers.values():
+            writer.close()
+    print()
+    return rows, sorted(writers)
+
+
+def _upsert_partition(dataset_dir, staging_dir, partition, replace):
+    """Merge the staged rows into a raw partition, staged rows winning on LoanID; sorted by LoanID"""
+    staged = pq.read_table(_part_path(staging_dir, 'raw', partition))
+    target = _part_path(dataset_dir, 'raw', partition)
+    if os.path.exists(target) and not replace:
+        existing = pq.read_table(target)
+        kept = existing.filter(pc.invert(pc.is_in(existing['LoanID'], value_set=staged['LoanID'].combine_chunks())))
+        staged = pa.concat_tables([kept, staged.select(existing.schema.names).cast(existing.schema)])
+    staged = staged.sort_by('LoanID')
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    pq.write_table(staged, target + '.tmp', compression='zstd')
+    os.replace(target + '.tmp', target)
+
+
+def _rebuild_processed(dataset_dir, partition, stats, chunksize):
+    target = _part_path(dataset_dir, 'processed', partition)
+    with ChunkedDatasetWriter(target + '.tmp.parquet') as writer:
+        for chunk in read_raw_chunks(_part_path(dataset_dir, 'raw', partition), chunksize):
+            writer.write(preprocess_chunk(chunk, stats))
+    os.replace(target + '.tmp.parquet', target)
+
+
+def _fit_from_raw(dataset_dir, chunksize, sample_size):
+    reservoir = RowReservoir(SAMPLE_COLUMNS, size=sample_size)
+    quantiles = FinancialQuantiles()
+    for partition in _partitions(dataset_dir, 'raw'):
+        for chunk in read_raw_chunks(_part_path(dataset_dir, 'raw', partition), chunksize):
+            reservoir.add(chunk)
+            quantiles.add(chunk)
+    return fit_preprocessing(reservoir.to_frame(), quantiles.stats() if reservoir.seen > sample_size else None)
+
+
+def merge_processed(dataset_dir, processed_path):
+    """Concatenate the processed partitions in LoanID order into one Parquet/Feather file"""
+    temporary = processed_path + '.tmp' + os.path.splitext(processed_path)[1]
+    with ChunkedDatasetWriter(temporary) as writer:
+        for partition in _partitions(dataset_dir, 'processed'):
+            for batch in pq.ParquetFile(_part_path(dataset_dir, 'processed', partition)).iter_batches():
+                writer.write_table(batch)
+    if os.path.exists(temporary):
+        os.replace(temporary, processed_path)
+
+
+def incremental_extract(conn_str, sql, dataset_dir='../data/processed_loans',
+                        processed_path='../data/processed_loan_data.parquet', partition_size=100000,
+                        chunksize=50000, sample_size=200000, connect=None, full=False, refit=False):
+    """Extract the loans settled or changed since the last run and rebuild only their partitions.
+
+    Returns (rows, stats, partitions): rows pulled from the database, the preprocessing stats in
+    use and the rebuilt partition numbers.
+    """
+    if connect is None:
+        import pyodbc
+        connect = pyodbc.connect
+    state = None if full else load_state(dataset_dir)
+    if state is not None and state['partition_size'] != partition_size:
+        raise ValueError(f"{dataset_dir} is partitioned by {state['partition_size']} LoanIDs; run with full=True to re-partition")
+
+    query, params = sql, None
+    if state is not None:
+        predicate, params = changed_rows_predicate(state['watermark'])
+        if predicate is not None:
+            query = partition_query(sql, predicate)
+
+    staging_dir = os.path.join(dataset_dir, '_staging')
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    reservoir = RowReservoir(SAMPLE_COLUMNS, size=sample_size)
+    quantiles = FinancialQuantiles()
+
+    def sketch(chunk):
+        reservoir.add(chunk)
+        quantiles.add(chunk)
+
+    conn = connect(conn_str)
+    try:
+        watermark = read_watermark(conn)
+        print("Full extraction" if state is None else f"Incremental extraction since {_encode_watermark(state['watermark'])}")
+        rows, touched = _stage(iter_query_tables(conn, query, chunksize, params), staging_dir, partition_size,
+                               on_chunk=sketch if state is None else None)
+    finally:
+        conn.close()
+
+    try:
+        if state is None:
+            # A full run replaces the dataset: partitions that received no rows are stale
+            for kind in ('raw', 'processed'):
+                shutil.rmtree(os.path.join(dataset_dir, kind), ignore_errors=True)
+        for partition in touched:
+            _upsert_partition(dataset_dir, staging_dir, partition, replace=state is None)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    if state is None and rows == 0:
+        print("No settled loans to extract")
+        return 0, None, []
+    if state is None:
+        stats = fit_preprocessing(reservoir.to_frame(), quantiles.stats() if rows > sample_size else None)
+    elif refit:
+        stats = _fit_from_raw(dataset_dir, chunksize, sample_size)
+    else:
+        stats = state['stats']
+    rebuild = _partitions(dataset_dir, 'raw') if refit else touched
+    for index, partition in enumerate(rebuild, start=1):
+        _rebuild_processed(dataset_dir, partition, stats, chunksize)
+        print(f"\rRebuilt {index}/{len(rebuild)} partitions", end="")
+    print()
+
+    if rebuild:
+        merge_processed(dataset_dir, processed_path)
+        print(f"Processed data saved to {processed_path}")
+    save_state(dataset_dir, {'watermark': watermark, 'partition_size': partition_size, 'stats': stats})
+    return rows, stats, rebuild
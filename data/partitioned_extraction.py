@@ -0,0 +1,142 @@
+"""Range-partitioned parallel extraction.
+
+The settled loans are split into equal-row ranges of LoanID (or
+DisbursementDate) with one NTILE pass over Loans, which the server answers from
+the narrow Loans index without touching the joined tables. Each range is the
+extraction query with one extra predicate on its final WHERE clause, run on a
+thread pool with one connection per worker (pyodbc releases the GIL while it
+waits on the server), and streamed into its own Parquet part file with the
+driver's column types. The parts are then merged in range order into one raw
+Parquet file, feeding the row sample and quantile sketches on the way, and the
+usual second pass (extraction.preprocess_raw) writes the processed dataset.
+
+Ranges are half-open [lower bound, next lower bound); the first also takes rows
+with a NULL partition column, so every row lands in exactly one part.
+"""
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pyarrow.parquet as pq
+
+from extraction import SAMPLE_COLUMNS, RowReservoir, iter_query_tables, optimize_dtypes, preprocess_raw
+from features import FinancialQuantiles
+from persistence import ChunkedDatasetWriter
+
+# Partition columns of the Loans table (alias L in the extraction query)
+PARTITION_COLUMNS = ['LoanID', 'DisbursementDate']
+
+# The settled-loan filter closing the extraction query; partition predicates are ANDed onto it
+SETTLED_FILTER = re.compile(r"WHERE\s+L\.Status\s+IN\s*\(\s*'Paid'\s*,\s*'Defaulted'\s*\)", re.IGNORECASE)
+
+
+def _partition_column(column):
+    if column not in PARTITION_COLUMNS:
+        raise ValueError(f"Unsupported partition column {column!r}; use one of {PARTITION_COLUMNS}")
+    return f"L.{column}"
+
+
+def partition_bounds(conn, partitions, column='LoanID'):
+    """Sorted distinct lower bounds of `partitions` equal-row ranges of the settled loans"""
+    expression = _partition_column(column)
+    sql = (f"SELECT MIN(T.Value) AS LowerBound FROM ("
+           f"SELECT {expression} AS Value, NTILE({int(partitions)}) OVER (ORDER BY {expression}) AS Part "
+           f"FROM Loans L WHERE L.Status IN ('Paid', 'Defaulted') AND {expression} IS NOT NULL) T "
+           f"GROUP BY T.Part ORDER BY LowerBound")
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    bounds = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    # Ties on a date column can give two tiles the same lower bound; one range covers both
+    return sorted(set(bounds))
+
+
+def partition_predicates(bounds, column='LoanID'):
+    """(predicate, params) for each range; the first range also takes NULLs, the last is open-ended"""
+    expression = _partition_column(column)
+    if len(bounds) < 2:
+        return [("1 = 1", [])]
+    predicates = [(f"({expression} < ? OR {expression} IS NULL)", [bounds[1]])]
+    for lower, upper in zip(bounds[1:-1], bounds[2:]):
+        predicates.append((f"{expression} >= ? AND {expression} < ?", [lower, upper]))
+    predicates.append((f"{expression} >= ?", [bounds[-1]]))
+    return predicates
+
+
+def partition_query(sql, predicate):
+    """The extraction query restricted to one range (the predicate is ANDed onto its settled-loan filter)"""
+    matches = list(SETTLED_FILTER.finditer(sql))
+    if not matches:
+        raise ValueError("The query has no \"WHERE L.Status IN ('Paid', 'Defaulted')\" filter to partition on")
+    end = matches[-1].end()
+    return f"{sql[:end]} AND ({predicate}){sql[end:]}"
+
+
+def extract_partition(conn_str, sql, params, path, chunksize=50000, connect=None):
+    """Run one range on its own connection and stream it into a Parquet part; returns the row count"""
+    conn = connect(conn_str)
+    try:
+        with ChunkedDatasetWriter(path) as writer:
+            for table in iter_query_tables(conn, sql, chunksize, params):
+                writer.write_table(table)
+        return writer.rows
+    finally:
+        conn.close()
+
+
+def parallel_extract(conn_str, sql, raw_path='../data/raw_loan_data.parquet',
+                     processed_path='../data/processed_loan_data.parquet', workers=4, partitions=None,
+                     column='LoanID', chunksize=50000, sample_size=200000, connect=None, summary=None):
+    """stream_extract with the query split into ranges run concurrently, one connection per worker.
+
+    partitions defaults to 2 * workers, so a slow range does not leave the other workers idle.
+    raw_path must be Parquet or Feather. Returns (rows, stats, sample) like stream_extract.
+    """
+    if connect is None:
+        import pyodbc
+        connect = pyodbc.connect
+    partitions = partitions or 2 * workers
+
+    conn = connect(conn_str)
+    try:
+        bounds = partition_bounds(conn, partitions, column)
+    finally:
+        conn.close()
+    ranges = partition_predicates(bounds, column)
+    print(f"Extracting {len(ranges)} {column} ranges on {workers} workers")
+
+    parts_dir = raw_path + '.parts'
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    part_paths = [os.path.join(parts_dir, f"part-{index:05d}.parquet") for index in range(len(ranges))]
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_partition, conn_str, partition_query(sql, predicate), params,
+                                       path, chunksize, connect)
+                       for (predicate, params), path in zip(ranges, part_paths)]
+            extracted = 0
+            for done, future in enumerate(as_completed(futures), start=1):
+                extracted += future.result()
+                print(f"\rExtracted {extracted} rows ({done}/{len(ranges)} ranges)", end="")
+        print()
+
+        # Merge in range order; empty ranges never opened their part file
+        reservoir = RowReservoir(SAMPLE_COLUMNS, size=sample_size)
+        quantiles = FinancialQuantiles()
+        rows = 0
+        with ChunkedDatasetWriter(raw_path) as writer:
+            for path in part_paths:
+                if not os.path.exists(path):
+                    continue
+                for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize):
+                    writer.write_table(batch)
+                    chunk = optimize_dtypes(batch.to_pandas())
+                    reservoir.add(chunk)
+                    quantiles.add(chunk)
+                    rows += len(chunk)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    print(f"Raw data saved to {raw_path}")
+
+    return preprocess_raw(raw_path, processed_path, rows, reservoir, quantiles, chunksize, summary)
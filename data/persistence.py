@@ -0,0 +1,154 @@
+"""Typed, chunked persistence for the processed loan dataset.
+
+Chunks are appended to a single Parquet file (one row group per chunk, zstd
+compressed) or to a Feather/Arrow IPC file (one record batch per chunk). Both
+keep the dtypes set during extraction, including categoricals, and can be read
+back column-selectively with memory mapping.
+"""
+import hashlib
+import os
+import struct
+
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow')
+
+
+def dataset_format(path):
+    """'parquet', 'feather' or 'csv' from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if extension in FEATHER_EXTENSIONS:
+        return 'feather'
+    return 'csv'
+
+
+class ChunkedDatasetWriter:
+    """Appends DataFrame chunks to one Parquet or Feather file with a fixed schema.
+
+    The first chunk defines the schema unless one is given; later chunks are cast to it, so
+    per-chunk dtype drift (all-null columns, differing category dictionaries) cannot break the file.
+    Feather is written uncompressed by default so it can be memory-mapped zero-copy.
+    """
+    def __init__(self, path, compression=None, row_group_size=None, schema=None):
+        self.path = path
+        self.format = dataset_format(path)
+        if self.format == 'csv':
+            raise ValueError(f"Unsupported dataset format for {path}; use .parquet or .feather")
+        self.compression = compression if compression is not None else ('zstd' if self.format == 'parquet' else 'uncompressed')
+        self.row_group_size = row_group_size
+        self.schema = None
+        self.fixed_schema = schema
+        self.writer = None
+        self.sink = None
+        self.rows = 0
+
+    def _file_schema(self, schema):
+        """Arrow IPC files allow one dictionary per field, so Feather stores categoricals as plain strings"""
+        if self.format == 'parquet':
+            return schema
+        fields = [field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type) else field
+                  for field in schema]
+        return pa.schema(fields, metadata=schema.metadata)
+
+    def _open(self, schema):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.schema = schema
+        if self.format == 'parquet':
+            self.writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+        else:
+            self.sink = pa.OSFile(self.path, 'wb')
+            options = pa.ipc.IpcWriteOptions(compression=None if self.compression == 'uncompressed' else self.compression)
+            self.writer = pa.ipc.new_file(self.sink, schema, options=options)
+
+    def write(self, df):
+        if self.fixed_schema is not None:
+            table = pa.Table.from_pandas(df, schema=self.fixed_schema, preserve_index=False)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        self.write_table(table)
+
+    def write_table(self, table):
+        """Append an Arrow table (or record batch) as is"""
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if self.writer is None:
+            self._open(self._file_schema(table.schema))
+        table = table.select(self.schema.names).cast(self.schema)
+        if self.format == 'parquet':
+            self.writer.write_table(table, row_group_size=self.row_group_size)
+        else:
+            for batch in table.to_batches(max_chunksize=self.row_group_size):
+                self.writer.write_batch(batch)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def dataset_columns(path):
+    """Column names stored in a Parquet or Feather dataset, read from the footer/schema only"""
+    if dataset_format(path) == 'parquet':
+        return pq.read_schema(path).names
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def load_table(path, columns=None, memory_map=True):
+    """Arrow table with only the requested columns; nothing else is read or decoded"""
+    if dataset_format(path) == 'parquet':
+        return pq.read_table(path, columns=columns, memory_map=memory_map)
+    return feather.read_table(path, columns=columns, memory_map=memory_map)
+
+
+def load_dataset(path, columns=None, memory_map=True):
+    """DataFrame with only the requested columns, memory-mapped where the format allows"""
+    return load_table(path, columns=columns, memory_map=memory_map).to_pandas()
+
+
+def iter_dataset_batches(path, columns=None, batch_size=100000):
+    """Stream a Parquet or Feather dataset as DataFrames of at most batch_size rows"""
+    if dataset_format(path) == 'parquet':
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        batches = load_table(path, columns=columns).to_batches(max_chunksize=batch_size)
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+def dataset_fingerprint(path, block_size=1 << 20):
+    """Content fingerprint of a dataset file.
+
+    For Parquet the footer (schema, row group offsets and per-column statistics) plus the file
+    size identify the content without reading the data pages; other formats are hashed in full.
+    """
+    digest = hashlib.sha256()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, 'rb') as file:
+        if dataset_format(path) == 'parquet' and size >= 12:
+            file.seek(size - 8)
+            footer_length = struct.unpack('<I', file.read(4))[0]
+            file.seek(max(0, size - 8 - footer_length))
+            digest.update(file.read(footer_length + 8))
+        else:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,155 @@
+"""Content-addressed cache of extraction query results.
+
+A result is stored as a Parquet file named after two hashes: the SQL text and
+a database watermark. The watermark is one cheap query of row counts, max
+identity keys and max change timestamps of the source tables (see
+WATERMARK_EXPRESSIONS). While neither the query nor the watermark changes, a
+re-run returns the cached file after that single round trip instead of
+re-running the extraction.
+
+The watermark only sees what its expressions see: inserts, deletes, loans
+settling (the settled count and LastPaymentDate) and credit-info updates
+(LastUpdated). In-place edits to other columns are not detected; pass
+refresh=True to force a new extraction.
+
+A new entry replaces the older entries of the same SQL, whose watermarks are
+superseded. Entries of other queries are evicted least-recently-used first once
+the cache exceeds max_bytes.
+"""
+import hashlib
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from extraction import iter_query_tables
+from persistence import ChunkedDatasetWriter
+
+# Per source table, the aggregate expressions whose values make up the watermark.
+# MobileMoneyTransactions is append-only (identity key), so its max key stands in for a count.
+WATERMARK_EXPRESSIONS = {
+    'Customers': ['COUNT(*)', 'MAX(CustomerID)'],
+    'LoanProducts': ['COUNT(*)', 'MAX(ProductID)'],
+    'LoanApplications': ['COUNT(*)', 'MAX(ApplicationID)'],
+    'Loans': ['COUNT(*)', 'MAX(LoanID)', 'MAX(LastPaymentDate)',
+              "SUM(CASE WHEN Status IN ('Paid', 'Defaulted') THEN 1 ELSE 0 END)"],
+    'CustomerCreditInfo': ['COUNT(*)', 'MAX(CreditInfoID)', 'MAX(LastUpdated)'],
+    'MobileMoneyTransactions': ['MAX(TransactionID)'],
+}
+
+ENTRY_PREFIX = 'query_'
+ENTRY_SUFFIX = '.parquet'
+
+
+def watermark_query(expressions=None):
+    """One SELECT returning every watermark value as a scalar subquery (a single round trip)"""
+    expressions = expressions or WATERMARK_EXPRESSIONS
+    columns = [f"(SELECT {expression} FROM {table})"
+               for table, table_expressions in expressions.items() for expression in table_expressions]
+    return "SELECT " + ", ".join(columns)
+
+
+def database_watermark(conn, expressions=None):
+    """Watermark of the source tables as a {'Table': [values]} dict of strings"""
+    expressions = expressions or WATERMARK_EXPRESSIONS
+    cursor = conn.cursor()
+    cursor.execute(watermark_query(expressions))
+    values = iter(cursor.fetchone())
+    cursor.close()
+    return {table: [str(next(values)) for _ in table_expressions] for table, table_expressions in expressions.items()}
+
+
+def sql_hash(sql):
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def watermark_hash(watermark):
+    text = '|'.join(f"{table}={','.join(values)}" for table, values in sorted(watermark.items()))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class QueryCache:
+    """Directory of query result files keyed by (SQL hash, watermark hash), bounded by max_bytes"""
+    def __init__(self, cache_dir='../data/cache/queries', max_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, sql, watermark):
+        name = f"{ENTRY_PREFIX}{sql_hash(sql)[:16]}_{watermark_hash(watermark)[:16]}{ENTRY_SUFFIX}"
+        return os.path.join(self.cache_dir, name)
+
+    def entries(self):
+        """Cached result files, least recently used first"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                 if name.startswith(ENTRY_PREFIX) and name.endswith(ENTRY_SUFFIX) and '.tmp' not in name]
+        return sorted(paths, key=os.path.getmtime)
+
+    def get(self, sql, watermark):
+        """Path of the cached result, or None; a hit marks the entry as recently used"""
+        path = self.path(sql, watermark)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return path
+
+    def put(self, sql, watermark, tables):
+        """Store a result given as an iterable of Arrow tables; returns its path"""
+        path = self.path(sql, watermark)
+        temporary = path[:-len(ENTRY_SUFFIX)] + '.tmp' + ENTRY_SUFFIX
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            with ChunkedDatasetWriter(temporary) as writer:
+                for table in tables:
+                    writer.write_table(table)
+            if writer.rows == 0 and not os.path.exists(temporary):
+                pq.write_table(pa.table({}), temporary)
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Drop superseded entries of keep's SQL, then the least recently used until under max_bytes"""
+        entries = self.entries()
+        if keep is not None:
+            same_sql = os.path.basename(keep)[:len(ENTRY_PREFIX) + 16]
+            for path in [path for path in entries if path != keep and os.path.basename(path).startswith(same_sql)]:
+                os.remove(path)
+                entries.remove(path)
+        total = sum(os.path.getsize(path) for path in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+
+def fetch(conn_str, sql, cache=None, chunksize=50000, connect=None, refresh=False):
+    """Path of a Parquet file with the query result, from the cache when the watermark is unchanged.
+
+    Returns (path, hit). On a miss the query is streamed into the cache over the same connection.
+    """
+    if connect is None:
+        import pyodbc
+        connect = pyodbc.connect
+    cache = cache or QueryCache()
+    started = time.perf_counter()
+    conn = connect(conn_str)
+    try:
+        watermark = database_watermark(conn)
+        path = None if refresh else cache.get(sql, watermark)
+        if path is not None:
+            print(f"Query result loaded from cache {path} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+            return path, True
+        path = cache.put(sql, watermark, iter_query_tables(conn, sql, chunksize))
+    finally:
+        conn.close()
+    print(f"Query result cached at {path} ({time.perf_counter() - started:.1f} s)")
+    return path, False
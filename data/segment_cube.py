@@ -0,0 +1,141 @@
+"""Default-rate cube over the categorical customer and loan segments.
+
+One scan of the processed dataset groups every row by all segment dimensions
+at once (the base cuboid: one row per observed combination). Every single and
+pairwise segmentation is then a roll-up of that small table instead of another
+groupby over the full data. The roll-ups are stored in data/cache keyed by the
+dataset fingerprint, so after the first build any default-rate table or
+heatmap is a lookup.
+
+Measures per segment: Loans, Defaults, Principal (sum of LoanPrincipalRaw, the
+principal before IQR capping and median imputation; missing principal counts as
+0) and Repaid (TotalRepayable of loans with status 'Paid'; partial repayments on
+defaulted loans are not part of the extract).
+"""
+import hashlib
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from persistence import dataset_columns, dataset_fingerprint, iter_dataset_batches
+
+DIMENSIONS = ['EmploymentStatus', 'LoanPurpose', 'LoanCategory', 'Gender', 'EducationLevel', 'MaritalStatus', 'County']
+
+MEASURES = ['Loans', 'Defaults', 'Principal', 'Repaid']
+
+MEASURE_SOURCE_COLUMNS = ['IsDefault', 'LoanPrincipalRaw', 'TotalRepayable', 'LoanStatus']
+
+# Column in the stored cube naming the dimensions of each row's segmentation, e.g. 'Gender|County'
+GROUPING_COLUMN = 'Segmentation'
+
+
+def _measures(df):
+    paid = (df['LoanStatus'] == 'Paid').to_numpy()
+    return pd.DataFrame({
+        'Loans': np.ones(len(df), dtype=np.int64),
+        'Defaults': df['IsDefault'].to_numpy(dtype=np.int64),
+        'Principal': df['LoanPrincipalRaw'].to_numpy(dtype=np.float64, na_value=0.0),
+        'Repaid': np.where(paid, df['TotalRepayable'].to_numpy(dtype=np.float64, na_value=0.0), 0.0),
+    })
+
+
+def _with_default_rate(table):
+    table = table.copy()
+    table['DefaultRate'] = table['Defaults'] / table['Loans']
+    return table
+
+
+class SegmentCube:
+    """Loans, defaults, principal and repaid amounts for all single and pairwise segment combinations"""
+    def __init__(self, dimensions=None):
+        self.dimensions = list(dimensions or DIMENSIONS)
+        self.partials = []
+        self.cuboids = {}
+
+    def add(self, df):
+        """Fold one chunk into the base cuboid (only the observed dimension combinations are kept)"""
+        measures = _measures(df)
+        keys = {dimension: df[dimension].astype(object).to_numpy() for dimension in self.dimensions}
+        grouped = pd.concat([pd.DataFrame(keys), measures], axis=1).groupby(self.dimensions, dropna=False, sort=False).sum()
+        self.partials.append(grouped)
+
+    def build(self):
+        """Roll the base cuboid up to every single dimension and every pair of dimensions"""
+        if not self.partials:
+            raise ValueError("No data added to the segment cube")
+        base = pd.concat(self.partials).groupby(level=self.dimensions, dropna=False, sort=False).sum()
+        self.partials = [base]
+        self.cuboids = {}
+        for size in (1, 2):
+            for grouping in itertools.combinations(self.dimensions, size):
+                self.cuboids[grouping] = base.groupby(level=list(grouping), dropna=False).sum()
+        return self
+
+    def segment(self, *dimensions):
+        """Measures and DefaultRate for one dimension or a pair (in either order)"""
+        grouping = tuple(dimensions)
+        if grouping in self.cuboids:
+            return _with_default_rate(self.cuboids[grouping])
+        if grouping[::-1] in self.cuboids:
+            return _with_default_rate(self.cuboids[grouping[::-1]].swaplevel().sort_index())
+        raise KeyError(f"Segmentation {grouping} is not in the cube (dimensions: {self.dimensions})")
+
+    def default_rate(self, dimension):
+        """Default rate per segment of one dimension, highest first"""
+        return self.segment(dimension)['DefaultRate'].sort_values(ascending=False)
+
+    def default_rate_matrix(self, rows, columns):
+        """Default rate for a pair of dimensions as a rows x columns table (for heatmaps)"""
+        return self.segment(rows, columns)['DefaultRate'].unstack(columns)
+
+    def save(self, path):
+        """Store all cuboids as one long Parquet table"""
+        frames = []
+        for grouping, table in self.cuboids.items():
+            frame = table.reset_index()
+            frame.insert(0, GROUPING_COLUMN, '|'.join(grouping))
+            frames.append(frame)
+        stored = pd.concat(frames, ignore_index=True)
+        for dimension in self.dimensions:
+            stored[dimension] = stored[dimension].astype(object).where(stored[dimension].notna(), None).astype('string')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stored.to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path):
+        stored = pd.read_parquet(path)
+        dimensions = [column for column in stored.columns if column != GROUPING_COLUMN and column not in MEASURES]
+        cube = cls(dimensions)
+        for name, frame in stored.groupby(GROUPING_COLUMN, sort=False):
+            grouping = tuple(name.split('|'))
+            cube.cuboids[grouping] = frame.set_index(list(grouping))[MEASURES]
+        return cube
+
+
+def cube_cache_path(dataset_path, dimensions=None, cache_dir='../data/cache'):
+    """Cache file for the cube of this dataset content and dimension list"""
+    key = hashlib.sha256((dataset_fingerprint(dataset_path) + '|' + ','.join(dimensions or DIMENSIONS)).encode()).hexdigest()
+    return os.path.join(cache_dir, f"segment_cube_{key[:16]}.parquet")
+
+
+def load_or_build(dataset_path, dimensions=None, cache_dir='../data/cache', batch_size=200000):
+    """Segment cube for a Parquet/Feather dataset, built in one streamed pass on a cache miss"""
+    dimensions = list(dimensions or DIMENSIONS)
+    path = cube_cache_path(dataset_path, dimensions, cache_dir)
+    if os.path.exists(path):
+        print(f"Segment cube loaded from cache {path}")
+        return SegmentCube.load(path)
+
+    missing = [column for column in MEASURE_SOURCE_COLUMNS if column not in dataset_columns(dataset_path)]
+    if missing:
+        raise ValueError(f"{dataset_path} lacks {missing}; re-run the preprocessing to rebuild it")
+    cube = SegmentCube(dimensions)
+    for batch in iter_dataset_batches(dataset_path, columns=dimensions + MEASURE_SOURCE_COLUMNS, batch_size=batch_size):
+        cube.add(batch)
+    cube.build().save(path)
+    print(f"Segment cube built and cached at {path}")
+    return cube
@@ -0,0 +1,176 @@
+"""Mergeable summary statistics for datasets processed in chunks.
+
+RunningStats keeps, for every pair of numeric columns, the count, means and
+centred co-moments over the rows where both are present (pairwise-complete,
+like DataFrame.cov/corr). Each chunk is reduced with shifted sums and folded in
+with Chan et al.'s pairwise update, the batched form of Welford's algorithm, so
+merging partial results is exact up to floating-point rounding and the order of
+chunks does not matter. Per-column min/max are merged alongside.
+
+Partials can be computed on a thread pool (the matrix products release the GIL)
+and merged, and the accumulator can be fed straight from the extraction stream
+or from a Parquet/Feather dataset read in batches, so correlation matrices and
+descriptive tables never need the full frame in memory.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from persistence import iter_dataset_batches
+
+
+def numeric_columns(df):
+    """Numeric (including boolean) columns of a frame, in order"""
+    return [column for column in df.columns
+            if pd.api.types.is_numeric_dtype(df[column]) or pd.api.types.is_bool_dtype(df[column])]
+
+
+class RunningStats:
+    """Pairwise-complete count, mean, (co)variance and min/max, updated per chunk and mergeable"""
+    def __init__(self, columns=None):
+        self.columns = list(columns) if columns is not None else None
+        if self.columns is not None:
+            self._reset()
+
+    def _reset(self):
+        p = len(self.columns)
+        # [i, j] entries are over the rows where both column i and column j are present
+        self.n = np.zeros((p, p))
+        self.mean_row = np.zeros((p, p))  # mean of column i
+        self.mean_col = np.zeros((p, p))  # mean of column j
+        self.comoment = np.zeros((p, p))  # sum (x_i - mean_i)(x_j - mean_j)
+        self.moment_row = np.zeros((p, p))  # sum (x_i - mean_i)^2
+        self.minimum = np.full(p, np.nan)
+        self.maximum = np.full(p, np.nan)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Statistics of a single chunk"""
+        stats = cls(columns if columns is not None else numeric_columns(df))
+        values = df[stats.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = np.isfinite(values)
+        weights = present.astype(np.float64)
+
+        # Shift each column by its chunk mean before forming products, to avoid cancellation
+        counts = weights.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shift = np.where(counts > 0, np.where(present, values, 0.0).sum(axis=0) / counts, 0.0)
+        centred = np.where(present, values - shift, 0.0)
+
+        n = weights.T @ weights
+        with np.errstate(invalid='ignore', divide='ignore'):
+            offset_row = np.where(n > 0, (centred.T @ weights) / n, 0.0)
+        offset_col = offset_row.T
+        stats.n = n
+        stats.mean_row = shift[:, None] + offset_row
+        stats.mean_col = shift[None, :] + offset_col
+        stats.comoment = centred.T @ centred - n * offset_row * offset_col
+        stats.moment_row = (centred ** 2).T @ weights - n * offset_row ** 2
+
+        if len(values):
+            with np.errstate(invalid='ignore'):
+                masked = np.where(present, values, np.nan)
+                has_values = counts > 0
+                stats.minimum[has_values] = np.nanmin(masked[:, has_values], axis=0)
+                stats.maximum[has_values] = np.nanmax(masked[:, has_values], axis=0)
+        return stats
+
+    def merge(self, other):
+        """Fold another RunningStats over the same columns into this one (Chan et al.)"""
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self._reset()
+        if other.columns != self.columns:
+            raise ValueError("RunningStats can only be merged over the same columns")
+        n = self.n + other.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, other.n / n, 0.0)
+            cross = np.where(n > 0, self.n * other.n / n, 0.0)
+        delta_row = other.mean_row - self.mean_row
+        delta_col = other.mean_col - self.mean_col
+        self.comoment = self.comoment + other.comoment + delta_row * delta_col * cross
+        self.moment_row = self.moment_row + other.moment_row + delta_row ** 2 * cross
+        self.mean_row = self.mean_row + delta_row * weight
+        self.mean_col = self.mean_col + delta_col * weight
+        self.n = n
+        self.minimum = np.fmin(self.minimum, other.minimum)
+        self.maximum = np.fmax(self.maximum, other.maximum)
+        return self
+
+    def add(self, df):
+        """Update with one chunk"""
+        return self.merge(RunningStats.from_frame(df, self.columns))
+
+    def _series(self, values):
+        return pd.Series(values, index=self.columns)
+
+    def count(self):
+        return self._series(np.diag(self.n).astype(np.int64))
+
+    def mean(self):
+        return self._series(np.where(np.diag(self.n) > 0, np.diag(self.mean_row), np.nan))
+
+    def variance(self, ddof=1):
+        n = np.diag(self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._series(np.where(n > ddof, np.diag(self.comoment) / (n - ddof), np.nan))
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def min(self):
+        return self._series(self.minimum)
+
+    def max(self):
+        return self._series(self.maximum)
+
+    def covariance(self, ddof=1):
+        """Pairwise-complete covariance matrix (as DataFrame.cov)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n > ddof, self.comoment / (self.n - ddof), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        """Pairwise-complete Pearson correlation matrix (as DataFrame.corr)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.moment_row * self.moment_row.T)
+        corr = np.where(self.n > 1, np.clip(corr, -1.0, 1.0), np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def describe(self):
+        """count, mean, std, min and max per column, laid out like DataFrame.describe()"""
+        return pd.DataFrame({'count': self.count(), 'mean': self.mean(), 'std': self.std(),
+                             'min': self.min(), 'max': self.max()}).T
+
+
+def accumulate(chunks, columns=None, workers=1):
+    """RunningStats over an iterable of DataFrame chunks.
+
+    With workers > 1 chunk partials are computed on a thread pool; at most 2 * workers chunks
+    are in flight, so memory stays bounded for streams larger than RAM. Partials are merged in
+    chunk order, which makes the result independent of the number of workers.
+    """
+    total = RunningStats(columns)
+    if workers <= 1:
+        for chunk in chunks:
+            total.merge(RunningStats.from_frame(chunk, total.columns))
+        return total
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for chunk in chunks:
+            if total.columns is None:
+                total.columns = numeric_columns(chunk)
+                total._reset()
+            pending.append(executor.submit(RunningStats.from_frame, chunk, total.columns))
+            if len(pending) >= 2 * workers:
+                total.merge(pending.pop(0).result())
+        for future in pending:
+            total.merge(future.result())
+    return total
+
+
+def summarize_dataset(path, columns=None, batch_size=200000, workers=1):
+    """RunningStats over a Parquet/Feather dataset, read column-selectively in batches"""
+    return accumulate(iter_dataset_batches(path, columns=columns, batch_size=batch_size), columns, workers)
@@ -107,6 +107,27 @@ CREATE TABLE MobileMoneyTransactions (
     OverdraftFee DECIMAL(18,2) DEFAULT 0
 );
 
+-- Monthly mobile money rollup, maintained incrementally by the generator
+CREATE TABLE CustomerMonthlyActivity (
+    CustomerID INT NOT NULL FOREIGN KEY REFERENCES Customers(CustomerID),
+    MonthStart DATE NOT NULL,
+    OverdraftCount INT NOT NULL DEFAULT 0,
+    DepositSum DECIMAL(20,2) NOT NULL DEFAULT 0,
+    DepositCount INT NOT NULL DEFAULT 0,
+    CONSTRAINT PK_CustomerMonthlyActivity PRIMARY KEY (CustomerID, MonthStart)
+);
+
+/* Backfill for databases populated before the rollup existed:
+INSERT INTO CustomerMonthlyActivity (CustomerID, MonthStart, OverdraftCount, DepositSum, DepositCount)
+SELECT CustomerID,
+       DATEFROMPARTS(YEAR(TransactionDate), MONTH(TransactionDate), 1),
+       SUM(CASE WHEN IsOverdraft = 1 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN TransactionType = 'Deposit' THEN Amount ELSE 0 END),
+       SUM(CASE WHEN TransactionType = 'Deposit' THEN 1 ELSE 0 END)
+FROM MobileMoneyTransactions
+GROUP BY CustomerID, DATEFROMPARTS(YEAR(TransactionDate), MONTH(TransactionDate), 1);
+*/
+
 -- CustomerCreditInfo table
 CREATE TABLE CustomerCreditInfo (
     CreditInfoID INT PRIMARY KEY IDENTITY(1,1),
@@ -160,6 +181,56 @@ CREATE TABLE CreditInquiries (
     Status NVARCHAR(50)
 );
 
+-- Performance indexes
+-- Foreign keys and the filters used by the generator stages and main_data_extraction.sql.
+-- All are plain nonclustered indexes, so the generator can disable them for bulk loads
+-- and rebuild them afterwards (see disable_indexes_during_load in config.ini).
+
+-- Credit info is looked up and joined by customer everywhere
+CREATE NONCLUSTERED INDEX IX_CustomerCreditInfo_CustomerID
+    ON CustomerCreditInfo (CustomerID);
+
+-- First-time checks and per-customer application history
+CREATE NONCLUSTERED INDEX IX_LoanApplications_CustomerID_Status
+    ON LoanApplications (CustomerID, Status)
+    INCLUDE (ProductID, ApplicationDate);
+
+-- Pending application clean-up
+CREATE NONCLUSTERED INDEX IX_LoanApplications_Status_ApplicationDate
+    ON LoanApplications (Status, ApplicationDate);
+
+CREATE NONCLUSTERED INDEX IX_Loans_ApplicationID
+    ON Loans (ApplicationID);
+
+-- Due/past-due loan scans in the repayment stages and the Paid/Defaulted extraction filter
+CREATE NONCLUSTERED INDEX IX_Loans_Status_DueDate
+    ON Loans (Status, DueDate)
+    INCLUDE (ApplicationID, PrincipalAmount, TotalRepayable);
+
+CREATE NONCLUSTERED INDEX IX_Repayments_LoanID
+    ON Repayments (LoanID)
+    INCLUDE (RepaymentDate, Amount);
+
+CREATE NONCLUSTERED INDEX IX_MobileMoneyTransactions_CustomerID_TransactionDate
+    ON MobileMoneyTransactions (CustomerID, TransactionDate);
+
+-- Covers the OverdraftLast3Months subquery of the extraction query
+CREATE NONCLUSTERED INDEX IX_MobileMoneyTransactions_Overdraft
+    ON MobileMoneyTransactions (CustomerID, TransactionDate)
+    WHERE IsOverdraft = 1;
+
+-- Covers the AvgDepositLast6Months subquery of the extraction query
+CREATE NONCLUSTERED INDEX IX_MobileMoneyTransactions_Deposit
+    ON MobileMoneyTransactions (CustomerID, TransactionDate)
+    INCLUDE (Amount)
+    WHERE TransactionType = 'Deposit';
+
+CREATE NONCLUSTERED INDEX IX_CustomerDeviceInfo_CustomerID
+    ON CustomerDeviceInfo (CustomerID);
+
+CREATE NONCLUSTERED INDEX IX_CreditInquiries_CustomerID_InquiryDate
+    ON CreditInquiries (CustomerID, InquiryDate);
+
 /*SELECT TABLE_NAME, COLUMN_NAME, NUMERIC_PRECISION, NUMERIC_SCALE
 FROM INFORMATION_SCHEMA.COLUMNS
 WHERE DATA_TYPE = 'decimal' AND NUMERIC_PRECISION < 20;*/
@@ -44,17 +44,49 @@ SELECT
     CCI.ConsecutiveOnTimeRepayments,
     CCI.OverdraftLimit AS CustomerOverdraftLimit,
     CCI.TimesOverdrafted AS CustomerTimesOverdrafted,
-    (SELECT COUNT(*) FROM MobileMoneyTransactions MMT WHERE MMT.CustomerID = C.CustomerID
-                                                        AND MMT.TransactionDate < LA.ApplicationDate
-                                                        AND MMT.IsOverdraft = 1
-                                                        AND MMT.TransactionDate >= DATEADD(month, -3, LA.ApplicationDate)) AS OverdraftLast3Months,
-   (SELECT AVG(MMT.Amount) FROM MobileMoneyTransactions MMT WHERE MMT.CustomerID = C.CustomerID
-                                                            AND MMT.TransactionType = 'Deposit'
-                                                            AND MMT.TransactionDate < LA.ApplicationDate
-                                                            AND MMT.TransactionDate >= DATEADD(month, -6, LA.ApplicationDate)) AS AvgDepositLast6Months
+    ISNULL(OD.OverdraftCount, 0) AS OverdraftLast3Months,
+    DEP.AvgDeposit AS AvgDepositLast6Months
 FROM Loans L
 JOIN LoanApplications LA ON L.ApplicationID = LA.ApplicationID
 JOIN Customers C ON LA.CustomerID = C.CustomerID
 JOIN LoanProducts P ON LA.ProductID = P.ProductID
 JOIN CustomerCreditInfo CCI ON C.CustomerID = CCI.CustomerID
+-- Feature windows are [ApplicationDate - 3/6 months, ApplicationDate). Whole calendar months inside a
+-- window are summed from CustomerMonthlyActivity; only the partial months at either end read
+-- MobileMoneyTransactions (through the filtered covering indexes).
+CROSS APPLY (SELECT DATEADD(month, -3, LA.ApplicationDate) AS From3,
+                    DATEADD(month, -6, LA.ApplicationDate) AS From6,
+                    CAST(DATEFROMPARTS(YEAR(LA.ApplicationDate), MONTH(LA.ApplicationDate), 1) AS DATETIME) AS AppMonthStart) W
+CROSS APPLY (SELECT CASE WHEN W.From3 = CAST(DATEFROMPARTS(YEAR(W.From3), MONTH(W.From3), 1) AS DATETIME) THEN W.From3
+                         ELSE DATEADD(month, 1, CAST(DATEFROMPARTS(YEAR(W.From3), MONTH(W.From3), 1) AS DATETIME)) END AS Whole3Start,
+                    CASE WHEN W.From6 = CAST(DATEFROMPARTS(YEAR(W.From6), MONTH(W.From6), 1) AS DATETIME) THEN W.From6
+                         ELSE DATEADD(month, 1, CAST(DATEFROMPARTS(YEAR(W.From6), MONTH(W.From6), 1) AS DATETIME)) END AS Whole6Start) WM
+OUTER APPLY (
+    SELECT (SELECT ISNULL(SUM(CMA.OverdraftCount), 0) FROM CustomerMonthlyActivity CMA
+            WHERE CMA.CustomerID = C.CustomerID
+              AND CMA.MonthStart >= WM.Whole3Start
+              AND CMA.MonthStart < W.AppMonthStart)
+         + (SELECT COUNT(*) FROM MobileMoneyTransactions MMT
+            WHERE MMT.CustomerID = C.CustomerID
+              AND MMT.IsOverdraft = 1
+              AND ((MMT.TransactionDate >= W.From3 AND MMT.TransactionDate < WM.Whole3Start)
+                   OR (MMT.TransactionDate >= W.AppMonthStart AND MMT.TransactionDate < LA.ApplicationDate))) AS OverdraftCount
+) OD
+OUTER APPLY (
+    SELECT SUM(Part.DepositSum) / NULLIF(SUM(Part.DepositCount), 0) AS AvgDeposit
+    FROM (
+        SELECT SUM(CMA.DepositSum) AS DepositSum, SUM(CMA.DepositCount) AS DepositCount
+        FROM CustomerMonthlyActivity CMA
+        WHERE CMA.CustomerID = C.CustomerID
+          AND CMA.MonthStart >= WM.Whole6Start
+          AND CMA.MonthStart < W.AppMonthStart
+        UNION ALL
+        SELECT SUM(MMT.Amount), COUNT(*)
+        FROM MobileMoneyTransactions MMT
+        WHERE MMT.CustomerID = C.CustomerID
+          AND MMT.TransactionType = 'Deposit'
+          AND ((MMT.TransactionDate >= W.From6 AND MMT.TransactionDate < WM.Whole6Start)
+               OR (MMT.TransactionDate >= W.AppMonthStart AND MMT.TransactionDate < LA.ApplicationDate))
+    ) Part
+) DEP
 WHERE L.Status IN ('Paid', 'Defaulted');
\ No newline at end of file
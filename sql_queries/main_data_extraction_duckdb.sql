@@ -0,0 +1,90 @@
+-- DuckDB equivalent of main_data_extraction.sql, run over the Parquet exports of the QuickPesaDB
+-- tables (see data/duckdb_backend.py, which registers one view per table). Same columns, same order.
+-- The 3/6-month feature windows are computed with range joins over MobileMoneyTransactions, which
+-- DuckDB runs as parallel columnar scans, so the CustomerMonthlyActivity rollup is not needed here.
+WITH Windows AS (
+    SELECT LA.ApplicationID,
+           LA.CustomerID,
+           LA.ApplicationDate,
+           LA.ApplicationDate - INTERVAL 3 MONTH AS From3,
+           LA.ApplicationDate - INTERVAL 6 MONTH AS From6
+    FROM LoanApplications LA
+    WHERE LA.ApplicationID IN (SELECT ApplicationID FROM Loans WHERE Status IN ('Paid', 'Defaulted'))
+),
+OD AS (
+    SELECT W.ApplicationID, COUNT(*) AS OverdraftCount
+    FROM Windows W
+    JOIN MobileMoneyTransactions MMT
+      ON MMT.CustomerID = W.CustomerID
+     AND MMT.TransactionDate >= W.From3
+     AND MMT.TransactionDate < W.ApplicationDate
+    WHERE CAST(MMT.IsOverdraft AS INTEGER) = 1
+    GROUP BY W.ApplicationID
+),
+DEP AS (
+    SELECT W.ApplicationID, AVG(MMT.Amount) AS AvgDeposit
+    FROM Windows W
+    JOIN MobileMoneyTransactions MMT
+      ON MMT.CustomerID = W.CustomerID
+     AND MMT.TransactionDate >= W.From6
+     AND MMT.TransactionDate < W.ApplicationDate
+    WHERE MMT.TransactionType = 'Deposit'
+    GROUP BY W.ApplicationID
+)
+SELECT
+    L.LoanID,
+    L.PrincipalAmount AS LoanPrincipal,
+    L.TotalRepayable,
+    L.Status AS LoanStatus,
+    L.DisbursementDate,
+    L.DueDate,
+    date_diff('day', L.DisbursementDate, L.DueDate) AS LoanTermActualDays,
+    L.DaysDelayed,
+    LA.ApplicationDate,
+    LA.AmountRequested,
+    LA.TermDays AS LoanTermRequestedDays,
+    LA.Purpose AS LoanPurpose,
+    P.ProductName,
+    P.Category AS LoanCategory,
+    P.InterestRate AS ProductInterestRate,
+    P.ProcessingFee AS ProductProcessingFee,
+    C.CustomerID,
+    date_diff('year', C.DateOfBirth, LA.ApplicationDate) AS AgeAtApplication,
+    C.Gender,
+    C.County,
+    C.EmploymentStatus,
+    C.MonthlyIncome,
+    C.EducationLevel,
+    C.MaritalStatus,
+    C.HasBankAccount,
+    C.MobileMoneyProvider,
+    C.MonthlyMobileMoneyVolume,
+    C.RegistrationDate AS CustomerRegistrationDate,
+    CCI.CreditScore,
+    CCI.PaymentHistoryScore,
+    CCI.CreditUtilization,
+    CCI.CreditHistoryLength,
+    CCI.TotalLoansTaken AS PreviousLoansTaken,
+    CCI.TotalAmountBorrowed AS PreviousTotalBorrowed,
+    CCI.TotalAmountRepaid AS PreviousTotalRepaid,
+    CCI.ActiveLoans AS PreviousActiveLoans,
+    CCI.TimesDefaulted AS PreviousDefaults,
+    CCI.LastDefaultDate AS PreviousLastDefaultDate,
+    CCI.CRBListed,
+    CCI.CRBListingDate,
+    CCI.CurrentLoanTier,
+    CCI.MaxEligibleLoanAmount,
+    CCI.ConsecutiveOnTimeRepayments,
+    CCI.OverdraftLimit AS CustomerOverdraftLimit,
+    CCI.TimesOverdrafted AS CustomerTimesOverdrafted,
+    COALESCE(OD.OverdraftCount, 0) AS OverdraftLast3Months,
+    DEP.AvgDeposit AS AvgDepositLast6Months
+FROM Loans L
+JOIN LoanApplications LA ON L.ApplicationID = LA.ApplicationID
+JOIN Customers C ON LA.CustomerID = C.CustomerID
+JOIN LoanProducts P ON LA.ProductID = P.ProductID
+JOIN CustomerCreditInfo CCI ON C.CustomerID = CCI.CustomerID
+LEFT JOIN OD ON OD.ApplicationID = LA.ApplicationID
+LEFT JOIN DEP ON DEP.ApplicationID = LA.ApplicationID
+WHERE L.Status IN ('Paid', 'Defaulted')
+ORDER BY L.LoanID;